@@ -0,0 +1,188 @@
+"""
+End to end benchmarks of `WebsocketAdapter` against the in-process echo server.
+
+Every case runs on both engines and measures:
+
+- small_messages: rate of small messages echoed back, pipe mode.
+- large_messages: throughput of 1 MiB binary messages echoed back.
+- inbound_flood: rate of messages received from a flooding server, stdout to /dev/null.
+- connect_close: cost of a connect, handshake and close cycle.
+
+Results are written as JSON, pass an earlier result file with `--compare` to see the change.
+
+    python benchmarks/bench_adapter.py --output dev.json --compare benchmarks/results/1.0.0.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from requests.models import Request
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from echo_server import EchoServer  # noqa: E402
+
+import httpie_websockets  # noqa: E402
+from httpie_websockets import WebsocketAdapter  # noqa: E402
+
+ENGINES = ("thread", "asyncio")
+
+
+@contextlib.contextmanager
+def environ(**options: Any) -> Iterator[None]:
+    """Set `HTTPIE_WS_*` options for the adapters created inside."""
+    saved = dict(os.environ)
+    os.environ.update({f"HTTPIE_WS_{k.upper()}": str(v) for k, v in options.items()})
+    try:
+        yield
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+
+
+def run_session(url: str, data: Optional[bytes] = None, **options: Any) -> float:
+    """Run one pipe mode session with stdout discarded, return the elapsed seconds."""
+    with environ(**{"mode": "pipe", "drain": -1, **options}):
+        adapter = WebsocketAdapter()
+    with open(os.devnull, "w") as devnull:
+        adapter._stdout = devnull
+        request = Request(url=url, data=data).prepare()
+        started = time.perf_counter()
+        response = adapter.send(request, timeout=10)
+        elapsed = time.perf_counter() - started
+    if response.status_code != 200:
+        raise RuntimeError(f"{url}: {response.status_code} {response.reason}")
+    return elapsed
+
+
+def bench_small_messages(server: EchoServer, engine: str, scale: float) -> dict:
+    count = int(20_000 * scale)
+    data = b"\n".join(b'{"seq": %d, "op": "ping"}' % i for i in range(count))
+    elapsed = run_session(server.url(f"/echo?close_after={count}"), data, engine=engine)
+    return {"value": count / elapsed, "unit": "msg/s", "messages": count}
+
+
+def bench_large_messages(server: EchoServer, engine: str, scale: float) -> dict:
+    count = max(int(50 * scale), 1)
+    size = 1 << 20
+    with tempfile.NamedTemporaryFile() as corpus:
+        corpus.write(b"\0".join(os.urandom(size).replace(b"\0", b"\1") for _ in range(count)))
+        corpus.flush()
+        elapsed = run_session(
+            server.url(f"/echo?close_after={count}"),
+            engine=engine,
+            input=corpus.name,
+            delimiter="nul",
+            opcode="binary",
+            binary="raw",
+        )
+    # Both directions cross the connection
+    return {"value": 2 * count * size / elapsed / 1e6, "unit": "MB/s", "messages": count}
+
+
+def bench_inbound_flood(server: EchoServer, engine: str, scale: float) -> dict:
+    count = int(100_000 * scale)
+    elapsed = run_session(
+        server.url(f"/flood?count={count}&size=64"),
+        engine=engine,
+        input=os.devnull,
+        binary="raw",
+    )
+    return {"value": count / elapsed, "unit": "msg/s", "messages": count}
+
+
+def bench_connect_close(server: EchoServer, engine: str, scale: float) -> dict:
+    rounds = max(int(200 * scale), 5)
+    samples = [
+        run_session(server.url("/echo"), engine=engine, input=os.devnull, drain=0)
+        for _ in range(rounds)
+    ]
+    return {
+        "value": statistics.median(samples) * 1000,
+        "unit": "ms",
+        "p90": sorted(samples)[int(len(samples) * 0.9) - 1] * 1000,
+        "rounds": rounds,
+    }
+
+
+BENCHMARKS = {
+    "small_messages": bench_small_messages,
+    "large_messages": bench_large_messages,
+    "inbound_flood": bench_inbound_flood,
+    "connect_close": bench_connect_close,
+}
+
+
+def compare(results: list[dict], baseline_path: str) -> None:
+    baseline = {
+        (r["name"], r["engine"]): r for r in json.loads(Path(baseline_path).read_text())["results"]
+    }
+    print(f"\nCompared with {baseline_path}:")
+    for r in results:
+        base = baseline.get((r["name"], r["engine"]))
+        if not base or not base["value"]:
+            continue
+        change = (r["value"] - base["value"]) / base["value"] * 100
+        print(
+            f"{r['name']:<16} {r['engine']:<8} {base['value']:>12.1f} -> "
+            f"{r['value']:>12.1f} {r['unit']} ({change:+.1f}%)"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--output", default=f"benchmarks/results/{httpie_websockets.__version__}.json"
+    )
+    parser.add_argument("--compare", help="earlier result file")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply message counts")
+    parser.add_argument("--only", nargs="*", choices=sorted(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--engine", nargs="*", choices=ENGINES, default=list(ENGINES))
+    args = parser.parse_args()
+
+    results = []
+    with EchoServer() as server, contextlib.redirect_stdout(io.StringIO()):
+        for name, bench in BENCHMARKS.items():
+            if args.only and name not in args.only:
+                continue
+            for engine in args.engine:
+                result = {"name": name, "engine": engine, **bench(server, engine, args.scale)}
+                results.append(result)
+                print(
+                    f"{name:<16} {engine:<8} {result['value']:>12.1f} {result['unit']}",
+                    file=sys.stderr,
+                )
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(
+        json.dumps(
+            {
+                "version": httpie_websockets.__version__,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "scale": args.scale,
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+    print(f"Results written to {output}", file=sys.stderr)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Import time benchmarks: what installing the plugin costs every `http` call.
+
+httpie imports every transport plugin and calls `get_adapter()` on each run, also
+for plain HTTP requests. Every case runs in a fresh interpreter:
+
+- import_plugin: `import httpie_websockets` and `get_adapter()` after httpie is loaded.
+- deferred_imports: importing websocket-client and asyncio, the cost the plugin
+  now only pays for ws:// and wss:// URLs.
+- http_offline: a whole `http --offline` run of a plain HTTP request.
+
+    python benchmarks/bench_import.py --output import.json --compare benchmarks/results/import-1.0.0.json
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_adapter import compare  # noqa: E402
+
+ROOT = Path(__file__).resolve().parent.parent
+
+IMPORT_PLUGIN = """
+import sys, time
+import httpie.core
+started = time.perf_counter()
+import httpie_websockets
+httpie_websockets.WebsocketSPlugin().get_adapter()
+elapsed = time.perf_counter() - started
+print(elapsed, "websocket._core" in sys.modules, "asyncio.base_events" in sys.modules)
+"""
+
+DEFERRED_IMPORTS = """
+import time
+import httpie.core
+started = time.perf_counter()
+import asyncio, websocket
+print(time.perf_counter() - started)
+"""
+
+
+def _python(code: str) -> list[str]:
+    out = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True
+    ).stdout
+    return out.split()
+
+
+def _median_ms(samples: list[float]) -> float:
+    return statistics.median(samples) * 1000
+
+
+def bench_import_plugin(rounds: int) -> dict:
+    runs = [_python(IMPORT_PLUGIN) for _ in range(rounds)]
+    return {
+        "value": _median_ms([float(r[0]) for r in runs]),
+        "unit": "ms",
+        "websocket_imported": runs[0][1] == "True",
+        "asyncio_imported": runs[0][2] == "True",
+    }
+
+
+def bench_deferred_imports(rounds: int) -> dict:
+    return {
+        "value": _median_ms([float(_python(DEFERRED_IMPORTS)[0]) for _ in range(rounds)]),
+        "unit": "ms",
+    }
+
+
+def bench_http_offline(rounds: int) -> dict:
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        subprocess.run(  # noqa: S603
+            [sys.executable, "-m", "httpie", "--offline", "--ignore-stdin", "GET", "example.org"],
+            cwd=ROOT,
+            check=True,
+            capture_output=True,
+        )
+        samples.append(time.perf_counter() - started)
+    return {"value": _median_ms(samples), "unit": "ms"}
+
+
+BENCHMARKS = {
+    "import_plugin": bench_import_plugin,
+    "deferred_imports": bench_deferred_imports,
+    "http_offline": bench_http_offline,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--output", default="benchmarks/results/import.json")
+    parser.add_argument("--compare", help="earlier result file")
+    parser.add_argument("--rounds", type=int, default=15)
+    args = parser.parse_args()
+
+    # Compile once so no round pays for writing the bytecode cache
+    _python("import httpie_websockets")
+    results = []
+    for name, bench in BENCHMARKS.items():
+        result = {"name": name, "engine": "-", **bench(args.rounds)}
+        results.append(result)
+        print(f"{name:<16} {result['value']:>10.1f} {result['unit']}", file=sys.stderr)
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(
+        json.dumps(
+            {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "rounds": args.rounds,
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+    print(f"Results written to {output}", file=sys.stderr)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+In-process WebSocket server used by the benchmarks.
+
+It runs an asyncio server on a background thread and picks its behaviour from the path:
+
+- `/echo?close_after=N` echoes every message and closes after N messages, any other
+  path echoes until the client closes.
+- `/flood?count=N&size=S` sends N binary messages of S bytes and closes.
+"""
+
+import asyncio
+import base64
+import hashlib
+import struct
+import threading
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+from websocket import ABNF, STATUS_NORMAL
+
+GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def _frame(opcode: int, payload: bytes) -> bytes:
+    """Build an unmasked server frame."""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> tuple:
+    b1, b2 = await reader.readexactly(2)
+    length = b2 & 0x7F
+    if length == 126:
+        (length,) = struct.unpack("!H", await reader.readexactly(2))
+    elif length == 127:
+        (length,) = struct.unpack("!Q", await reader.readexactly(8))
+    mask = await reader.readexactly(4) if b2 & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask:
+        payload = ABNF.mask(mask, payload)
+    return b1 & 0x0F, payload
+
+
+class EchoServer:
+    """Echo/flood server on 127.0.0.1 with a random port."""
+
+    def __init__(self) -> None:
+        self.port: int = 0
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="BenchServer", daemon=True
+        )
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    def url(self, path: str) -> str:
+        return f"ws://127.0.0.1:{self.port}{path}"
+
+    def __enter__(self) -> "EchoServer":
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, "127.0.0.1", 0, limit=1 << 24)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        assert self._server is not None
+        self._loop.call_soon_threadsafe(self._server.close)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(5)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+        target = urlparse(head[0].split(" ")[1])
+        query = {k: int(v[0]) for k, v in parse_qs(target.query).items()}
+        key = next(
+            line.split(":", 1)[1].strip()
+            for line in head[1:]
+            if line.lower().startswith("sec-websocket-key")
+        )
+        accept = base64.b64encode(hashlib.sha1((key + GUID).encode()).digest()).decode()
+        writer.write(
+            "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode()
+        )
+        try:
+            if target.path == "/flood":
+                await self._flood(reader, writer, query.get("count", 1000), query.get("size", 64))
+            else:
+                await self._echo(reader, writer, query.get("close_after", 0))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _echo(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter, close_after: int
+    ) -> None:
+        received = 0
+        while True:
+            opcode, payload = await _read_frame(reader)
+            if opcode == ABNF.OPCODE_CLOSE:
+                writer.write(_frame(ABNF.OPCODE_CLOSE, payload[:2]))
+                await writer.drain()
+                return
+            if opcode in (ABNF.OPCODE_TEXT, ABNF.OPCODE_BINARY):
+                writer.write(_frame(opcode, payload))
+                received += 1
+                if received == close_after:
+                    writer.write(_frame(ABNF.OPCODE_CLOSE, struct.pack("!H", STATUS_NORMAL)))
+                await writer.drain()
+
+    @staticmethod
+    async def _flood(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter, count: int, size: int
+    ) -> None:
+        frame = _frame(ABNF.OPCODE_BINARY, b"x" * size)
+        for _ in range(count):
+            writer.write(frame)
+            await writer.drain()
+        writer.write(_frame(ABNF.OPCODE_CLOSE, struct.pack("!H", STATUS_NORMAL)))
+        await writer.drain()
+        # wait for the close reply
+        while (await _read_frame(reader))[0] != ABNF.OPCODE_CLOSE:
+            pass
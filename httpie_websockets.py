@@ -1,18 +1,47 @@
+import base64
+import codecs
+import functools
+import hashlib
+import importlib.util
 import io
 import json
 import logging
+import mmap
 import os
 import platform
+import queue
+import random
+import re
+import selectors
+import socket
 import ssl
+import stat
 import struct
 import sys
 import threading
 import time
+import zlib
+from collections import deque
+from datetime import datetime
 from pathlib import Path
-from typing import Any, Mapping, Optional, TextIO, Tuple, Union
+from types import ModuleType
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Callable,
+    Deque,
+    Hashable,
+    Iterator,
+    Mapping,
+    Optional,
+    TextIO,
+    Tuple,
+    Union,
+)
 from urllib.parse import ParseResult, urlparse
 
-import websocket
 from httpie.client import DEFAULT_UA
 from httpie.plugins import TransportPlugin
 from httpie.ssl_ import HTTPieCertificate
@@ -20,26 +49,229 @@ from requests import RequestException
 from requests.adapters import BaseAdapter
 from requests.models import PreparedRequest, Response
 from requests.structures import CaseInsensitiveDict
-from websocket import ABNF, STATUS_ABNORMAL_CLOSED
 
 __version__ = "1.0.0"
 __author__ = "belingud"
 __license__ = "MIT"
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(
-    format="%(asctime)s %(levelname)s %(filename)s:%(lineno)s: %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-)
 logger.setLevel(os.getenv("HTTPIE_WS_LOG_LEVEL", "WARNING").upper())
 
-try:
-    import python_socks  # noqa: F401
-except ImportError:
-    logger.debug("pyton-socks not installed, websocket proxy will not work")
+
+def _lazy_import(name: str) -> ModuleType:
+    """Return module `name`, executed on first attribute access.
+
+    httpie imports every transport plugin on each run, plain HTTP requests
+    should not pay for websocket-client and asyncio.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+if TYPE_CHECKING:
+    import asyncio
+    from http.server import ThreadingHTTPServer
+
+    import websocket
+else:
+    asyncio = _lazy_import("asyncio")
+    websocket = _lazy_import("websocket")
+
+
+@functools.lru_cache(maxsize=None)
+def _setup_logging() -> None:
+    """Configure logging once a WebSocket session starts, not when httpie loads the plugin."""
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s %(filename)s:%(lineno)s: %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    if importlib.util.find_spec("python_socks") is None:
+        logger.debug("pyton-socks not installed, websocket proxy will not work")
+
+
+# RFC 6455 opcodes and close codes, the values of websocket-client's ABNF and
+# STATUS_* constants, defined here so they do not import websocket-client
+OPCODE_CONT: int = 0x0
+OPCODE_TEXT: int = 0x1
+OPCODE_BINARY: int = 0x2
+OPCODE_CLOSE: int = 0x8
+OPCODE_PING: int = 0x9
+OPCODE_PONG: int = 0xA
+STATUS_NORMAL: int = 1000
+STATUS_PROTOCOL_ERROR: int = 1002
+STATUS_ABNORMAL_CLOSED: int = 1006
+STATUS_INVALID_PAYLOAD: int = 1007
+STATUS_MESSAGE_TOO_BIG: int = 1009
+STATUS_UNEXPECTED_CONDITION: int = 1011
+
+IS_WINDOWS = platform.system().lower() == "windows"
+
+# Plugins cannot add httpie command line options, extra options are read from
+# environment variables with this prefix, like HTTPIE_WS_LOG_LEVEL.
+ENV_PREFIX = "HTTPIE_WS_"
+
+MESSAGE_DELIMITERS: dict[str, bytes] = {
+    "newline": b"\n",
+    "nul": b"\0",
+    # the whole input is one message
+    "none": b"",
+}
+
+# How binary frames are written to stdout
+BINARY_MODES = ("text", "raw", "hex", "base64")
+
+# What stdout gets: "text" writes message payloads and status lines as they are,
+# "ndjson" writes one JSON object per event
+OUTPUT_MODES = ("text", "ndjson")
+
+# What the response body holds: "info" the session info once it has ended,
+# "messages" the output written while the session runs, see `MessageBody`
+BODY_MODES = ("info", "messages")
+
+# Formats of the `HTTPIE_WS_METRICS` file, by default JSON for *.json files
+METRICS_FORMATS = ("prometheus", "json")
+
+OPCODE_NAMES: dict[int, str] = {
+    OPCODE_CONT: "cont",
+    OPCODE_TEXT: "text",
+    OPCODE_BINARY: "binary",
+    OPCODE_CLOSE: "close",
+    OPCODE_PING: "ping",
+    OPCODE_PONG: "pong",
+}
+
+# C accelerated JSON string escaping, much cheaper than json.dumps of a whole dict
+_json_string = json.encoder.encode_basestring
+_ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;]*m")
+
+
+def _to_delimiter(value: str) -> bytes:
+    try:
+        return MESSAGE_DELIMITERS[value.lower()]
+    except KeyError:
+        raise ValueError(value) from None
+
+
+def _to_flush_mode(value: str) -> str:
+    value = value.lower()
+    if value not in ("line", "interval", "size"):
+        raise ValueError(value)
+    return value
+
+
+def _to_binary_mode(value: str) -> str:
+    value = value.lower()
+    if value not in BINARY_MODES:
+        raise ValueError(value)
+    return value
+
+
+def _to_output_mode(value: str) -> str:
+    value = value.lower()
+    if value not in OUTPUT_MODES:
+        raise ValueError(value)
+    return value
+
+
+def _to_body_mode(value: str) -> str:
+    value = value.lower()
+    if value not in BODY_MODES:
+        raise ValueError(value)
+    return value
+
+
+def _to_metrics_format(value: str) -> str:
+    value = value.lower()
+    if value not in METRICS_FORMATS:
+        raise ValueError(value)
+    return value
+
+
+def _to_opcode(value: str) -> int:
+    try:
+        return {"text": OPCODE_TEXT, "binary": OPCODE_BINARY}[value.lower()]
+    except KeyError:
+        raise ValueError(value) from None
+
+
+def _to_window_bits(value: str) -> int:
+    bits = int(value)
+    # zlib cannot write raw deflate streams with an 8 bit window
+    if not 9 <= bits <= 15:
+        raise ValueError(value)
+    return bits
+
+
+def _to_fragment_size(value: str) -> int:
+    size = int(value)
+    # A fragment must fit the payload length of a session log record
+    if not 1 <= size <= RECORD_MAX_PAYLOAD:
+        raise ValueError(value)
+    return size
+
+
+def _to_match(value: str) -> Union[bytes, "re.Pattern[bytes]"]:
+    if not value.startswith("re:"):
+        return value.encode("utf8")
+    try:
+        return re.compile(value[3:].encode("utf8"))
+    except re.error as e:
+        raise ValueError(value) from e
+
+
+def _to_predicate(value: str) -> Tuple[Tuple[Union[str, int], ...], Optional[str], Any]:
+    found = _PREDICATE.match(value)
+    if not found:
+        raise ValueError(value)
+    expected = found["value"]
+    if expected is not None:
+        try:
+            expected = json.loads(expected)
+        except ValueError:
+            # Unquoted strings compare as strings
+            pass
+    return parse_path(found["path"]), found["op"], expected
+
+
+def _to_url_list(value: str) -> list[str]:
+    return value.replace(",", " ").split()
+
+
+def _to_bool(value: str) -> bool:
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def getenv_option(name: str, default: Any = None, cast: Callable[[str], Any] = str) -> Any:
+    """Read a `HTTPIE_WS_*` option from the environment.
+
+    Args:
+        name (str): Option name without the prefix, e.g. "DRAIN".
+        default (Any, optional): Value used when the option is unset or invalid.
+        cast (Callable, optional): Converter applied to the raw value.
+
+    Returns:
+        Any: The converted option value.
+    """
+    value = os.getenv(f"{ENV_PREFIX}{name}")
+    if value is None or value.strip() == "":
+        return default
+    try:
+        return cast(value.strip())
+    except ValueError:
+        logger.warning(f"Invalid value for {ENV_PREFIX}{name}: {value!r}, using {default!r}")
+        return default
 
 # Read characters from stdin in a non-blocking way
-if platform.system().lower() == "windows":
+if IS_WINDOWS:
     # On Windows, use msvcrt to read every character from stdin
     import msvcrt
 
@@ -65,6 +297,116 @@ else:
         return None
 
 
+class StdinReader:
+    """Read complete lines from stdin without polling.
+
+    On Unix-like systems the reader blocks on stdin and a wakeup pipe together,
+    so `wakeup` interrupts a pending `read_lines` as soon as the connection
+    state changes. Every complete line already buffered is returned in one pass.
+    Windows consoles fall back to `_read_stdin`, other streams without a file
+    descriptor are read one line per call with a blocking `readline`.
+    """
+
+    READ_SIZE: int = 65536
+
+    def __init__(self, stream: Optional[TextIO] = None) -> None:
+        self._stream = stream or sys.stdin
+        self._buffer: str = ""
+        self._eof: bool = False
+        self._selector: Optional[selectors.BaseSelector] = None
+        self._fd: Optional[int] = None
+        self._wakeup_r: Optional[int] = None
+        self._wakeup_w: Optional[int] = None
+        if IS_WINDOWS:
+            return
+        try:
+            self._fd = self._stream.fileno()
+        except (AttributeError, OSError, ValueError):
+            return
+        encoding = getattr(self._stream, "encoding", None) or "utf-8"
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_r, False)
+        os.set_blocking(self._wakeup_w, False)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._fd, selectors.EVENT_READ)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ)
+
+    @property
+    def eof(self) -> bool:
+        return self._eof
+
+    def read_lines(self, timeout: Optional[float] = None) -> list[str]:
+        """Block until input is available or `wakeup` is called.
+
+        Args:
+            timeout (float, optional): Maximum seconds to wait, wait forever if None.
+
+        Returns:
+            list[str]: Complete lines read in this pass, may be empty.
+        """
+        if self._selector is None:
+            if self._stream is not sys.stdin:
+                return self._readline()
+            line = _read_stdin()
+            return [] if line is None else [line]
+        data = None
+        for key, _ in self._selector.select(timeout):
+            if key.fd == self._wakeup_r:
+                self._drain_wakeup()
+            elif key.fd == self._fd:
+                data = os.read(self._fd, self.READ_SIZE)
+        if data is None:
+            return []
+        if not data:
+            # EOF, release the descriptor and flush what is left as the last line
+            self._eof = True
+            self._selector.unregister(self._fd)
+            self._buffer += self._decoder.decode(b"", final=True)
+            lines, self._buffer = [self._buffer] if self._buffer else [], ""
+        else:
+            self._buffer += self._decoder.decode(data)
+            *lines, self._buffer = self._buffer.split("\n")
+        return [line.rstrip("\n ") for line in lines]
+
+    def _readline(self) -> list[str]:
+        if self._eof:
+            return []
+        line = self._stream.readline()
+        if not line:
+            self._eof = True
+            return []
+        return [line.rstrip("\n ")]
+
+    def wakeup(self) -> None:
+        """Interrupt a blocking `read_lines` call, safe to call from any thread."""
+        if self._wakeup_w is None:
+            return
+        try:
+            os.write(self._wakeup_w, b"\0")
+        except OSError:
+            # Pipe is full or closed, a wakeup is already pending
+            pass
+
+    def _drain_wakeup(self) -> None:
+        try:
+            while os.read(self._wakeup_r, self.READ_SIZE):  # type: ignore
+                pass
+        except BlockingIOError:
+            pass
+
+    def close(self) -> None:
+        """Release the selector and the wakeup pipe."""
+        if self._selector is None:
+            return
+        self._selector.close()
+        self._selector = None
+        for fd in (self._wakeup_r, self._wakeup_w):
+            if fd is not None:
+                os.close(fd)
+        self._wakeup_r = self._wakeup_w = None
+
+
 def normalize_url(url, default_scheme="http") -> ParseResult:
     """
     Normalize a URL by adding `http` as default if it's missing.
@@ -134,6 +476,163 @@ def escape_backslashes(s: str) -> Tuple[str, bool]:
     return s, n % 2 == 0
 
 
+def split_messages(stream: IO[bytes], delimiter: bytes, chunk_size: int = 65536) -> Iterator[bytes]:
+    """Split a binary stream into delimited messages.
+
+    The stream is read in chunks, so memory only grows with the largest message.
+    Empty messages are skipped.
+
+    Args:
+        stream (IO[bytes]): Binary stream to read from.
+        delimiter (bytes): Single byte message delimiter, e.g. b"\\n",
+            empty to read the whole stream as one message.
+        chunk_size (int, optional): Bytes to read at once. Defaults to 65536.
+
+    Yields:
+        bytes: One message without the delimiter.
+
+    Examples:
+        >>> list(split_messages(io.BytesIO(b"a\\nb\\n\\nc"), b"\\n"))
+        [b'a', b'b', b'c']
+    """
+    read = getattr(stream, "read1", stream.read)
+    splitter = MessageSplitter(delimiter)
+    while True:
+        chunk = read(chunk_size)
+        if not chunk:
+            break
+        yield from splitter.feed(chunk)
+    tail = splitter.flush()
+    if tail:
+        yield tail
+
+
+class MessageSplitter:
+    """Incrementally split chunks of bytes into delimited messages.
+
+    Pieces of an incomplete message are joined once its delimiter arrives,
+    so the cost stays linear in the message size. Empty messages are skipped.
+    """
+
+    __slots__ = ("_delimiter", "_parts")
+
+    def __init__(self, delimiter: bytes) -> None:
+        self._delimiter = delimiter
+        self._parts: list[bytes] = []
+
+    def feed(self, chunk: bytes) -> list[bytes]:
+        if not self._delimiter:
+            self._parts.append(chunk)
+            return []
+        *messages, tail = chunk.split(self._delimiter)
+        if messages and self._parts:
+            self._parts.append(messages[0])
+            messages[0] = b"".join(self._parts)
+            self._parts = []
+        if tail:
+            self._parts.append(tail)
+        return [message for message in messages if message]
+
+    def flush(self) -> bytes:
+        """Return what is left after the last delimiter."""
+        tail, self._parts = b"".join(self._parts), []
+        return tail
+
+
+def format_message_event(
+    direction: str,
+    opcode: int,
+    payload: Union[str, bytes],
+    size: int,
+    fin: bool = True,
+    endpoint: str = "",
+) -> str:
+    """One NDJSON line for a message or frame, text payloads as `text` and binary as `base64`.
+
+    The line is assembled from preformatted parts, only the payload goes through
+    the JSON string encoder, so high rate feeds are not held up by serialization.
+    """
+    if opcode == OPCODE_BINARY or (opcode == OPCODE_CONT and isinstance(payload, bytes)):
+        body = f'"base64":"{base64.b64encode(payload).decode("ascii")}"'  # type: ignore
+    else:
+        if isinstance(payload, bytes):
+            payload = payload.decode("utf8", "replace")
+        body = f'"text":{_json_string(payload)}'
+    return (
+        f'{{"type":"message","dir":"{direction}","opcode":"{OPCODE_NAMES.get(opcode, opcode)}",'
+        f'"size":{size},"fin":{"true" if fin else "false"},'
+        f'"mono":{time.monotonic():.6f},"wall":{time.time():.6f},'
+        + (f'"endpoint":{_json_string(endpoint)},' if endpoint else "")
+        + body
+        + "}"
+    )
+
+
+def format_event(kind: str, endpoint: str = "", **fields: Any) -> str:
+    """One NDJSON line for an event other than a message, like `status` or `close`."""
+    event: dict[str, Any] = {"type": kind, "mono": round(time.monotonic(), 6), "wall": round(time.time(), 6)}
+    if endpoint:
+        event["endpoint"] = endpoint
+    event.update(fields)
+    return json.dumps(event, ensure_ascii=False, separators=(",", ":"))
+
+
+def _replies_content_type(replies: list[bytes], delimiter: bytes) -> str:
+    """Content type of request mode replies, JSON ones are formatted by httpie."""
+    try:
+        for reply in replies:
+            json.loads(reply)
+    except ValueError:
+        try:
+            for reply in replies:
+                reply.decode("utf8")
+        except UnicodeDecodeError:
+            return "application/octet-stream"
+        return "text/plain; charset=utf-8"
+    if len(replies) == 1:
+        return "application/json"
+    return "application/x-ndjson" if delimiter == b"\n" else "application/octet-stream"
+
+
+def _endpoint_label(url: str) -> str:
+    """Short name of a fan-out endpoint, host and path of its URL."""
+    parsed = urlparse(url)
+    return f"{parsed.netloc}{parsed.path.rstrip('/')}" or url
+
+
+def map_file(source: IO[bytes]) -> Union[mmap.mmap, bytes]:
+    """Map a file read only, pages are loaded as they are sent and can be dropped again.
+
+    An empty file cannot be mapped and is returned as b"".
+    """
+    if not os.fstat(source.fileno()).st_size:
+        return b""
+    return mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def iter_fragments(
+    data: Union[mmap.mmap, bytes], opcode: int, size: int
+) -> Iterator[Tuple[int, bytes, int]]:
+    """Split one message into (opcode, payload, fin) frames of at most `size` bytes.
+
+    The first frame carries the message opcode, the others are continuation frames.
+    Only one fragment is copied out of `data` at a time.
+
+    Examples:
+        >>> list(iter_fragments(b"abcde", OPCODE_TEXT, 2))
+        [(1, b'ab', 0), (0, b'cd', 0), (0, b'e', 1)]
+    """
+    total = len(data)
+    offset = 0
+    while True:
+        fragment = data[offset : offset + size]
+        yield opcode, fragment, int(offset + size >= total)
+        offset += size
+        if offset >= total:
+            return
+        opcode = OPCODE_CONT
+
+
 class AdapterError(Exception):
     """Custom exception for adapter errors."""
 
@@ -145,256 +644,4016 @@ class AdapterError(Exception):
         return f"{self.code}: {self.msg}"
 
 
-class WebsocketAdapter(BaseAdapter):
-    """Adapter for handling WebSocket connections."""
+class MessageTooBig(Exception):
+    """An inbound message is larger than `HTTPIE_WS_MAX_SIZE`."""
 
-    __slots__ = ("_running", "_ws", "_ws_thread", "_stdout", "_stdout_lock")
 
-    ACTIVELY_CLOSE_REASON: bytes = b"KeyboardInterrupt"
+class FragmentDecoder:
+    """Turn the frames of one inbound message into output as they arrive.
 
-    def __init__(self):
-        super().__init__()
-        self._running = False
+    Text is decoded incrementally, so a character split between frames is kept
+    until its last byte arrives. Binary frames follow `HTTPIE_WS_BINARY`, the
+    `text` mode replaces invalid UTF-8 because the message cannot be written
+    as base64 once part of it is out.
+    """
 
-        self._ws: Optional[websocket.WebSocket] = None
-        self._ws_thread: threading.Thread = threading.Thread(target=self._receive, name="WSThread")
-        self._ws_thread.daemon = True
+    __slots__ = ("opcode", "mode", "_decoder", "_pending")
 
-        self._stdout: TextIO = sys.stdout
-        self._stdout_lock: threading.Lock = threading.Lock()
+    def __init__(self, opcode: int, binary_mode: str) -> None:
+        self.opcode: int = opcode
+        self.mode: str = "text" if opcode == OPCODE_TEXT else binary_mode
+        self._decoder = codecs.getincrementaldecoder("utf8")(
+            "strict" if opcode == OPCODE_TEXT else "replace"
+        )
+        # base64 encodes 3 byte groups, the rest waits for the next frame
+        self._pending: bytes = b""
 
-        # ws info
-        self._close_code: Optional[int] = None
-        self._close_msg: Optional[str] = None
+    def feed(self, data: bytes, fin: bool) -> Union[str, bytes]:
+        """Return the output of one frame, bytes in `raw` mode.
 
-    @property
-    def connected(self) -> bool:
-        return bool(self._ws and self._ws.connected)
+        Raises:
+            UnicodeDecodeError: A text message is not valid UTF-8.
+        """
+        if self.mode == "raw":
+            return data
+        if self.mode == "hex":
+            return data.hex()
+        if self.mode == "base64":
+            data = self._pending + data
+            cut = len(data) if fin else len(data) - len(data) % 3
+            self._pending = data[cut:]
+            return base64.b64encode(data[:cut]).decode("ascii")
+        return self._decoder.decode(data, fin)
 
-    @property
-    def close_code(self) -> int:
-        return self._close_code or 0
 
-    @property
-    def close_msg(self) -> str:
-        return self._close_msg or ""
+class LatencyHistogram:
+    """Fixed memory log-linear histogram of durations, HDR histogram style.
 
-    def convert2ws_headers(self, headers: Mapping) -> list[str]:
-        """Convert HTTP headers to WebSocket headers.
+    Values are kept in microseconds. Below 64us every value has its own bucket,
+    above that every power of two is split into 32 buckets, so a reported
+    percentile is within about 3% of the recorded value.
+    """
 
-        Args:
-            headers (Mapping): HTTP headers.
+    __slots__ = ("counts", "count", "total", "max")
 
-        Returns:
-            list[str]: WebSocket headers.
-        """
-        if not headers:
-            return []
-        headers = dict(headers)
-        ws_headers = []
+    SUB_BITS: int = 6
+    # Values above 2**40us (about 12 days) are clamped into the last bucket
+    MAX_SHIFT: int = 35
 
-        # Below headers already generated by websocket in handshake => _get_handshake_headers
-        # https://github.com/websocket-client/websocket-client/blob/master/websocket/_handshake.py#L83
-        ignore_keys = [
-            "upgrade",
-            "connection",
-            "origin",
-            "host",
-            "sec-websocket-key",
-            "sec-websocket-version",
-        ]
-        has_ua = False
-        for k, v in headers.items():
-            if k.lower() == "user-agent":
-                has_ua = True
-            if k.lower() in ignore_keys:
-                continue
-            if isinstance(v, bytes):
-                v = v.decode("utf-8")
-            ws_headers.append(f"{k}: {v}")
-        if not has_ua:
-            ws_headers.append(f"User-Agent: {headers.get('User-Agent', DEFAULT_UA)}")
-        return ws_headers
+    def __init__(self) -> None:
+        half = 1 << (self.SUB_BITS - 1)
+        self.counts: list[int] = [0] * ((1 << self.SUB_BITS) + self.MAX_SHIFT * half)
+        self.count: int = 0
+        # sum of the recorded values in microseconds
+        self.total: int = 0
+        self.max: int = 0
 
-    def _connect(self, request: PreparedRequest, **kwargs) -> None:
-        """Connect to the WebSocket if not already connected.
+    def _index(self, value: int) -> int:
+        shift = value.bit_length() - self.SUB_BITS
+        if shift <= 0:
+            return value
+        if shift > self.MAX_SHIFT:
+            return len(self.counts) - 1
+        half = 1 << (self.SUB_BITS - 1)
+        return (1 << self.SUB_BITS) + (shift - 1) * half + (value >> shift) - half
 
-        Args:
-            request (PreparedRequest): The request object.
-            **kwargs: Additional keyword arguments.
-        """
-        if self.connected:
-            return
-        options: dict[str, Any] = {}
+    def _value(self, index: int) -> int:
+        """Middle of the bucket range at `index`."""
+        full = 1 << self.SUB_BITS
+        if index < full:
+            return index
+        half = full >> 1
+        shift, sub = divmod(index - full, half)
+        shift += 1
+        return ((sub + half) << shift) + (1 << (shift - 1))
 
-        proxy = kwargs.get("proxies")
-        if proxy:
-            ignored = []
-            proxy_url = None
-            for idx, (_, host_port) in enumerate(proxy.items()):
-                proxy_url = normalize_url(url=host_port, default_scheme="http")
-                if idx > 0:
-                    ignored.append(proxy_url.geturl())
-                    continue
-                options["http_proxy_host"] = proxy_url.hostname
-                options["http_proxy_port"] = proxy_url.port or 80
-                options["proxy_type"] = proxy_url.scheme
-            if ignored:
-                msg = "\033[93mWarning: "
-                if proxy_url:
-                    msg += f"Using proxy {proxy_url.geturl()}. "
-                ignored = {i.decode("utf-8") if isinstance(i, bytes) else i for i in ignored}
-                msg += f"Proxy {', '.join(ignored)} is ignored because multiple proxies are not supported.\033[0m"
-                self._write_stdout(msg)
+    def record(self, seconds: float) -> None:
+        value = max(int(seconds * 1_000_000), 0)
+        self.counts[self._index(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
 
-        # --verify=yes/no
-        verify = kwargs.get("verify", True)
-        # IMPORTANT: httpie plugin not support specify ssl version and ciphers
-        cert: Optional[Union[HTTPieCertificate, str]] = kwargs.get("cert")
-        if not verify:
-            options["sslopt"] = {"cert_reqs": ssl.CERT_NONE}
-            if cert:
-                self._write_stdout(
-                    "\033[93mWarning: --cert is ignored because --verify is disabled.\033[0m"
-                )
-        else:
-            if isinstance(cert, HTTPieCertificate):
-                if cert.key_file:
-                    options["keyfile"] = Path(str(cert.key_file)).expanduser().resolve().as_posix()
-                if cert.key_file:
-                    options["certfile"] = (
-                        Path(str(cert.cert_file)).expanduser().resolve().as_posix()
-                    )
-                if cert.key_password:
-                    options["password"] = cert.key_password
-            elif isinstance(cert, str):
-                options["sslopt"] = {
-                    "cert_reqs": ssl.CERT_REQUIRED,
-                    "ca_certs": Path(cert).expanduser().resolve().as_posix(),
-                }
-        try:
-            self._ws = websocket.WebSocket(sslopt=options.get("sslopt"))
-            self._ws.connect(
-                request.url,
-                header=self.convert2ws_headers(request.headers),
-                timeout=kwargs.get("timeout", 4),
-                redirect_limit=30,  # HTTPie default
-                http_proxy_host=options.get("http_proxy_host"),
-                http_proxy_port=options.get("http_proxy_port"),
-                proxy_type=options.get("proxy_type"),
-                keyfile=options.get("keyfile"),
-                certfile=options.get("certfile"),
-                password=options.get("password"),
-            )
-        except (websocket.WebSocketException, OSError) as e:
-            raise AdapterError(500, f"Cannot connect to websocket: {str(e)}") from None
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, n in enumerate(other.counts):
+            if n:
+                self.counts[index] += n
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
 
-    def _receive(self):
-        """Receive messages from the WebSocket."""
-        while self._running and self.connected:
-            try:
-                resp_opcode, msg = self._ws.recv_data()  # type: ignore
-                if resp_opcode == ABNF.OPCODE_CLOSE and len(msg) >= 2:
-                    # received a close message
-                    self._close_code = struct.unpack("!H", msg[0:2])[0]
-                    self._close_msg = msg[2:]
-                    if isinstance(self._close_msg, bytes):
-                        self._close_msg = self._close_msg.decode(encoding="utf8")
-                else:
-                    if isinstance(msg, bytes):
-                        msg = msg.decode("utf8")
-                    self._write_stdout(msg)
-            except websocket.WebSocketTimeoutException:
-                continue
-            except websocket.WebSocketConnectionClosedException as e:
-                self._write_stdout(f"Connection closed: {str(e)}")
-                break
-            except OSError:
-                break
+    def percentile(self, q: float) -> float:
+        """Return the value at percentile `q` (0-100) in seconds."""
+        if not self.count:
+            return 0.0
+        rank = max(int(self.count * q / 100 + 0.5), 1)
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(self._value(index), self.max) / 1_000_000
+        return self.max / 1_000_000
 
-    def send(
-        self,
-        request,
-        stream=False,
-        timeout=None,
-        verify: Union[bool, str] = True,
-        cert=None,
+    def summary(self) -> str:
+        """Return p50/p90/p99/max in milliseconds."""
+        p50, p90, p99 = (self.percentile(q) * 1000 for q in (50, 90, 99))
+        return (
+            f"p50 {p50:.3f}, p90 {p90:.3f}, p99 {p99:.3f}, "
+            f"max {self.max / 1000:.3f} (n={self.count})"
+        )
+
+
+class SessionStats:
+    """Message and byte counters and latency histograms of one WebSocket session.
+
+    Round trip time pairs every inbound message with the oldest unanswered
+    outbound one, which matches request/reply and echo style protocols.
+    """
+
+    __slots__ = (
+        "msgs_in",
+        "msgs_out",
+        "bytes_in",
+        "bytes_out",
+        "errors",
+        "pings",
+        "rtt",
+        "ping_rtt",
+        "inter_arrival",
+        "opcodes_in",
+        "opcodes_out",
+        "close_codes",
+        "phases",
+        "writer_lag",
+        "_pending",
+        "_last_in",
+    )
+
+    # Unanswered send timestamps kept for round trip pairing
+    MAX_PENDING: int = 65536
+
+    def __init__(self) -> None:
+        self.msgs_in: int = 0
+        self.msgs_out: int = 0
+        self.bytes_in: int = 0
+        self.bytes_out: int = 0
+        self.errors: int = 0
+        self.pings: int = 0
+        self.rtt: LatencyHistogram = LatencyHistogram()
+        # keepalive ping to pong, answered pings are its count
+        self.ping_rtt: LatencyHistogram = LatencyHistogram()
+        self.inter_arrival: LatencyHistogram = LatencyHistogram()
+        # messages and bytes by opcode
+        self.opcodes_in: dict[int, list[int]] = {}
+        self.opcodes_out: dict[int, list[int]] = {}
+        # closed connections by close code
+        self.close_codes: dict[int, int] = {}
+        # connect timings by phase, see `on_connect`
+        self.phases: dict[str, LatencyHistogram] = {}
+        # time output waits in the buffer plus the time writing it to stdout blocks
+        self.writer_lag: LatencyHistogram = LatencyHistogram()
+        self._pending: Deque[float] = deque(maxlen=self.MAX_PENDING)
+        self._last_in: Optional[float] = None
+
+    def on_send(self, size: int, opcode: int = OPCODE_TEXT) -> None:
+        self.msgs_out += 1
+        self.bytes_out += size
+        self._pending.append(time.perf_counter())
+        counts = self.opcodes_out.get(opcode)
+        if counts is None:
+            counts = self.opcodes_out[opcode] = [0, 0]
+        counts[0] += 1
+        counts[1] += size
+
+    def on_receive(self, size: int, opcode: int = OPCODE_TEXT) -> None:
+        now = time.perf_counter()
+        self.msgs_in += 1
+        self.bytes_in += size
+        counts = self.opcodes_in.get(opcode)
+        if counts is None:
+            counts = self.opcodes_in[opcode] = [0, 0]
+        counts[0] += 1
+        counts[1] += size
+        if self._pending:
+            try:
+                self.rtt.record(now - self._pending.popleft())
+            except IndexError:
+                pass
+        if self._last_in is not None:
+            self.inter_arrival.record(now - self._last_in)
+        self._last_in = now
+
+    def on_connect(self, phases: Mapping[str, float]) -> None:
+        """Record the timings of one connect: `tcp`, `tls`, `upgrade` and the whole `connect`."""
+        for phase, seconds in phases.items():
+            histogram = self.phases.get(phase)
+            if histogram is None:
+                histogram = self.phases[phase] = LatencyHistogram()
+            histogram.record(seconds)
+
+    def on_close(self, code: Optional[int]) -> None:
+        """Count a closed connection, one without a close frame as 1006."""
+        code = code or STATUS_ABNORMAL_CLOSED
+        self.close_codes[code] = self.close_codes.get(code, 0) + 1
+
+    def merge(self, other: "SessionStats") -> None:
+        self.msgs_in += other.msgs_in
+        self.msgs_out += other.msgs_out
+        self.bytes_in += other.bytes_in
+        self.bytes_out += other.bytes_out
+        self.errors += other.errors
+        self.pings += other.pings
+        self.rtt.merge(other.rtt)
+        self.ping_rtt.merge(other.ping_rtt)
+        self.inter_arrival.merge(other.inter_arrival)
+        self.writer_lag.merge(other.writer_lag)
+        # Copied first, the other session may still be running
+        for mine, theirs in ((self.opcodes_in, other.opcodes_in), (self.opcodes_out, other.opcodes_out)):
+            for opcode, (messages, size) in list(theirs.items()):
+                counts = mine.setdefault(opcode, [0, 0])
+                counts[0] += messages
+                counts[1] += size
+        for code, n in list(other.close_codes.items()):
+            self.close_codes[code] = self.close_codes.get(code, 0) + n
+        for phase, histogram in list(other.phases.items()):
+            self.phases.setdefault(phase, LatencyHistogram()).merge(histogram)
+
+    def summary(self) -> str:
+        return "\n".join(
+            [
+                "Session stats:",
+                f"Messages: sent {self.msgs_out}, received {self.msgs_in}",
+                f"Bytes: sent {self.bytes_out}, received {self.bytes_in}",
+                f"Round trip (ms): {self.rtt.summary()}",
+                f"Inter-arrival (ms): {self.inter_arrival.summary()}",
+            ]
+        )
+
+    def keepalive_summary(self) -> str:
+        return "\n".join(
+            [
+                "Keepalive info:",
+                f"Pings: sent {self.pings}, answered {self.ping_rtt.count}",
+                f"Ping RTT (ms): {self.ping_rtt.summary()}",
+            ]
+        )
+
+
+# Quantiles of the latency summaries in exported metrics
+METRIC_QUANTILES = (0.5, 0.9, 0.99)
+
+# Name, type, help text and samples of one metric, a sample is its labels and a number,
+# or a histogram for summaries
+MetricFamily = Tuple[str, str, str, list[Tuple[dict[str, str], Union[int, float, LatencyHistogram]]]]
+
+
+def _escape_label(value: str) -> str:
+    """A label value of the text format, backslash, double quote and line feed escaped."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _metric_labels(labels: Mapping[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels.items()) + "}"
+
+
+def format_prometheus(families: list[MetricFamily]) -> str:
+    """Metrics in the Prometheus text format, latencies as summaries in seconds."""
+    lines = []
+    for name, kind, help_text, samples in families:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            if not isinstance(value, LatencyHistogram):
+                lines.append(f"{name}{_metric_labels(labels)} {value}")
+                continue
+            for q in METRIC_QUANTILES:
+                quantile = _metric_labels({**labels, "quantile": str(q)})
+                lines.append(f"{name}{quantile} {value.percentile(q * 100) if value.count else 'NaN'}")
+            lines.append(f"{name}_sum{_metric_labels(labels)} {value.total / 1_000_000}")
+            lines.append(f"{name}_count{_metric_labels(labels)} {value.count}")
+    return "\n".join(lines) + "\n"
+
+
+def format_metrics_json(families: list[MetricFamily]) -> str:
+    """Metrics as one JSON object by name, latencies with count, sum, quantiles and max in seconds."""
+    doc: dict[str, Any] = {}
+    for name, kind, help_text, samples in families:
+        values = []
+        for labels, value in samples:
+            if isinstance(value, LatencyHistogram):
+                values.append(
+                    {
+                        "labels": labels,
+                        "count": value.count,
+                        "sum": value.total / 1_000_000,
+                        "quantiles": {
+                            str(q): value.percentile(q * 100) if value.count else None
+                            for q in METRIC_QUANTILES
+                        },
+                        "max": value.max / 1_000_000,
+                    }
+                )
+            else:
+                values.append({"labels": labels, "value": value})
+        doc[name] = {"type": kind, "help": help_text, "values": values}
+    return json.dumps(doc, indent=2)
+
+
+def write_metrics_file(path: str, text: str) -> None:
+    """Replace the file at path at once, so a collector never reads half of it."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def serve_metrics(port: int, collect: Callable[[], list[MetricFamily]]) -> "ThreadingHTTPServer":
+    """Serve `/metrics` in the Prometheus text format and `/metrics.json` on localhost.
+
+    Raises:
+        OSError: The port cannot be bound.
+    """
+    # Only sessions exporting metrics pay for importing the HTTP server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            path = self.path.split("?", 1)[0]
+            if path == "/metrics":
+                body, content_type = format_prometheus(collect()), "text/plain; version=0.0.4"
+            elif path == "/metrics.json":
+                body, content_type = format_metrics_json(collect()), "application/json"
+            else:
+                self.send_error(404)
+                return
+            data = body.encode("utf8")
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            logger.debug("Metrics request: " + format % args)
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="WSMetrics", daemon=True).start()
+    return server
+
+
+# Path lookup result when a key or index is missing
+_MISSING = object()
+
+_PREDICATE = re.compile(r"^\s*(?P<path>[^\s=!<>]+)\s*(?:(?P<op>==|!=|>=|<=|>|<)\s*(?P<value>.+?))?\s*$")
+
+_COMPARE: dict[str, Callable[[Any, Any], bool]] = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+}
+
+
+def parse_path(expr: str) -> Tuple[Union[str, int], ...]:
+    """Parse a JSON path like `.data.trades[0].price` or `data.trades.0.price`.
+
+    Raises:
+        ValueError: The path is empty or malformed.
+    """
+    keys: list[Union[str, int]] = []
+    for part in expr.strip().lstrip(".").split("."):
+        name, *indexes = part.split("[")
+        if name:
+            keys.append(int(name) if name.isdigit() else name)
+        for index in indexes:
+            if not index.endswith("]"):
+                raise ValueError(expr)
+            keys.append(int(index[:-1]))
+    if not keys:
+        raise ValueError(expr)
+    return tuple(keys)
+
+
+def get_path(doc: Any, path: Tuple[Union[str, int], ...]) -> Any:
+    """Return the value at path, `_MISSING` if any step does not exist."""
+    for key in path:
+        try:
+            doc = doc[key]
+        except (KeyError, IndexError, TypeError):
+            return _MISSING
+    return doc
+
+
+class MessageFilter:
+    """Output filter of received messages, `HTTPIE_WS_MATCH`, `HTTPIE_WS_WHERE`
+    and `HTTPIE_WS_SELECT`.
+
+    The match runs on the raw payload before anything is decoded, so the
+    messages it drops cost one substring or regex search. Only the messages
+    left are parsed as JSON for the predicate and projection.
+    """
+
+    __slots__ = ("match", "where", "select", "matched_out", "rejected", "emitted")
+
+    def __init__(
+        self,
+        match: Optional[Union[bytes, "re.Pattern[bytes]"]] = None,
+        where: Optional[Tuple[Tuple[Union[str, int], ...], Optional[str], Any]] = None,
+        select: Optional[Tuple[Union[str, int], ...]] = None,
+    ) -> None:
+        self.match = match
+        # (path, operator, value), no operator tests that the value is truthy
+        self.where = where
+        self.select = select
+        # dropped by the match
+        self.matched_out: int = 0
+        # dropped by the predicate, or not JSON
+        self.rejected: int = 0
+        self.emitted: int = 0
+
+    def apply(self, payload: Union[str, bytes]) -> Optional[Union[str, bytes]]:
+        """Return what to write for a message, the projection as JSON text,
+        or None when the message is filtered out."""
+        match = self.match
+        if match is not None:
+            raw = payload.encode("utf8") if isinstance(payload, str) else payload
+            if not (match in raw if isinstance(match, bytes) else match.search(raw)):
+                self.matched_out += 1
+                return None
+        if self.where is None and self.select is None:
+            self.emitted += 1
+            return payload
+        try:
+            doc = json.loads(payload)
+        except ValueError:
+            self.rejected += 1
+            return None
+        if self.where is not None:
+            path, op, expected = self.where
+            value = get_path(doc, path)
+            try:
+                keep = bool(value) if op is None else (
+                    value is not _MISSING and _COMPARE[op](value, expected)
+                )
+            except TypeError:
+                keep = False
+            if value is _MISSING or not keep:
+                self.rejected += 1
+                return None
+        if self.select is not None:
+            value = get_path(doc, self.select)
+            if value is _MISSING:
+                self.rejected += 1
+                return None
+            payload = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        self.emitted += 1
+        return payload
+
+    def merge(self, other: "MessageFilter") -> None:
+        self.matched_out += other.matched_out
+        self.rejected += other.rejected
+        self.emitted += other.emitted
+
+    def summary(self) -> str:
+        return "\n".join(
+            [
+                "Filter info:",
+                f"Emitted: {self.emitted}, Filtered: {self.matched_out + self.rejected} "
+                f"(match {self.matched_out}, predicate {self.rejected})",
+            ]
+        )
+
+
+class TokenBucket:
+    """Token bucket of `rate` tokens per second holding at most `capacity`.
+
+    A take larger than the capacity waits for a full bucket and leaves it in
+    debt, so messages above the burst size still go out at the average rate.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "_updated")
+
+    def __init__(self, rate: float, capacity: float, now: Optional[float] = None) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic() if now is None else now
+
+    def delay(self, n: float, now: float) -> float:
+        """Seconds until `n` tokens can be taken, 0 if they can be now."""
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        missing = min(n, self.capacity) - self.tokens
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, n: float) -> None:
+        self.tokens -= n
+
+
+class SendScheduler:
+    """Queue and token buckets of the pacing sender, `HTTPIE_WS_SEND_RATE`,
+    `HTTPIE_WS_SEND_BYTE_RATE`, `HTTPIE_WS_SEND_BURST` and `HTTPIE_WS_COALESCE`.
+
+    The input side puts messages on a bounded queue, so a full queue pushes back
+    on the reader. The sender thread takes them off as the buckets allow.
+    """
+
+    __slots__ = (
+        "rate",
+        "byte_rate",
+        "burst",
+        "coalesce",
+        "queue",
+        "messages",
+        "bytes",
+        "done",
+        "sent",
+        "sent_bytes",
+        "writes",
+        "depth_max",
+        "depth_total",
+        "depth_samples",
+        "started",
+        "finished",
+    )
+
+    # Limits of one coalesced write
+    COALESCE_MESSAGES: int = 64
+    COALESCE_BYTES: int = 1 << 18
+
+    def __init__(
+        self, rate: float, byte_rate: float, burst: int, coalesce: bool, queue_size: int
+    ) -> None:
+        self.rate = rate
+        self.byte_rate = byte_rate
+        self.burst = max(burst, 1)
+        self.coalesce = coalesce
+        self.queue: "queue.Queue[Optional[Tuple[bytes, int]]]" = queue.Queue(max(queue_size, 1))
+        now = time.monotonic()
+        self.messages = TokenBucket(rate, self.burst, now) if rate > 0 else None
+        # A tenth of a second of traffic per message of burst
+        self.bytes = (
+            TokenBucket(byte_rate, byte_rate * self.burst / 10, now) if byte_rate > 0 else None
+        )
+        # set when the sender thread ends
+        self.done = threading.Event()
+        self.sent: int = 0
+        self.sent_bytes: int = 0
+        self.writes: int = 0
+        self.depth_max: int = 0
+        self.depth_total: int = 0
+        self.depth_samples: int = 0
+        self.started: float = now
+        self.finished: float = now
+
+    def put(self, item: Optional[Tuple[bytes, int]], alive: Callable[[], bool]) -> bool:
+        """Queue a message, blocking while the queue is full. False if it cannot be sent."""
+        while not self.done.is_set() and alive():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(self) -> Optional[Tuple[bytes, int]]:
+        depth = self.queue.qsize()
+        self.depth_max = max(self.depth_max, depth + 1)
+        self.depth_total += depth
+        self.depth_samples += 1
+        return self.queue.get()
+
+    def _delay(self, size: int) -> float:
+        now = time.monotonic()
+        return max(
+            self.messages.delay(1, now) if self.messages else 0.0,
+            self.bytes.delay(size, now) if self.bytes else 0.0,
+        )
+
+    def _take(self, size: int) -> None:
+        if self.messages:
+            self.messages.take(1)
+        if self.bytes:
+            self.bytes.take(size)
+
+    def acquire(self, size: int, stop: threading.Event) -> bool:
+        """Wait until a message of `size` bytes may go, False if `stop` is set first."""
+        while True:
+            delay = self._delay(size)
+            if delay <= 0:
+                self._take(size)
+                return True
+            if stop.wait(delay):
+                return False
+
+    def try_acquire(self, size: int) -> bool:
+        """Take the tokens of a message if it may go right away."""
+        if self._delay(size) > 0:
+            return False
+        self._take(size)
+        return True
+
+    def on_write(self, batch: list[Tuple[bytes, int]]) -> None:
+        self.sent += len(batch)
+        self.sent_bytes += sum(len(payload) for payload, _ in batch)
+        self.writes += 1
+        self.finished = time.monotonic()
+
+    def summary(self) -> str:
+        elapsed = max(self.finished - self.started, 1e-9)
+        target = ", ".join(
+            f"{rate:g} {unit}/s" for rate, unit in ((self.rate, "msg"), (self.byte_rate, "B"))
+            if rate > 0
+        )
+        mean_depth = self.depth_total / self.depth_samples if self.depth_samples else 0.0
+        return "\n".join(
+            [
+                "Sender info:",
+                f"Target: {target or 'unlimited'}, burst {self.burst}",
+                f"Achieved: {self.sent / elapsed:.1f} msg/s, {self.sent_bytes / elapsed:.1f} B/s "
+                f"over {elapsed:.2f}s",
+                f"Queue depth: max {self.depth_max}, mean {mean_depth:.1f}",
+                f"Writes: {self.writes} for {self.sent} messages",
+            ]
+        )
+
+
+class PerMessageDeflate:
+    """permessage-deflate (RFC 7692) negotiation and compression of one connection.
+
+    Messages are compressed as a whole, the trailing `00 00 ff ff` of the sync
+    flush is stripped on send and added back before inflating. Counters keep the
+    payload size before and after compression for the final report.
+    """
+
+    __slots__ = (
+        "window_bits",
+        "no_context_takeover",
+        "negotiated",
+        "response",
+        "client_window_bits",
+        "client_no_context_takeover",
+        "server_no_context_takeover",
+        "bytes_in",
+        "wire_in",
+        "bytes_out",
+        "wire_out",
+        "_compressor",
+        "_fragmented",
+        "_inflating",
+        "_decompressor",
+    )
+
+    EXTENSION: str = "permessage-deflate"
+    TAIL: bytes = b"\x00\x00\xff\xff"
+
+    def __init__(self, window_bits: int = 15, no_context_takeover: bool = False) -> None:
+        # offered parameters
+        self.window_bits: int = window_bits
+        self.no_context_takeover: bool = no_context_takeover
+        # accepted by the server
+        self.negotiated: bool = False
+        self.response: str = ""
+        self.client_window_bits: int = 15
+        self.client_no_context_takeover: bool = False
+        self.server_no_context_takeover: bool = False
+        self.bytes_in: int = 0
+        self.wire_in: int = 0
+        self.bytes_out: int = 0
+        self.wire_out: int = 0
+        self._compressor: Any = None
+        self._decompressor: Any = None
+        # in the middle of a fragmented message, sent or received
+        self._fragmented: bool = False
+        self._inflating: bool = False
+
+    @classmethod
+    def from_offer(cls, header: str) -> Optional["PerMessageDeflate"]:
+        """Take the parameters of a user supplied `Sec-WebSocket-Extensions` offer.
+
+        Returns:
+            PerMessageDeflate: None if the header does not offer permessage-deflate.
+        """
+        for extension in header.split(","):
+            name, *params = [p.strip() for p in extension.split(";")]
+            if name.lower() != cls.EXTENSION:
+                continue
+            deflate = cls()
+            for param in params:
+                key, _, value = param.partition("=")
+                key = key.strip().lower()
+                if key.endswith("_no_context_takeover"):
+                    deflate.no_context_takeover = True
+                elif key.endswith("_max_window_bits") and value:
+                    deflate.window_bits = min(
+                        deflate.window_bits, _to_window_bits(value.strip().strip('"'))
+                    )
+            return deflate
+        return None
+
+    def offer(self) -> str:
+        """Value of the `Sec-WebSocket-Extensions` request header."""
+        params = [self.EXTENSION]
+        if self.no_context_takeover:
+            params += ["client_no_context_takeover", "server_no_context_takeover"]
+        if self.window_bits < 15:
+            params += [
+                f"client_max_window_bits={self.window_bits}",
+                f"server_max_window_bits={self.window_bits}",
+            ]
+        else:
+            # Lets the server pick a smaller window for our side
+            params.append("client_max_window_bits")
+        return "; ".join(params)
+
+    def accept(self, header: Optional[str]) -> bool:
+        """Apply the server's `Sec-WebSocket-Extensions` response header.
+
+        Returns:
+            bool: Whether messages are compressed on this connection.
+
+        Raises:
+            ValueError: The server accepted something that was not offered.
+        """
+        # A reconnect negotiates again and starts with fresh compression contexts
+        self.negotiated = self.client_no_context_takeover = self.server_no_context_takeover = False
+        self._compressor = self._decompressor = None
+        self._fragmented = self._inflating = False
+        if not header:
+            return False
+        extensions = [e.strip() for e in header.split(",") if e.strip()]
+        if len(extensions) > 1:
+            raise ValueError("more than one extension accepted")
+        name, *params = [p.strip() for p in extensions[0].split(";")]
+        if name.lower() != self.EXTENSION:
+            raise ValueError(f"extension {name!r} was not offered")
+        self.client_window_bits = self.window_bits
+        for param in params:
+            key, _, value = param.partition("=")
+            key, value = key.strip().lower(), value.strip().strip('"')
+            if key == "server_no_context_takeover":
+                self.server_no_context_takeover = True
+            elif key == "client_no_context_takeover":
+                self.client_no_context_takeover = True
+            elif key == "server_max_window_bits":
+                # Inflating always uses the largest window, only check the value
+                if not 8 <= int(value) <= 15:
+                    raise ValueError(f"invalid {param!r}")
+            elif key == "client_max_window_bits":
+                self.client_window_bits = min(self.window_bits, _to_window_bits(value))
+            else:
+                raise ValueError(f"unknown parameter {param!r}")
+        self.negotiated = True
+        self.response = header
+        return True
+
+    def compress(self, data: bytes, fin: bool = True) -> bytes:
+        """Compress a message, or the next fragment of one until `fin`."""
+        if self._compressor is None or (
+            self.client_no_context_takeover and not self._fragmented
+        ):
+            self._compressor = zlib.compressobj(
+                zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -self.client_window_bits
+            )
+        out = self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        self._fragmented = not fin
+        # Only the end of the whole message drops the tail
+        if fin and out.endswith(self.TAIL):
+            out = out[:-4]
+        self.bytes_out += len(data)
+        self.wire_out += len(out)
+        return out
+
+    def decompress(self, data: bytes, fin: bool = True) -> bytes:
+        """Inflate a message, or the next fragment of one until `fin`."""
+        if self._decompressor is None or (
+            self.server_no_context_takeover and not self._inflating
+        ):
+            self._decompressor = zlib.decompressobj(-15)
+        self._inflating = not fin
+        try:
+            out = self._decompressor.decompress(data + self.TAIL if fin else data)
+        except zlib.error as e:
+            raise websocket.WebSocketPayloadException(f"Cannot inflate message: {e}") from None
+        self.bytes_in += len(out)
+        self.wire_in += len(data)
+        return out
+
+    def merge(self, other: "PerMessageDeflate") -> None:
+        self.negotiated = self.negotiated or other.negotiated
+        self.response = self.response or other.response
+        self.bytes_in += other.bytes_in
+        self.wire_in += other.wire_in
+        self.bytes_out += other.bytes_out
+        self.wire_out += other.wire_out
+
+    def summary(self) -> str:
+        if not self.negotiated:
+            return "Compression info:\nExtension: not accepted by the server"
+
+        def ratio(wire: int, size: int) -> str:
+            return f"{wire / size:.1%}" if size else "-"
+
+        return "\n".join(
+            [
+                "Compression info:",
+                f"Extension: {self.response}",
+                f"Sent: {self.bytes_out} bytes, {self.wire_out} compressed "
+                f"({ratio(self.wire_out, self.bytes_out)})",
+                f"Received: {self.bytes_in} bytes, {self.wire_in} compressed "
+                f"({ratio(self.wire_in, self.bytes_in)})",
+            ]
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def frame_buffer_class() -> type:
+    """Return the frame buffer class of the threaded engine for compression and size limits.
+
+    websocket-client rejects frames with reserved bits set. With `deflate`, RSV1
+    marks the first frame of a compressed message, it is cleared here and kept in
+    `compressed` until the next data message starts.
+
+    With `max_size`, the length of every data frame is checked before its payload
+    is read, so an oversized message is refused without buffering it.
+    The class is built on first use because its base class lives in websocket-client.
+    """
+
+    class FrameBuffer(websocket.frame_buffer):
+        def __init__(
+            self,
+            recv_fn: Callable[[int], bytes],
+            skip_utf8_validation: bool,
+            deflate: bool = False,
+            max_size: int = 0,
+        ) -> None:
+            super().__init__(recv_fn, skip_utf8_validation)
+            self.deflate = deflate
+            self.max_size = max_size
+            self.compressed: bool = False
+            self.message_size: int = 0
+
+        def recv_header(self) -> None:
+            super().recv_header()
+            if not self.deflate:
+                return
+            assert self.header is not None
+            fin, rsv1, rsv2, rsv3, opcode, has_mask, length_bits = self.header
+            if opcode in (OPCODE_TEXT, OPCODE_BINARY):
+                self.compressed = bool(rsv1)
+            elif rsv1:
+                raise websocket.WebSocketProtocolException("RSV1 set on a non data frame")
+            self.header = (fin, 0, rsv2, rsv3, opcode, has_mask, length_bits)
+
+        def recv_length(self) -> None:
+            super().recv_length()
+            assert self.header is not None and self.length is not None
+            opcode = self.header[4]
+            if not self.max_size or opcode not in (OPCODE_TEXT, OPCODE_BINARY, OPCODE_CONT):
+                return
+            if opcode != OPCODE_CONT:
+                self.message_size = 0
+            self.message_size += self.length
+            if self.message_size > self.max_size:
+                raise MessageTooBig(f"message larger than {self.max_size} bytes")
+
+    return FrameBuffer
+
+
+# Session log written by HTTPIE_WS_RECORD: every session starts with the magic,
+# then one header per frame followed by the payload
+RECORD_MAGIC: bytes = b"HWSLOG1\n"
+# direction, opcode, connection index, monotonic ns since the session start, payload length
+RECORD_HEADER = struct.Struct("!BBHQI")
+RECORD_MAX_PAYLOAD: int = 0xFFFFFFFF
+RECORD_IN: int = 0
+RECORD_OUT: int = 1
+# Set on the opcode of a fragment that more of its message follows
+RECORD_MORE: int = 0x80
+
+
+class SessionRecorder:
+    """Append frames to a session log from a background writer thread.
+
+    `record` only puts the frame on a queue, so the receiver never waits on the disk.
+    """
+
+    __slots__ = ("path", "frames", "_file", "_queue", "_thread", "_started")
+
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+        self.frames: int = 0
+        self._file: IO[bytes] = open(Path(path).expanduser(), "ab")
+        self._file.write(RECORD_MAGIC)
+        self._queue: "queue.SimpleQueue[Optional[bytes]]" = queue.SimpleQueue()
+        self._started: int = time.monotonic_ns()
+        self._thread = threading.Thread(target=self._write, name="WSRecord", daemon=True)
+        self._thread.start()
+
+    def record(
+        self,
+        direction: int,
+        opcode: int,
+        payload: Union[str, bytes],
+        conn: int = 0,
+        fin: bool = True,
+    ) -> None:
+        """Log a message, or a fragment of one with `fin` false on all but its last frame."""
+        if isinstance(payload, str):
+            payload = payload.encode("utf8")
+        if len(payload) > RECORD_MAX_PAYLOAD:
+            logger.warning(f"Not recording a frame of {len(payload)} bytes, the limit is 4 GiB")
+            return
+        if not fin:
+            opcode |= RECORD_MORE
+        self.frames += 1
+        self._queue.put(
+            RECORD_HEADER.pack(
+                direction, opcode, conn, time.monotonic_ns() - self._started, len(payload)
+            )
+            + payload
+        )
+
+    def _write(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            self._file.write(item)
+            if self._queue.empty():
+                self._file.flush()
+
+    def close(self) -> None:
+        """Write what is queued and close the log, safe to call twice."""
+        if self._file.closed:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+
+
+def read_session_log(stream: IO[bytes]) -> Iterator[Tuple[int, int, int, int, bytes]]:
+    """Yield (direction, opcode, connection, timestamp ns, payload) of a session log.
+
+    Timestamps restart at every session appended to the log. The opcode of a
+    fragment that more of its message follows has `RECORD_MORE` set.
+
+    Raises:
+        ValueError: The stream is not a session log or is truncated.
+    """
+    if stream.read(len(RECORD_MAGIC)) != RECORD_MAGIC:
+        raise ValueError("not a session log")
+    while True:
+        header = stream.read(RECORD_HEADER.size)
+        # A direction byte never matches the magic, skip appended session starts
+        while header.startswith(RECORD_MAGIC):
+            header = header[len(RECORD_MAGIC) :] + stream.read(len(RECORD_MAGIC))
+        if not header:
+            return
+        if len(header) < RECORD_HEADER.size:
+            raise ValueError("truncated session log")
+        direction, opcode, conn, timestamp, length = RECORD_HEADER.unpack(header)
+        payload = stream.read(length)
+        if len(payload) < length:
+            raise ValueError("truncated session log")
+        yield direction, opcode, conn, timestamp, payload
+
+
+def replay_schedule(stream: IO[bytes], speed: float = 1.0) -> Iterator[Tuple[float, int, bytes]]:
+    """Yield (offset in seconds, opcode, payload) of the outbound messages of a session log.
+
+    Offsets keep the recorded gaps divided by `speed`, the first message is at 0.
+    A speed of 0 or less sends without waiting. Recorded fragments are joined
+    into their message, sent at the time of its first fragment.
+    """
+    offset = 0.0
+    previous: Optional[int] = None
+    message_opcode = started = 0
+    parts: list[bytes] = []
+    for direction, opcode, _, timestamp, payload in read_session_log(stream):
+        if direction != RECORD_OUT:
+            continue
+        if opcode & ~RECORD_MORE in (OPCODE_TEXT, OPCODE_BINARY):
+            message_opcode, started, parts = opcode & ~RECORD_MORE, timestamp, [payload]
+        elif opcode & ~RECORD_MORE == OPCODE_CONT and parts:
+            parts.append(payload)
+        else:
+            continue
+        if opcode & RECORD_MORE:
+            continue
+        if previous is not None and speed > 0:
+            # Appended sessions restart the clock, they follow without a gap
+            offset += max(started - previous, 0) / 1e9 / speed
+        previous = started
+        yield offset, message_opcode, b"".join(parts) if len(parts) > 1 else parts[0]
+        parts = []
+
+
+class MessageBody(io.RawIOBase):
+    """Response body that httpie reads while the session writes its output to it.
+
+    Reads wait for output and return EOF once `finish` is called. At most `limit`
+    bytes are buffered, beyond that writes wait for the reader, so a slow consumer
+    stops the receiver from reading the socket instead of growing the buffer.
+    """
+
+    # httpie reads the HTTP version, and the status of failed downloads, off the raw response
+    version = 11
+
+    def __init__(self, limit: int = 1 << 20) -> None:
+        super().__init__()
+        self.status = 200
+        self.reason = "OK"
+        self.limit = limit
+        # set once the session is connected, or has failed to connect
+        self.opened: threading.Event = threading.Event()
+        self.streaming: bool = False
+        # Ctrl+C while reading, and closing the body before the session has ended
+        self.on_interrupt: Optional[Callable[[], None]] = None
+        self.on_close: Optional[Callable[[], None]] = None
+        self._chunks: Deque[bytes] = deque()
+        self._offset = 0
+        self._size = 0
+        self._cond = threading.Condition()
+        self._finished = False
+        # the reader is interrupted, writes stop waiting for it
+        self._draining = False
+
+    def start(self) -> None:
+        """The session is connected, hand the body to the reader."""
+        self.streaming = True
+        self.opened.set()
+
+    def readable(self) -> bool:
+        return True
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:  # type: ignore[override]
+        """Append data, waits while the buffer is full. Dropped once the body is closed."""
+        with self._cond:
+            while self._size >= self.limit and not (self._draining or self.closed):
+                self._cond.wait()
+            if data and not self.closed:
+                self._chunks.append(bytes(data))
+                self._size += len(data)
+                self._cond.notify_all()
+        return len(data)
+
+    def flush(self) -> None:
+        """Nothing to flush, and the writer must not fail once the reader closed the body."""
+
+    def finish(self) -> None:
+        """The session has ended, reads return what is left and then EOF."""
+        with self._cond:
+            self._finished = True
+            self._cond.notify_all()
+
+    def readinto(self, b: Any) -> int:
+        try:
+            return self._readinto(b)
+        except KeyboardInterrupt:
+            with self._cond:
+                self._draining = True
+                self._cond.notify_all()
+            if self.on_interrupt is None:
+                raise
+            self.on_interrupt()
+            # Wait for the session to end, pressing Ctrl+C again gives up
+            return self._readinto(b)
+
+    def _readinto(self, b: Any) -> int:
+        with self._cond:
+            while not self._chunks and not self._finished:
+                self._cond.wait()
+            n = 0
+            while self._chunks and n < len(b):
+                chunk = self._chunks[0]
+                size = min(len(chunk) - self._offset, len(b) - n)
+                b[n : n + size] = chunk[self._offset : self._offset + size]
+                n += size
+                self._offset += size
+                if self._offset == len(chunk):
+                    self._chunks.popleft()
+                    self._offset = 0
+            self._size -= n
+            self._cond.notify_all()
+            return n
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        with self._cond:
+            finished = self._finished
+            super().close()
+            self._chunks.clear()
+            self._cond.notify_all()
+        if not finished and self.on_close is not None:
+            self.on_close()
+
+
+class _BodyWriter:
+    """Text stream in place of stdout, writes to a `MessageBody`."""
+
+    def __init__(self, body: MessageBody) -> None:
+        # `_write_stdout_bytes` writes raw binary messages to the buffer
+        self.buffer = body
+
+    def write(self, text: str) -> int:
+        self.buffer.write(text.encode("utf8"))
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+    def isatty(self) -> bool:
+        return False
+
+
+class ResumingSSLContext(ssl.SSLContext):
+    """Client SSL context that offers the last TLS session of a host to its next connection.
+
+    Both engines wrap sockets without a session argument, websocket-client with
+    `wrap_socket` and asyncio with `wrap_bio`, so the session is filled in here.
+    The server falls back to a full handshake when it does not resume it.
+    Sessions cannot be exported with the `ssl` module, they last as long as the process.
+
+    The wrapped sockets and objects keep when their handshake started in `tls_started`,
+    and sockets when it finished in `tls_finished`, for the connect phase timings.
+    """
+
+    def __init__(self, protocol: int = ssl.PROTOCOL_TLS_CLIENT) -> None:
+        # The SSL context itself is created by SSLContext.__new__
+        self._sessions: dict[str, ssl.SSLSession] = {}
+        self._sessions_lock = threading.Lock()
+
+    def _session(self, server_hostname: Optional[str]) -> Optional[ssl.SSLSession]:
+        if not server_hostname:
+            return None
+        with self._sessions_lock:
+            return self._sessions.get(server_hostname)
+
+    def remember(self, server_hostname: str, ssl_object: Union[ssl.SSLSocket, ssl.SSLObject]) -> None:
+        """Keep the session of an established connection for the next one to the host.
+
+        TLS 1.3 sends session tickets after the handshake, call this once the
+        server's first bytes have been read.
+        """
+        session = ssl_object.session
+        if session is not None:
+            with self._sessions_lock:
+                self._sessions[server_hostname] = session
+
+    def wrap_socket(  # type: ignore[override]
+        self,
+        sock: socket.socket,
+        server_side: bool = False,
+        do_handshake_on_connect: bool = True,
+        suppress_ragged_eofs: bool = True,
+        server_hostname: Optional[str] = None,
+        session: Optional[ssl.SSLSession] = None,
+    ) -> ssl.SSLSocket:
+        started = time.perf_counter()
+        wrapped = super().wrap_socket(
+            sock,
+            server_side,
+            do_handshake_on_connect,
+            suppress_ragged_eofs,
+            server_hostname,
+            session or self._session(server_hostname),
+        )
+        if do_handshake_on_connect:
+            wrapped.tls_started = started  # type: ignore[attr-defined]
+            wrapped.tls_finished = time.perf_counter()  # type: ignore[attr-defined]
+            logger.debug(
+                f"TLS handshake with {server_hostname}: "
+                f"{(wrapped.tls_finished - started) * 1000:.1f}ms, "  # type: ignore[attr-defined]
+                f"resumed: {wrapped.session_reused}"
+            )
+        return wrapped
+
+    def wrap_bio(  # type: ignore[override]
+        self,
+        incoming: ssl.MemoryBIO,
+        outgoing: ssl.MemoryBIO,
+        server_side: bool = False,
+        server_hostname: Optional[str] = None,
+        session: Optional[ssl.SSLSession] = None,
+    ) -> ssl.SSLObject:
+        wrapped = super().wrap_bio(
+            incoming, outgoing, server_side, server_hostname, session or self._session(server_hostname)
+        )
+        # asyncio wraps the connected socket right before the handshake
+        wrapped.tls_started = time.perf_counter()  # type: ignore[attr-defined]
+        return wrapped
+
+
+def build_ssl_context(
+    verify: Union[bool, str] = True, cert: Optional[Union[HTTPieCertificate, str]] = None
+) -> ResumingSSLContext:
+    """Build an SSL context from httpie's `--verify` and `--cert` options.
+
+    A lone `--cert` path is used as CA bundle, as the threaded engine always did.
+
+    Args:
+        verify (Union[bool, str]): Verify the server certificate, or a CA bundle path.
+        cert (Union[HTTPieCertificate, str], optional): Client certificate or CA bundle path.
+
+    Returns:
+        ResumingSSLContext: The client context.
+
+    Raises:
+        OSError: A certificate or CA bundle cannot be loaded.
+    """
+    context = ResumingSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    keylog = os.environ.get("SSLKEYLOGFILE")
+    if keylog:
+        context.keylog_filename = keylog
+    if not verify:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        return context
+    cafile = verify if isinstance(verify, str) else None
+    if isinstance(cert, str):
+        cafile = Path(cert).expanduser().resolve().as_posix()
+    if cafile:
+        context.load_verify_locations(cafile)
+    else:
+        context.load_default_certs(ssl.Purpose.SERVER_AUTH)
+    if isinstance(cert, HTTPieCertificate):
+        context.load_cert_chain(
+            Path(str(cert.cert_file)).expanduser().resolve().as_posix(),
+            Path(str(cert.key_file)).expanduser().resolve().as_posix() if cert.key_file else None,
+            cert.key_password,
+        )
+    return context
+
+
+@functools.lru_cache(maxsize=8)
+def shared_ssl_context(
+    verify: Union[bool, str] = True, cert: Optional[Union[HTTPieCertificate, str]] = None
+) -> ResumingSSLContext:
+    """`build_ssl_context` once per set of options, shared by every connection of the
+    process, so certificates are loaded once and TLS sessions can be resumed.
+
+    Raises:
+        OSError: A certificate or CA bundle cannot be loaded.
+    """
+    return build_ssl_context(verify, cert)
+
+
+class AsyncConnection:
+    """A WebSocket client connection on asyncio streams, used by the asyncio engine.
+
+    Frames are built with websocket-client's ABNF like in the threaded engine.
+    Proxies and redirects are not supported.
+    """
+
+    GUID: str = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+    def __init__(self) -> None:
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.connected: bool = False
+        self.status: Optional[int] = None
+        self.headers: dict[str, str] = {}
+        # set once permessage-deflate is negotiated
+        self.deflate: Optional[PerMessageDeflate] = None
+        # called with the payload of every pong
+        self.on_pong: Optional[Callable[[bytes], None]] = None
+        # limit of an inbound message, 0 is unlimited
+        self.max_size: int = 0
+        # seconds spent in the connect phases, see `SessionStats.on_connect`
+        self.phases: dict[str, float] = {}
+        self._message_size: int = 0
+        self._compressed: bool = False
+
+    def getheaders(self) -> dict[str, str]:
+        return self.headers
+
+    async def connect(
+        self,
+        url: str,
+        header: list[str],
+        timeout: Optional[float] = None,
+        ssl_context: Optional[ssl.SSLContext] = None,
+    ) -> None:
+        """Open the TCP/TLS stream and perform the opening handshake."""
+        parsed = urlparse(url)
+        secure = parsed.scheme == "wss"
+        host = parsed.hostname or ""
+        port = parsed.port or (443 if secure else 80)
+        path = parsed.path or "/"
+        if parsed.query:
+            path += f"?{parsed.query}"
+        key = base64.b64encode(os.urandom(16)).decode()
+        lines = [
+            f"GET {path} HTTP/1.1",
+            f"Host: {parsed.netloc.rsplit('@', 1)[-1]}",
+            "Upgrade: websocket",
+            "Connection: Upgrade",
+            f"Sec-WebSocket-Key: {key}",
+            "Sec-WebSocket-Version: 13",
+            *header,
+        ]
+        started = time.perf_counter()
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(
+                host,
+                port,
+                ssl=(ssl_context or ssl.create_default_context()) if secure else None,
+                server_hostname=host if secure else None,
+            ),
+            timeout,
+        )
+        ready = time.perf_counter()
+        ssl_object = self.writer.get_extra_info("ssl_object") if secure else None
+        tls_started = getattr(ssl_object, "tls_started", None)
+        if not secure:
+            self.phases["tcp"] = ready - started
+        elif tls_started is not None:
+            self.phases["tcp"] = tls_started - started
+            self.phases["tls"] = ready - tls_started
+        if ssl_object is not None:
+            logger.debug(
+                f"TCP and TLS handshake with {host}: "
+                f"{(ready - started) * 1000:.1f}ms, resumed: {ssl_object.session_reused}"
+            )
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("utf8"))
+        try:
+            head = await asyncio.wait_for(self.reader.readuntil(b"\r\n\r\n"), timeout)
+        except asyncio.IncompleteReadError:
+            raise websocket.WebSocketConnectionClosedException(
+                "Connection closed during handshake"
+            ) from None
+        status_line, *header_lines = head.decode("latin-1").split("\r\n")
+        self.status = int(status_line.split(" ", 2)[1])
+        for line in header_lines:
+            if ":" in line:
+                k, v = line.split(":", 1)
+                self.headers[k.strip().lower()] = v.strip()
+        if self.status != 101:
+            raise websocket.WebSocketException(f"Handshake status {self.status}")
+        accept = base64.b64encode(hashlib.sha1((key + self.GUID).encode()).digest()).decode()
+        if self.headers.get("sec-websocket-accept") != accept:
+            raise websocket.WebSocketException("Invalid Sec-WebSocket-Accept header")
+        if ssl_object is not None and isinstance(ssl_context, ResumingSSLContext):
+            ssl_context.remember(host, ssl_object)
+        finished = time.perf_counter()
+        self.phases["upgrade"] = finished - ready
+        self.phases["connect"] = finished - started
+        self.connected = True
+
+    async def _recv_frame(self) -> Tuple[int, int, int, bytes]:
+        assert self.reader is not None
+        try:
+            b1, b2 = await self.reader.readexactly(2)
+            length = b2 & 0x7F
+            if length == 126:
+                (length,) = struct.unpack("!H", await self.reader.readexactly(2))
+            elif length == 127:
+                (length,) = struct.unpack("!Q", await self.reader.readexactly(8))
+            if self.max_size and b1 & 0x0F in (OPCODE_TEXT, OPCODE_BINARY, OPCODE_CONT):
+                if b1 & 0x0F != OPCODE_CONT:
+                    self._message_size = 0
+                self._message_size += length
+                # Checked before the payload is read
+                if self._message_size > self.max_size:
+                    raise MessageTooBig(f"message larger than {self.max_size} bytes")
+            mask = await self.reader.readexactly(4) if b2 & 0x80 else None
+            payload = await self.reader.readexactly(length)
+        except asyncio.IncompleteReadError:
+            self.connected = False
+            raise websocket.WebSocketConnectionClosedException(
+                "Connection to remote host was lost."
+            ) from None
+        if mask:
+            payload = websocket.ABNF.mask(mask, payload)
+        return b1 >> 7, b1 >> 6 & 1, b1 & 0x0F, payload
+
+    async def recv_data(self) -> Tuple[int, bytes]:
+        """Receive a complete message, answering pings on the way.
+
+        Raises:
+            WebSocketPayloadException: A text message is not valid UTF-8.
+
+        Returns:
+            tuple: Opcode and payload, a close frame is returned as is.
+        """
+        opcode: Optional[int] = None
+        compressed = False
+        fragments: list[bytes] = []
+        while True:
+            fin, rsv1, op, payload = await self._recv_frame()
+            if rsv1 and (self.deflate is None or op not in (OPCODE_TEXT, OPCODE_BINARY)):
+                raise websocket.WebSocketProtocolException("Unexpected RSV1 bit")
+            if op in (OPCODE_TEXT, OPCODE_BINARY):
+                opcode, compressed, fragments = op, bool(rsv1), [payload]
+            elif op == OPCODE_CONT:
+                fragments.append(payload)
+            elif op == OPCODE_PING:
+                await self.send(payload, OPCODE_PONG)
+                continue
+            elif op == OPCODE_PONG:
+                if self.on_pong is not None:
+                    self.on_pong(payload)
+                continue
+            elif op == OPCODE_CLOSE:
+                status = struct.unpack("!H", payload[:2])[0] if len(payload) >= 2 else STATUS_NORMAL
+                await self.close(status, b"")
+                return op, payload
+            else:
+                continue
+            if fin and opcode is not None:
+                data = b"".join(fragments)
+                if compressed and self.deflate is not None:
+                    data = self.deflate.decompress(data)
+                if opcode == OPCODE_TEXT:
+                    try:
+                        data.decode("utf8")
+                    except UnicodeDecodeError:
+                        raise websocket.WebSocketPayloadException(
+                            "Invalid UTF-8 in text message"
+                        ) from None
+                return opcode, data
+
+    async def recv_fragment(self) -> Tuple[int, bytes, int]:
+        """Receive the next frame of a message without joining fragments, answering pings.
+
+        Text is not checked, a character may span frames, see `FragmentDecoder`.
+
+        Returns:
+            tuple: Opcode, payload inflated if compressed and fin. Continuation
+                frames keep `OPCODE_CONT`, a close frame is returned as is.
+        """
+        while True:
+            fin, rsv1, op, payload = await self._recv_frame()
+            if rsv1 and (self.deflate is None or op not in (OPCODE_TEXT, OPCODE_BINARY)):
+                raise websocket.WebSocketProtocolException("Unexpected RSV1 bit")
+            if op in (OPCODE_TEXT, OPCODE_BINARY):
+                self._compressed = bool(rsv1)
+            elif op == OPCODE_PING:
+                await self.send(payload, OPCODE_PONG)
+                continue
+            elif op == OPCODE_PONG:
+                if self.on_pong is not None:
+                    self.on_pong(payload)
+                continue
+            elif op == OPCODE_CLOSE:
+                status = struct.unpack("!H", payload[:2])[0] if len(payload) >= 2 else STATUS_NORMAL
+                await self.close(status, b"")
+                return op, payload, 1
+            elif op != OPCODE_CONT:
+                continue
+            if self._compressed and self.deflate is not None:
+                payload = self.deflate.decompress(payload, bool(fin))
+            return op, payload, fin
+
+    async def send(
+        self, data: Union[str, bytes], opcode: int = OPCODE_TEXT, fin: int = 1
+    ) -> int:
+        """Send one frame and wait until the transport buffer drains.
+
+        Continuation frames are only sent by `WebsocketAdapter._async_send_file`,
+        they are compressed like the frame starting the message.
+        """
+        if not self.connected or self.writer is None:
+            raise websocket.WebSocketConnectionClosedException("socket is already closed.")
+        if self.deflate is not None and opcode in (OPCODE_TEXT, OPCODE_BINARY, OPCODE_CONT):
+            if isinstance(data, str):
+                data = data.encode("utf8")
+            abnf = websocket.ABNF.create_frame(self.deflate.compress(data, bool(fin)), opcode, fin)
+            # RSV1 marks the first frame of a compressed message
+            abnf.rsv1 = int(opcode != OPCODE_CONT)
+            frame = abnf.format()
+        else:
+            frame = websocket.ABNF.create_frame(data, opcode, fin).format()
+        self.writer.write(frame)
+        await self.writer.drain()
+        return len(frame)
+
+    async def close(self, status: int = STATUS_NORMAL, reason: bytes = b"") -> None:
+        if not self.connected or self.writer is None:
+            return
+        try:
+            await self.send(struct.pack("!H", status) + reason, OPCODE_CLOSE)
+        except (websocket.WebSocketException, OSError):
+            pass
+        self.connected = False
+        self.writer.close()
+
+    async def fail(self, status: int, reason: bytes, linger: float = 1.0) -> None:
+        """Close without reading the rest of the current message.
+
+        Inbound data is discarded until the server closes or `linger` passes, closing
+        with unread data would reset the connection before the server reads our close frame.
+        """
+        if not self.connected or self.writer is None:
+            return
+        try:
+            await self.send(struct.pack("!H", status) + reason, OPCODE_CLOSE)
+            if self.writer.can_write_eof():
+                self.writer.write_eof()
+            await asyncio.wait_for(self._discard(), linger)
+        except (websocket.WebSocketException, OSError, asyncio.TimeoutError):
+            pass
+        self.connected = False
+        self.writer.close()
+
+    async def _discard(self) -> None:
+        assert self.reader is not None
+        while await self.reader.read(65536):
+            pass
+
+    def abort(self) -> None:
+        """Drop the connection without the closing handshake, wakes up `recv_data`."""
+        self.connected = False
+        if self.writer is not None:
+            self.writer.transport.abort()
+
+
+class ConnectionPool:
+    """Idle connections of library mode, keyed by URL, handshake headers and TLS
+    and proxy options.
+
+    Connections idle longer than `idle_timeout` are closed when the pool is next
+    used. A connection is checked before reuse: if the server closed it or sent
+    anything but pings meanwhile, it is dropped and another one is used.
+    """
+
+    __slots__ = ("max_idle", "idle_timeout", "_idle", "_lock", "hits", "misses", "evicted")
+
+    def __init__(self, max_idle: int, idle_timeout: float) -> None:
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self._idle: dict[Hashable, list[Tuple["WebsocketAdapter", float]]] = {}
+        self._lock = threading.Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evicted: int = 0
+
+    def acquire(self, key: Hashable) -> Optional["WebsocketAdapter"]:
+        """Take an idle healthy connection for key, None if there is none."""
+        while True:
+            with self._lock:
+                stale = self._expire(time.monotonic())
+                idle = self._idle.get(key)
+                conn = idle.pop()[0] if idle else None
+            for old in stale:
+                old.close(status=STATUS_NORMAL, reason=b"")
+            if conn is None:
+                self.misses += 1
+                return None
+            if conn._pool_healthy():
+                self.hits += 1
+                return conn
+            logger.debug("Pooled connection closed by the server, dropped")
+            self.evicted += 1
+            conn.close(status=STATUS_NORMAL, reason=b"")
+
+    def release(self, key: Hashable, conn: "WebsocketAdapter") -> None:
+        """Put a connection back after use, close it if the pool is full."""
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if conn.connected and len(idle) < self.max_idle:
+                idle.append((conn, time.monotonic()))
+                return
+        conn.close(status=STATUS_NORMAL, reason=b"")
+
+    def _expire(self, now: float) -> list["WebsocketAdapter"]:
+        """Remove the connections idle for too long, the caller holds the lock and closes them."""
+        stale = []
+        for key, idle in list(self._idle.items()):
+            keep = [(c, t) for c, t in idle if now - t <= self.idle_timeout]
+            stale += [c for c, t in idle if now - t > self.idle_timeout]
+            if keep:
+                self._idle[key] = keep
+            else:
+                del self._idle[key]
+        self.evicted += len(stale)
+        return stale
+
+    def clear(self) -> None:
+        """Close every idle connection."""
+        with self._lock:
+            conns = [c for idle in self._idle.values() for c, _ in idle]
+            self._idle.clear()
+        for conn in conns:
+            conn.close(status=STATUS_NORMAL, reason=b"")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(idle) for idle in self._idle.values())
+
+
+class WebsocketAdapter(BaseAdapter):
+    """Adapter for handling WebSocket connections."""
+
+    __slots__ = (
+        "_running",
+        "_ws",
+        "_ws_thread",
+        "_stdout",
+        "_stdout_lock",
+        "_stdin_reader",
+        "_mode",
+        "_input_path",
+        "_delimiter",
+        "_drain",
+        "_last_recv",
+        "_echo",
+        "_stats",
+        "_report",
+        "_connections",
+        "_rate",
+        "_duration",
+        "_count",
+        "_show_stats",
+        "_engine",
+        "_receiver_ready",
+        "_flush_mode",
+        "_flush_interval",
+        "_flush_size",
+        "_out_buf",
+        "_out_size",
+        "_out_raw",
+        "_out_since",
+        "_flush_thread",
+        "_flush_stop",
+        "_binary_mode",
+        "_send_opcode",
+        "_compress",
+        "_record_path",
+        "_recorder",
+        "_record_conn",
+        "_replay_path",
+        "_replay_speed",
+        "_send_file",
+        "_fragment_size",
+        "_stream",
+        "_max_size",
+        "_fragments",
+        "_message_size",
+        "_ndjson",
+        "_body_mode",
+        "_body",
+        "_filter",
+        "_sender",
+        "_sender_thread",
+        "_pool",
+        "_metrics",
+        "_metrics_path",
+        "_metrics_format",
+        "_metrics_port",
+        "_metrics_server",
+        "_children",
+        "_replies",
+        "_reply_timeout",
+        "_correlate",
+        "_fanout",
+        "_broadcast",
+        "_parent",
+        "_tag",
+        "_mid_line",
+        "_reconnect",
+        "_reconnect_delay",
+        "_reconnect_max_delay",
+        "_reconnecting",
+        "_reconnects",
+        "_downtime",
+        "_outbox",
+        "_outbox_lock",
+        "_closing",
+        "_subscribe",
+        "_request",
+        "_connect_kwargs",
+        "_ping_interval",
+        "_ping_timeout",
+        "_ping_payload",
+        "_pong",
+        "_configured",
+        "_pool_args",
+    )
+
+    ACTIVELY_CLOSE_REASON: bytes = b"KeyboardInterrupt"
+    PING_TIMEOUT_REASON: bytes = b"keepalive ping timeout"
+
+    def __init__(self, pool_size: Optional[int] = None, pool_idle: Optional[float] = None):
+        """
+        Args:
+            pool_size (int, optional): Library mode, keep up to this many idle connections
+                per URL and options for the next request, `HTTPIE_WS_POOL_SIZE` by default.
+                0 runs every request as a session of its own.
+            pool_idle (float, optional): Seconds before an idle connection is closed,
+                `HTTPIE_WS_POOL_IDLE` by default.
+        """
+        super().__init__()
+        self._running = False
+        # HTTPie creates the adapter for every request, also to http:// URLs,
+        # the options are read by the first `send`, see `_configure`
+        self._configured = False
+        self._pool_args: Tuple[Optional[int], Optional[float]] = (pool_size, pool_idle)
+        self._ws: Optional[websocket.WebSocket] = None
+        self._stdout: TextIO = sys.stdout
+
+        # ws info
+        self._close_code: Optional[int] = None
+        self._close_msg: Optional[str] = None
+
+    def _configure(self) -> None:
+        """Read the options from the environment and set up the session state, once."""
+        if self._configured:
+            return
+        self._configured = True
+        pool_size, pool_idle = self._pool_args
+        if pool_size is None:
+            pool_size = getenv_option("POOL_SIZE", 0, int)
+        if pool_idle is None:
+            pool_idle = getenv_option("POOL_IDLE", 60.0, float)
+        # replies collected by request mode and pooled requests, see `_exchange`
+        self._replies: int = max(getenv_option("REPLIES", 1, int), 1)
+        # seconds to wait for them, 0 uses the request timeout
+        self._reply_timeout: float = getenv_option("REPLY_TIMEOUT", 0.0, float)
+        # JSON path of a correlation id, replies without the sent id are skipped
+        self._correlate: Optional[Tuple[Union[str, int], ...]] = getenv_option(
+            "CORRELATE", None, parse_path
+        )
+        # requests reuse connections and get the reply as body, see `_send_pooled`
+        self._pool: Optional[ConnectionPool] = (
+            ConnectionPool(pool_size, pool_idle) if pool_size > 0 else None
+        )
+
+        self._ws_thread: threading.Thread = threading.Thread(target=self._receive, name="WSThread")
+        self._ws_thread.daemon = True
+        # set by the receiver thread once it is running
+        self._receiver_ready: threading.Event = threading.Event()
+
+        self._stdout_lock: threading.Lock = threading.Lock()
+        self._stdin_reader: Optional[StdinReader] = None
+
+        # output flushing: "line" flushes every message, "size" once
+        # HTTPIE_WS_FLUSH_SIZE bytes are buffered, "interval" every
+        # HTTPIE_WS_FLUSH_INTERVAL seconds or when the size is reached
+        self._flush_mode: Optional[str] = getenv_option("FLUSH", None, _to_flush_mode)
+        self._flush_interval: float = getenv_option("FLUSH_INTERVAL", 0.1, float)
+        self._flush_size: int = getenv_option("FLUSH_SIZE", 65536, int)
+        self._out_buf: list[str] = []
+        self._out_size: int = 0
+        # raw bytes were written to the buffer under stdout and not flushed
+        self._out_raw: bool = False
+        # when the oldest buffered output was written, for the writer lag metric
+        self._out_since: float = 0.0
+        self._flush_thread: Optional[threading.Thread] = None
+        self._flush_stop: threading.Event = threading.Event()
+
+        # pipe mode options
+        self._mode: str = getenv_option("MODE", "auto", str.lower)
+        self._input_path: Optional[str] = getenv_option("INPUT")
+        self._delimiter: bytes = getenv_option(
+            "DELIMITER", MESSAGE_DELIMITERS["newline"], _to_delimiter
+        )
+        self._drain: float = getenv_option("DRAIN", 1.0, float)
+        # frame type of messages sent in pipe and load mode
+        self._send_opcode: int = getenv_option("OPCODE", OPCODE_TEXT, _to_opcode)
+        # "text" decodes binary frames as UTF-8 and falls back to base64,
+        # "raw" writes them unchanged to the binary stdout buffer
+        self._binary_mode: str = getenv_option("BINARY", "text", _to_binary_mode)
+        # one JSON object per event instead of bare payloads and status lines
+        self._ndjson: bool = getenv_option("OUTPUT", "text", _to_output_mode) == "ndjson"
+        # "messages" returns once connected and streams the output as response body
+        self._body_mode: str = getenv_option("BODY", "info", _to_body_mode)
+        self._body: Optional[MessageBody] = None
+        # received messages written only if they match, optionally projected
+        self._filter: Optional[MessageFilter] = None
+        match = getenv_option("MATCH", None, _to_match)
+        where = getenv_option("WHERE", None, _to_predicate)
+        select = getenv_option("SELECT", None, parse_path)
+        if match is not None or where is not None or select is not None:
+            self._filter = MessageFilter(match, where, select)
+        self._last_recv: float = 0.0
+
+        # print received messages, load mode only counts them
+        self._echo: bool = True
+        self._stats: SessionStats = SessionStats()
+        # extra sections appended to the final response body
+        self._report: list[str] = []
+
+        # load mode options
+        self._connections: int = getenv_option("CONNECTIONS", 1, int)
+        self._rate: float = getenv_option("RATE", 0.0, float)
+        self._duration: float = getenv_option("DURATION", 10.0, float)
+        self._count: int = getenv_option("COUNT", 0, int)
+
+        # append message counts and latency percentiles to the response body
+        self._show_stats: bool = getenv_option("STATS", False, _to_bool)
+
+        # metrics written to a file once the session ends, and served while it runs
+        self._metrics_path: Optional[str] = getenv_option("METRICS")
+        self._metrics_format: Optional[str] = getenv_option("METRICS_FORMAT", None, _to_metrics_format)
+        self._metrics_port: int = getenv_option("METRICS_PORT", 0, int)
+        self._metrics: bool = bool(self._metrics_path or self._metrics_port)
+        self._metrics_server: Optional[ThreadingHTTPServer] = None
+        # load mode and fan-out connections, until their counters are merged
+        self._children: list[WebsocketAdapter] = []
+
+        # "thread" runs a receiver thread per connection, "asyncio" one event loop
+        self._engine: str = getenv_option("ENGINE", "thread", str.lower)
+
+        # permessage-deflate offer, a Sec-WebSocket-Extensions request header replaces it
+        self._compress: Optional[PerMessageDeflate] = None
+        if getenv_option("COMPRESS", False, _to_bool):
+            self._compress = PerMessageDeflate(
+                window_bits=getenv_option("COMPRESS_WINDOW_BITS", 15, _to_window_bits),
+                no_context_takeover=getenv_option("COMPRESS_NO_CONTEXT_TAKEOVER", False, _to_bool),
+            )
+
+        # session log of every frame, and the log replayed in pipe mode
+        self._record_path: Optional[str] = getenv_option("RECORD")
+        self._recorder: Optional[SessionRecorder] = None
+        # load mode connections write to the parent's recorder under their index
+        self._record_conn: Optional[int] = None
+        self._replay_path: Optional[str] = getenv_option("REPLAY")
+        self._replay_speed: float = getenv_option("REPLAY_SPEED", 1.0, float)
+
+        # file sent as one fragmented message instead of pipe mode input
+        self._send_file: Optional[str] = getenv_option("SEND_FILE")
+        self._fragment_size: int = getenv_option("FRAGMENT_SIZE", 1 << 16, _to_fragment_size)
+
+        # pace pipe and replay mode sends with token buckets, optionally coalescing writes
+        self._sender: Optional[SendScheduler] = None
+        self._sender_thread: Optional[threading.Thread] = None
+        send_rate = getenv_option("SEND_RATE", 0.0, float)
+        send_byte_rate = getenv_option("SEND_BYTE_RATE", 0.0, float)
+        coalesce = getenv_option("COALESCE", False, _to_bool)
+        if send_rate > 0 or send_byte_rate > 0 or coalesce:
+            self._sender = SendScheduler(
+                send_rate,
+                send_byte_rate,
+                getenv_option("SEND_BURST", 1, int),
+                coalesce,
+                getenv_option("SEND_QUEUE", 1024, int),
+            )
+
+        # write every inbound frame as it arrives instead of whole messages
+        self._stream: bool = getenv_option("STREAM", False, _to_bool)
+        if self._stream and self._filter is not None:
+            logger.warning(f"{ENV_PREFIX}STREAM is ignored, filters need whole messages")
+            self._stream = False
+        # inbound messages above this size close the connection, 0 is unlimited
+        self._max_size: int = getenv_option("MAX_SIZE", 0, int)
+        # output of the streamed message in progress
+        self._fragments: Optional[FragmentDecoder] = None
+        self._message_size: int = 0
+
+        # more endpoints connected together with the request URL, output is merged
+        self._fanout: list[str] = getenv_option("FANOUT", [], _to_url_list)
+        # send input to every endpoint instead of the first one
+        self._broadcast: bool = getenv_option("BROADCAST", False, _to_bool)
+        # a fan-out endpoint writes through its parent, every line tagged with `_tag`
+        self._parent: Optional[WebsocketAdapter] = None
+        self._tag: str = ""
+        self._mid_line: bool = False
+
+        # reconnect attempts after the connection drops, 0 disables reconnecting
+        self._reconnect: int = getenv_option("RECONNECT", 0, int)
+        self._reconnect_delay: float = getenv_option("RECONNECT_DELAY", 0.5, float)
+        self._reconnect_max_delay: float = getenv_option("RECONNECT_MAX_DELAY", 30.0, float)
+        self._reconnecting: bool = False
+        self._reconnects: int = 0
+        self._downtime: float = 0.0
+        # messages sent while reconnecting, flushed once connected again
+        self._outbox: Deque[Tuple[Union[str, bytes], int]] = deque()
+        self._outbox_lock: threading.Lock = threading.Lock()
+        # set by `close`, interrupts the reconnect backoff
+        self._closing: threading.Event = threading.Event()
+        # sent after every connect, "@path" reads it from a file
+        self._subscribe: Optional[str] = getenv_option("SUBSCRIBE")
+        # kept by `_connect` for reconnecting
+        self._request: Optional[PreparedRequest] = None
+        self._connect_kwargs: dict = {}
+
+        # keepalive ping every interval seconds, 0 disables pings
+        self._ping_interval: float = getenv_option("PING_INTERVAL", 0.0, float)
+        # the connection is failed when a pong takes longer
+        self._ping_timeout: float = getenv_option("PING_TIMEOUT", 10.0, float)
+        # timestamp of the last ping, a pong echoes it back
+        self._ping_payload: bytes = b""
+        self._pong: threading.Event = threading.Event()
+
+    @property
+    def connected(self) -> bool:
+        return bool(self._ws and self._ws.connected)
+
+    @property
+    def _alive(self) -> bool:
+        """Whether messages can still be sent, now or after the reconnect."""
+        return self._running and (self.connected or self._reconnecting)
+
+    @property
+    def deflating(self) -> bool:
+        """Whether permessage-deflate was negotiated on the connection."""
+        return bool(self._compress and self._compress.negotiated)
+
+    @property
+    def close_code(self) -> int:
+        return self._close_code or 0
+
+    @property
+    def close_msg(self) -> str:
+        return self._close_msg or ""
+
+    def convert2ws_headers(self, headers: Mapping) -> list[str]:
+        """Convert HTTP headers to WebSocket headers.
+
+        Args:
+            headers (Mapping): HTTP headers.
+
+        Returns:
+            list[str]: WebSocket headers.
+        """
+        if not headers:
+            return [f"Sec-WebSocket-Extensions: {self._compress.offer()}"] if self._compress else []
+        headers = dict(headers)
+        ws_headers = []
+
+        # Below headers already generated by websocket in handshake => _get_handshake_headers
+        # https://github.com/websocket-client/websocket-client/blob/master/websocket/_handshake.py#L83
+        ignore_keys = [
+            "upgrade",
+            "connection",
+            "origin",
+            "host",
+            "sec-websocket-key",
+            "sec-websocket-version",
+        ]
+        has_ua = False
+        for k, v in headers.items():
+            if k.lower() == "user-agent":
+                has_ua = True
+            if k.lower() in ignore_keys:
+                continue
+            if k.lower() == "sec-websocket-extensions":
+                # Offered from `_compress`, see `_take_offer`
+                continue
+            if isinstance(v, bytes):
+                v = v.decode("utf-8")
+            ws_headers.append(f"{k}: {v}")
+        if not has_ua:
+            ws_headers.append(f"User-Agent: {headers.get('User-Agent', DEFAULT_UA)}")
+        if self._compress:
+            ws_headers.append(f"Sec-WebSocket-Extensions: {self._compress.offer()}")
+        return ws_headers
+
+    def _take_offer(self, headers: Optional[Mapping]) -> None:
+        """Use the parameters of a `Sec-WebSocket-Extensions` request header instead of
+        `HTTPIE_WS_COMPRESS`.
+
+        Frames of other extensions cannot be decoded, only a permessage-deflate offer is kept.
+        """
+        for k, v in (headers or {}).items():
+            if k.lower() != "sec-websocket-extensions":
+                continue
+            if isinstance(v, bytes):
+                v = v.decode("utf-8")
+            deflate = PerMessageDeflate.from_offer(v)
+            if deflate is None:
+                logger.warning(f"Unsupported websocket extensions are not offered: {v}")
+            else:
+                self._compress = deflate
+
+    def _child(self) -> "WebsocketAdapter":
+        """A configured adapter for another connection of this session."""
+        child = WebsocketAdapter(pool_size=0)
+        child._configure()
+        if self._compress:
+            # The same offer, with compression contexts and counters of its own
+            child._compress = PerMessageDeflate(
+                self._compress.window_bits, self._compress.no_context_takeover
+            )
+        return child
+
+    def _negotiate_extensions(self, headers: Optional[Mapping]) -> bool:
+        """Check the extensions accepted in the handshake response.
+
+        Returns:
+            bool: Whether permessage-deflate is used on the connection.
+
+        Raises:
+            AdapterError: The server accepted an extension that was not offered.
+        """
+        accepted = (headers or {}).get("sec-websocket-extensions")
+        if not accepted:
+            return False
+        try:
+            if self._compress is None:
+                raise ValueError("no extension was offered")
+            return self._compress.accept(accepted)
+        except ValueError as e:
+            raise AdapterError(
+                500, f"Cannot connect to websocket: invalid Sec-WebSocket-Extensions {accepted!r}, {e}"
+            ) from None
+
+    @staticmethod
+    def _ssl_context(
+        request: PreparedRequest,
+        verify: Union[bool, str],
+        cert: Optional[Union[HTTPieCertificate, str]],
+    ) -> Optional[ResumingSSLContext]:
+        """The shared SSL context for wss:// URLs, None for ws://.
+
+        Raises:
+            AdapterError: A certificate or CA bundle cannot be loaded.
+        """
+        if urlparse(request.url or "").scheme != "wss":
+            return None
+        try:
+            return shared_ssl_context(verify, cert)
+        except (OSError, ValueError) as e:
+            raise AdapterError(500, f"Cannot load certificates: {e}") from None
+
+    def _connect(self, request: PreparedRequest, **kwargs) -> None:
+        """Connect to the WebSocket if not already connected.
+
+        Sends `HTTPIE_WS_SUBSCRIBE` once connected, also after a reconnect.
+
+        Args:
+            request (PreparedRequest): The request object.
+            **kwargs: Additional keyword arguments.
+        """
+        if self.connected:
+            return
+        self._request, self._connect_kwargs = request, kwargs
+        options: dict[str, Any] = {}
+
+        proxy = kwargs.get("proxies")
+        if proxy:
+            ignored = []
+            proxy_url = None
+            for idx, (_, host_port) in enumerate(proxy.items()):
+                proxy_url = normalize_url(url=host_port, default_scheme="http")
+                if idx > 0:
+                    ignored.append(proxy_url.geturl())
+                    continue
+                options["http_proxy_host"] = proxy_url.hostname
+                options["http_proxy_port"] = proxy_url.port or 80
+                options["proxy_type"] = proxy_url.scheme
+            if ignored:
+                msg = "\033[93mWarning: "
+                if proxy_url:
+                    msg += f"Using proxy {proxy_url.geturl()}. "
+                ignored = {i.decode("utf-8") if isinstance(i, bytes) else i for i in ignored}
+                msg += f"Proxy {', '.join(ignored)} is ignored because multiple proxies are not supported.\033[0m"
+                self._write_status(msg)
+
+        # --verify=yes/no
+        verify = kwargs.get("verify", True)
+        # IMPORTANT: httpie plugin not support specify ssl version and ciphers
+        cert: Optional[Union[HTTPieCertificate, str]] = kwargs.get("cert")
+        if not verify and cert:
+            self._write_status(
+                "\033[93mWarning: --cert is ignored because --verify is disabled.\033[0m"
+            )
+        context = self._ssl_context(request, verify, cert)
+        if context is not None:
+            options["sslopt"] = {"context": context}
+        try:
+            # Compressed text is checked once inflated, see `_inflate`
+            self._ws = websocket.WebSocket(
+                sslopt=options.get("sslopt"), skip_utf8_validation=self._compress is not None
+            )
+            started = time.perf_counter()
+            self._ws.connect(
+                request.url,
+                header=self.convert2ws_headers(request.headers),
+                timeout=kwargs.get("timeout", 4),
+                redirect_limit=30,  # HTTPie default
+                http_proxy_host=options.get("http_proxy_host"),
+                http_proxy_port=options.get("http_proxy_port"),
+                proxy_type=options.get("proxy_type"),
+            )
+        except (websocket.WebSocketException, OSError) as e:
+            raise AdapterError(500, f"Cannot connect to websocket: {str(e)}") from None
+        self._stats.on_connect(self._connect_phases(started, getattr(self._ws, "sock", None)))
+        if context is not None and isinstance(self._ws.sock, ssl.SSLSocket):
+            # The handshake response has been read, so have TLS 1.3 session tickets
+            context.remember(urlparse(request.url).hostname or "", self._ws.sock)
+        try:
+            deflate = self._negotiate_extensions(self._ws.getheaders())
+        except AdapterError:
+            self._ws.close(status=STATUS_PROTOCOL_ERROR)
+            raise
+        if deflate or self._max_size:
+            buffer = self._ws.frame_buffer
+            # Compressed text is checked once inflated, see `_inflate`
+            self._ws.frame_buffer = frame_buffer_class()(
+                buffer.recv, deflate or buffer.skip_utf8_validation, deflate, self._max_size
+            )
+        self._fragments = None
+        subscribe = self._subscribe_message()
+        if subscribe is not None:
+            self._stats.on_send(len(subscribe))
+            if self._recorder:
+                self._recorder.record(RECORD_OUT, OPCODE_TEXT, subscribe, self._record_conn or 0)
+            if self._ndjson:
+                self._write_sent(OPCODE_TEXT, subscribe)
+            try:
+                self._raw_send(self._ws, subscribe, OPCODE_TEXT)
+            except (websocket.WebSocketException, OSError) as e:
+                raise AdapterError(500, f"Cannot send subscribe message: {e}") from None
+
+    @staticmethod
+    def _connect_phases(started: float, sock: Any) -> dict[str, float]:
+        """Connect phase timings of the threaded engine.
+
+        websocket-client connects and upgrades in one call, only the TLS handshake
+        of wss:// URLs tells where the TCP connect ends and the upgrade starts.
+        """
+        finished = time.perf_counter()
+        phases = {"connect": finished - started}
+        tls_started = getattr(sock, "tls_started", None)
+        if isinstance(tls_started, float):
+            phases["tcp"] = tls_started - started
+            phases["tls"] = sock.tls_finished - tls_started
+            phases["upgrade"] = finished - sock.tls_finished
+        return phases
+
+    def _subscribe_message(self) -> Optional[bytes]:
+        if not self._subscribe:
+            return None
+        if self._subscribe.startswith("@"):
+            try:
+                return Path(self._subscribe[1:]).expanduser().read_bytes().rstrip(b"\r\n")
+            except OSError as e:
+                raise AdapterError(500, f"Cannot read subscribe message: {e}") from None
+        return self._subscribe.encode("utf8")
+
+    def _inflate(self, opcode: int, msg: bytes) -> bytes:
+        """Inflate a message of the threaded engine and validate compressed text."""
+        if opcode not in (OPCODE_TEXT, OPCODE_BINARY) or self._compress is None:
+            return msg
+        if self.deflating and getattr(self._ws.frame_buffer, "compressed", False):
+            msg = self._compress.decompress(msg)
+        if opcode == OPCODE_TEXT:
+            try:
+                msg.decode("utf8")
+            except UnicodeDecodeError:
+                raise websocket.WebSocketPayloadException("Invalid UTF-8 in text message") from None
+        return msg
+
+    def _receive(self):
+        """Receive messages from the WebSocket, reconnecting if `HTTPIE_WS_RECONNECT` is set.
+
+        Keepalive pings run on their own thread as long as this receiver.
+        """
+        self._receiver_ready.set()
+        stop = threading.Event()
+        if self._ping_interval > 0:
+            threading.Thread(
+                target=self._keepalive, args=(stop,), name="WSKeepalive", daemon=True
+            ).start()
+        try:
+            while True:
+                self._receive_loop()
+                if not self._should_reconnect() or not self._reconnect_with_backoff():
+                    break
+        finally:
+            stop.set()
+            with self._outbox_lock:
+                self._reconnecting = False
+                if self._outbox:
+                    logger.warning(f"Connection lost, {len(self._outbox)} messages not sent")
+                    self._outbox.clear()
+            # Let the main loop notice the connection state change right away
+            owner = self._parent or self
+            if owner._stdin_reader:
+                owner._stdin_reader.wakeup()
+
+    def _should_reconnect(self) -> bool:
+        """Reconnect after a drop or any close but a normal one, unless we are closing."""
+        return (
+            self._reconnect > 0
+            and self._running
+            and self._request is not None
+            and self._close_code not in (STATUS_NORMAL, STATUS_MESSAGE_TOO_BIG)
+        )
+
+    def _reconnect_with_backoff(self) -> bool:
+        """Connect again with full jitter exponential backoff, then send what was buffered.
+
+        Returns:
+            bool: Whether the connection is up again.
+        """
+        with self._outbox_lock:
+            self._reconnecting = True
+        dropped = time.monotonic()
+        attempt = 0
+        while attempt < self._reconnect:
+            if self._ws is not None:
+                # Mark the old socket closed so `_connect` replaces it
+                self._ws.shutdown()
+            cap = min(self._reconnect_max_delay, self._reconnect_delay * 2**attempt)
+            delay = random.uniform(0, cap)
+            attempt += 1
+            logger.warning(
+                f"Connection lost, reconnecting in {delay:.2f}s ({attempt}/{self._reconnect})"
+            )
+            if self._closing.wait(delay):
+                return False
+            try:
+                self._connect(self._request, **self._connect_kwargs)  # type: ignore
+            except AdapterError as e:
+                logger.warning(e.msg)
+                continue
+            if not self._running:
+                return False
+            with self._outbox_lock:
+                try:
+                    while self._outbox:
+                        self._raw_send(self._ws, *self._outbox[0])
+                        self._outbox.popleft()
+                except (websocket.WebSocketException, OSError) as e:
+                    logger.warning(f"Connection lost while sending buffered messages: {e}")
+                    continue
+                self._reconnecting = False
+            self._reconnects += 1
+            self._downtime += time.monotonic() - dropped
+            self._stats.on_close(self._close_code)
+            self._close_code = self._close_msg = None
+            logger.warning(f"Reconnected after {time.monotonic() - dropped:.2f}s")
+            return True
+        logger.warning(f"Giving up after {self._reconnect} reconnect attempts")
+        return False
+
+    def _receive_loop(self):
+        keepalive = self._ping_interval > 0
+        while self._running and self.connected:
+            try:
+                if self._stream:
+                    opcode, fragment, fin = self._recv_fragment()
+                    self._last_recv = time.monotonic()
+                    self._on_fragment(opcode, fragment, fin)
+                    continue
+                if keepalive:
+                    resp_opcode, msg = self._ws.recv_data(control_frame=True)  # type: ignore
+                    if resp_opcode == OPCODE_PONG and self._on_pong(msg):
+                        self._pong.set()
+                    if resp_opcode in (OPCODE_PING, OPCODE_PONG):
+                        # websocket-client answers pings itself
+                        continue
+                else:
+                    resp_opcode, msg = self._ws.recv_data()  # type: ignore
+                self._last_recv = time.monotonic()
+                self._on_frame(resp_opcode, self._inflate(resp_opcode, msg))
+            except websocket.WebSocketTimeoutException:
+                continue
+            except websocket.WebSocketConnectionClosedException as e:
+                if self._running:
+                    self._stats.errors += 1
+                if self._echo:
+                    self._write_status(f"Connection closed: {str(e)}")
+                break
+            except OSError:
+                if self._running:
+                    self._stats.errors += 1
+                break
+            except MessageTooBig as e:
+                self._on_message_too_big(e)
+                self._fail_connection(STATUS_MESSAGE_TOO_BIG, self._close_msg.encode("utf8"))  # type: ignore
+                break
+            except websocket.WebSocketPayloadException as e:
+                self._on_invalid_payload(e)
+                self._fail_connection(STATUS_INVALID_PAYLOAD, self._close_msg.encode("utf8"))  # type: ignore
+                break
+            except websocket.WebSocketException as e:
+                # Protocol or payload error, fail the connection
+                if self._running:
+                    self._stats.errors += 1
+                    if self._close_code is None:
+                        self._close_code = STATUS_PROTOCOL_ERROR
+                        self._close_msg = str(e)
+                if self._echo:
+                    self._write_status(f"Connection closed: {str(e)}")
+                self._ws.shutdown()  # type: ignore
+                break
+
+    def _fail_connection(self, status: int, reason: bytes, linger: float = 1.0) -> None:
+        """Threaded version of `AsyncConnection.fail`, called by the receiver."""
+        ws = self._ws
+        try:
+            ws.send_close(status, reason)  # type: ignore
+            sock = ws.sock  # type: ignore
+            sock.shutdown(socket.SHUT_WR)
+            deadline = time.monotonic() + linger
+            while time.monotonic() < deadline:
+                sock.settimeout(max(deadline - time.monotonic(), 0.01))
+                if not sock.recv(65536):
+                    break
+        except (websocket.WebSocketException, OSError, AttributeError):
+            pass
+        ws.shutdown()  # type: ignore
+
+    def _recv_fragment(self) -> Tuple[int, bytes, int]:
+        """Threaded version of `AsyncConnection.recv_fragment`."""
+        ws = self._ws
+        while True:
+            frame = ws.recv_frame()  # type: ignore
+            if frame.opcode == OPCODE_PING:
+                ws.pong(frame.data)  # type: ignore
+            elif frame.opcode == OPCODE_PONG:
+                if self._on_pong(frame.data):
+                    self._pong.set()
+            elif frame.opcode == OPCODE_CLOSE:
+                ws.send_close()  # type: ignore
+                return frame.opcode, frame.data, 1
+            elif frame.opcode in (OPCODE_TEXT, OPCODE_BINARY, OPCODE_CONT):
+                data = frame.data
+                if self.deflating and getattr(ws.frame_buffer, "compressed", False):  # type: ignore
+                    data = self._compress.decompress(data, bool(frame.fin))  # type: ignore
+                return frame.opcode, data, frame.fin
+
+    def _on_fragment(self, opcode: int, data: bytes, fin: int) -> None:
+        """Write a frame in streaming mode before the rest of its message arrives.
+
+        Raises:
+            MessageTooBig: The message grew above `HTTPIE_WS_MAX_SIZE` once inflated.
+        """
+        if opcode == OPCODE_CLOSE:
+            self._on_frame(opcode, data)
+            return
+        if opcode == OPCODE_CONT:
+            if self._fragments is None:
+                raise websocket.WebSocketProtocolException("Continuation frame without a message")
+        elif self._fragments is not None:
+            raise websocket.WebSocketProtocolException("New message before the last one ended")
+        else:
+            # NDJSON encodes every binary frame on its own
+            self._fragments = FragmentDecoder(opcode, "raw" if self._ndjson else self._binary_mode)
+            self._message_size = 0
+        if self._recorder:
+            self._recorder.record(RECORD_IN, opcode, data, self._record_conn or 0, bool(fin))
+        self._message_size += len(data)
+        if self._max_size and self._message_size > self._max_size:
+            raise MessageTooBig(f"message larger than {self._max_size} bytes")
+        try:
+            out = self._fragments.feed(data, bool(fin))
+        except UnicodeDecodeError:
+            if opcode != OPCODE_CONT:
+                # Nothing of the message was written
+                self._fragments = None
+            raise websocket.WebSocketPayloadException("Invalid UTF-8 in text message") from None
+        if self._echo and self._ndjson:
+            self._write_stdout(
+                format_message_event(
+                    "in", opcode, out, len(data), bool(fin), endpoint=self._tag
+                )
+            )
+        elif self._echo:
+            if isinstance(out, bytes):
+                self._write_stdout_bytes(out)
+            elif out or fin:
+                self._write_stdout(out, newline=bool(fin))
+        if fin:
+            self._stats.on_receive(self._message_size, self._fragments.opcode)
+            self._fragments = None
+
+    def _on_message_too_big(self, e: MessageTooBig) -> None:
+        logger.warning(f"Closing the connection, {e}")
+        self._stats.errors += 1
+        self._close_code = STATUS_MESSAGE_TOO_BIG
+        self._close_msg = "message too big"
+        self._drop_fragments()
+
+    def _drop_fragments(self) -> None:
+        """Forget the message being streamed, ending the line it was written on."""
+        if (
+            self._fragments is not None
+            and self._fragments.mode != "raw"
+            and self._echo
+            and not self._ndjson
+        ):
+            # End the partly written message
+            self._write_stdout("")
+        self._fragments = None
+
+    def _on_invalid_payload(self, e: Exception) -> None:
+        """Text that is not UTF-8 or a message that cannot be inflated fails the connection."""
+        logger.warning(f"Closing the connection, {e}")
+        self._stats.errors += 1
+        self._close_code = STATUS_INVALID_PAYLOAD
+        self._close_msg = "invalid payload"
+        self._drop_fragments()
+
+    def _keepalive(self, stop: threading.Event) -> None:
+        """Ping every `HTTPIE_WS_PING_INTERVAL` seconds until `stop` is set,
+        fail the connection when a pong takes longer than `HTTPIE_WS_PING_TIMEOUT`.
+        """
+        while not stop.wait(self._ping_interval):
+            ws = self._ws
+            if ws is None or not ws.connected:
+                # Reconnecting, ping the next connection
+                continue
+            self._pong.clear()
+            self._ping_payload = struct.pack("!Q", time.monotonic_ns())
+            try:
+                ws.ping(self._ping_payload)
+            except (websocket.WebSocketException, OSError):
+                # The receiver notices the broken connection
+                continue
+            self._stats.pings += 1
+            if self._pong.wait(self._ping_timeout) or stop.is_set() or ws is not self._ws:
+                continue
+            self._on_ping_timeout()
+            try:
+                # A dead peer must not block the close frame
+                ws.settimeout(1)
+                ws.send_close(STATUS_UNEXPECTED_CONDITION, self.PING_TIMEOUT_REASON)
+            except (websocket.WebSocketException, OSError):
+                pass
+            # Wakes up the receiver blocked in recv
+            ws.abort()
+
+    def _on_pong(self, payload: bytes) -> bool:
+        """Record the round trip of a pong, return whether it answers the last ping."""
+        if len(payload) != 8 or payload != self._ping_payload:
+            # Unsolicited pongs are allowed and carry no timing
+            return False
+        sent = struct.unpack("!Q", payload)[0]
+        self._stats.ping_rtt.record((time.monotonic_ns() - sent) / 1e9)
+        return True
+
+    def _on_ping_timeout(self) -> None:
+        logger.warning(f"No pong within {self._ping_timeout}s, closing the connection")
+        self._close_code = STATUS_UNEXPECTED_CONDITION
+        self._close_msg = self.PING_TIMEOUT_REASON.decode("utf8")
+
+    def _on_frame(self, opcode: int, msg: Union[str, bytes]) -> None:
+        """Handle a complete inbound message, shared by both engines."""
+        if self._recorder:
+            self._recorder.record(RECORD_IN, opcode, msg, self._record_conn or 0)
+        if opcode == OPCODE_CLOSE:
+            if len(msg) >= 2:
+                # received a close message
+                self._close_code = struct.unpack("!H", msg[0:2])[0]
+                self._close_msg = msg[2:]
+                if isinstance(self._close_msg, bytes):
+                    self._close_msg = self._close_msg.decode(encoding="utf8")
+            if self._ndjson and self._echo:
+                self._write_stdout(
+                    format_event(
+                        "close", self._tag, dir="in", code=self._close_code, reason=self._close_msg
+                    )
+                )
+            return
+        self._stats.on_receive(len(msg), opcode)
+        if not self._echo:
+            return
+        if self._filter is not None:
+            filtered = self._filter.apply(msg)
+            if filtered is None:
+                return
+            if filtered is not msg:
+                # A projection is JSON text whatever the message was
+                msg, opcode = filtered, OPCODE_TEXT
+        if self._ndjson:
+            self._write_stdout(format_message_event("in", opcode, msg, len(msg), endpoint=self._tag))
+            return
+        if opcode == OPCODE_BINARY and isinstance(msg, bytes):
+            self._write_binary(msg)
+            return
+        if isinstance(msg, bytes):
+            msg = msg.decode("utf8")
+        self._write_stdout(msg)
+
+    def _write_binary(self, data: bytes) -> None:
+        """Write a binary frame as `HTTPIE_WS_BINARY` asks, without going through str for raw."""
+        if self._binary_mode == "raw":
+            self._write_stdout_bytes(data)
+            return
+        if self._binary_mode == "hex":
+            text = data.hex()
+        elif self._binary_mode == "base64":
+            text = base64.b64encode(data).decode("ascii")
+        else:
+            try:
+                text = data.decode("utf8")
+            except UnicodeDecodeError:
+                text = f"base64:{base64.b64encode(data).decode('ascii')}"
+        self._write_stdout(text)
+
+    def send(
+        self,
+        request,
+        stream=False,
+        timeout=None,
+        verify: Union[bool, str] = True,
+        cert=None,
         proxies=None,
     ):
         """Send a request to the WebSocket.
 
-        Will receive a string if only passed `--cert=path/to/cert`,
-        or a HTTPieCertificate object if `--cert-key` passed, like `--cert=path/to/cert --cert-key=path/to/key`
+        Will receive a string if only passed `--cert=path/to/cert`,
+        or a HTTPieCertificate object if `--cert-key` passed, like `--cert=path/to/cert --cert-key=path/to/key`
+
+        Args:
+            request (PreparedRequest): The request object.
+            stream (bool): Whether to stream the response.
+            timeout (float): The timeout in seconds.
+            verify (Union[bool, str]): Whether to verify the SSL certificate.
+            cert (Union[HTTPieCertificate, str]): The path to the SSL certificate.
+            proxies (dict): The proxies to use.
+
+        Returns:
+            Response: Handshake response info.
+        """
+        _setup_logging()
+        self._configure()
+        self._running = True
+        logger.debug(
+            f"ws connecting. stream: {stream}, verify: {verify}, proxy: {proxies}, timeout: {timeout}"
+        )
+        logger.debug(f"received headers: {request.headers}")
+
+        kwargs = dict(stream=stream, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+        if not self._metrics:
+            return self._dispatch(request, **kwargs)
+        self._start_metrics()
+        try:
+            return self._dispatch(request, **kwargs)
+        finally:
+            # A streamed body writes them once its session ends, see `_finish_body`
+            if self._body is None or not self._body.streaming:
+                self._finish_metrics()
+
+    def _dispatch(self, request: PreparedRequest, **kwargs) -> Response:
+        """Run the session the options ask for."""
+        self._take_offer(request.headers)
+        if self._pool is not None:
+            return self._send_pooled(request, **kwargs)
+        if self._record_path:
+            try:
+                self._recorder = SessionRecorder(self._record_path)
+            except OSError as e:
+                self.close()
+                return self.dummy_response(request, 500, f"Cannot open record log: {e}")
+        if self._mode == "request":
+            return self._send_request_mode(request, **kwargs)
+        if self._connections > 1 or self._mode == "load":
+            return self._send_load(request, **kwargs)
+        if self._fanout:
+            return self._send_fanout(request, **kwargs)
+        if self._body_mode == "messages":
+            return self._send_streaming(request, **kwargs)
+        return self._send_session(request, **kwargs)
+
+    def _send_session(self, request: PreparedRequest, **kwargs) -> Response:
+        """Run an interactive or pipe mode session on one connection."""
+        try:
+            pipe_source = self._pipe_source(request)
+        except (OSError, ValueError) as e:
+            self.close()
+            return self.dummy_response(request, 500, f"Cannot open input: {e}")
+
+        if self._use_asyncio(kwargs.get("proxies"), interactive=pipe_source is None):
+            return self._send_async(request, pipe_source, **kwargs)
+
+        started = time.perf_counter()
+        try:
+            self._connect(request, **kwargs)
+        except AdapterError as e:
+            self._close_source(pipe_source)
+            self.close()
+            return self.dummy_response(request, e.code, e.msg)
+        connected = time.perf_counter()
+        if self._body is not None:
+            self._body.start()
+
+        self._start_output(interactive=pipe_source is None)
+        self._ws_thread.start()
+        self._receiver_ready.wait(1)
+        logger.debug(
+            f"startup: connect {(connected - started) * 1000:.1f}ms, "
+            f"receiver ready {(time.perf_counter() - connected) * 1000:.1f}ms"
+        )
+
+        try:
+            if pipe_source is not None:
+                self._pipe_loop(pipe_source)
+            else:
+                self._write_status(
+                    f"> Connected to {request.url}\n"
+                    "> Type a message and press enter to send it.\n"
+                    "> The backslash at the end of a line is treated as input not ended.\n"
+                    "> Press Ctrl+C to close the connection."
+                )
+                self._interactive_loop()
+        except KeyboardInterrupt:
+            self._write_status("\nOops! Disconnecting. Need to force quit? Press again!")
+            self._close_code = STATUS_ABNORMAL_CLOSED
+            self._close_msg = self.ACTIVELY_CLOSE_REASON.decode("utf8")
+        finally:
+            self._close_source(pipe_source)
+            self.close()
+
+        return self.dummy_response(request)
+
+    def _send_streaming(self, request: PreparedRequest, **kwargs) -> Response:
+        """`HTTPIE_WS_BODY=messages`: run the session in a thread and return once connected,
+        with a response body that httpie reads while the messages arrive.
+
+        Status lines and the session info go to stderr instead.
+        """
+        body = self._body = MessageBody()
+        body.on_interrupt = self._interrupt
+        body.on_close = self.close
+        self._stdout = _BodyWriter(body)  # type: ignore[assignment]
+        outcome: list[Union[Response, BaseException]] = []
+
+        def run() -> None:
+            try:
+                outcome.append(self._send_session(request, **kwargs))
+            except BaseException as e:
+                outcome.append(e)
+            finally:
+                if body.streaming:
+                    self._finish_body(outcome)
+                else:
+                    # Not connected, `send` returns the error response
+                    body.opened.set()
+
+        thread = threading.Thread(target=run, name="WSSession", daemon=True)
+        thread.start()
+        body.opened.wait()
+        if not body.streaming:
+            thread.join()
+            if isinstance(outcome[0], BaseException):
+                raise outcome[0]
+            return outcome[0]
+        r = Response()
+        r.status_code = 200
+        r.reason = "OK"
+        r.request = request
+        r.url = request.url or ""
+        r.encoding = "utf-8"
+        r.headers = CaseInsensitiveDict(self._ws.getheaders() if self._ws else {})
+        if self._ndjson:
+            r.headers["Content-Type"] = "application/x-ndjson"
+        elif self._binary_mode == "raw":
+            r.headers["Content-Type"] = "application/octet-stream"
+        else:
+            r.headers["Content-Type"] = "text/plain; charset=utf-8"
+        r.raw = body
+        return r
+
+    def _finish_body(self, outcome: list[Union[Response, BaseException]]) -> None:
+        """End the streamed body, with the session info or the error on stderr."""
+        try:
+            if outcome and isinstance(outcome[0], BaseException):
+                logger.error(f"Websocket session failed: {outcome[0]!r}")
+            else:
+                sys.stderr.write("\n\n".join(self._info_sections()) + "\n")
+                sys.stderr.flush()
+            if self._metrics:
+                self._finish_metrics()
+        finally:
+            self._body.finish()  # type: ignore[union-attr]
+
+    def _interrupt(self) -> None:
+        """Ctrl+C while httpie reads the streamed body, close like the session would."""
+        self._write_status("\nOops! Disconnecting. Need to force quit? Press again!")
+        self._close_code = STATUS_ABNORMAL_CLOSED
+        self._close_msg = self.ACTIVELY_CLOSE_REASON.decode("utf8")
+        self.close()
+
+    def _interactive_loop(self) -> None:
+        """Send lines typed on stdin until the connection closes."""
+        self._stdin_reader = StdinReader()
+        input_end: bool
+        msg: str = ""
+        while self._alive:
+            for chars in self._stdin_reader.read_lines():
+                if not chars:
+                    continue
+                if not self._alive:
+                    self._write_status(f"Websocket closed, message not sent: {chars}")
+                    break
+                chars, input_end = escape_backslashes(chars)
+                msg += chars
+                if input_end is True:
+                    self.send_msg(msg)
+                    msg = ""
+
+    def _pipe_source(self, request: PreparedRequest) -> Optional[IO[bytes]]:
+        """Pick the input stream for pipe mode, None means interactive mode.
+
+        `HTTPIE_WS_REPLAY` wins, then `HTTPIE_WS_SEND_FILE`, then `HTTPIE_WS_INPUT`, then the request body
+        (httpie reads piped stdin into it), then stdin itself when it is a pipe or
+        a regular file. `HTTPIE_WS_MODE=interactive` or `pipe` overrides the detection.
+
+        Raises:
+            OSError: The input cannot be opened.
+            ValueError: The replay log is not a session log.
+        """
+        if self._replay_path:
+            source = open(Path(self._replay_path).expanduser(), "rb")
+            if source.read(len(RECORD_MAGIC)) != RECORD_MAGIC:
+                source.close()
+                raise ValueError(f"{self._replay_path} is not a session log")
+            source.seek(0)
+            return source
+        if self._send_file:
+            return open(Path(self._send_file).expanduser(), "rb")
+        if self._mode == "interactive":
+            return None
+        if self._input_path:
+            if self._input_path == "-":
+                return sys.stdin.buffer
+            return open(Path(self._input_path).expanduser(), "rb")
+        body = request.body
+        if body:
+            if isinstance(body, str):
+                body = body.encode("utf8")
+            if isinstance(body, bytes):
+                return io.BytesIO(body)
+            if hasattr(body, "read"):
+                return body
+            return io.BytesIO(b"".join(body))
+        if self._mode == "pipe":
+            return sys.stdin.buffer
+        try:
+            mode = os.fstat(sys.stdin.fileno()).st_mode
+        except (AttributeError, OSError, ValueError):
+            return None
+        if stat.S_ISFIFO(mode) or stat.S_ISREG(mode):
+            return sys.stdin.buffer
+        return None
+
+    @staticmethod
+    def _close_source(source: Optional[IO[bytes]]) -> None:
+        if source is not None and source is not sys.stdin.buffer:
+            source.close()
+
+    def _pipe_loop(self, source: IO[bytes]) -> None:
+        """Send every message from source as fast as the socket accepts it,
+        then wait until no reply arrived for `HTTPIE_WS_DRAIN` seconds.
+
+        Sends block on the socket, so a slow server pushes back on the reader.
+        """
+        if self._send_file:
+            self._send_file_loop(source)
+            return
+        if self._sender is not None:
+            self._start_sender()
+        if self._replay_path:
+            self._replay_loop(source)
+            return
+        count = 0
+        for message in split_messages(source, self._delimiter):
+            if not self._alive or not self._queue_or_send(message, self._send_opcode):
+                logger.warning(f"Websocket closed, {count} messages sent")
+                break
+            count += 1
+        logger.debug(f"Pipe input exhausted, {count} messages sent")
+        self._finish_sender()
+        self._wait_idle(self._drain)
+        self.close(status=STATUS_NORMAL, reason=b"")
+
+    def _send_file_loop(self, source: IO[bytes]) -> None:
+        """Send `HTTPIE_WS_SEND_FILE` as one message of `HTTPIE_WS_FRAGMENT_SIZE` frames,
+        then wait for replies like `_pipe_loop`.
+
+        The file is memory mapped, so memory stays flat whatever its size.
+        """
+        data = map_file(source)
+        started = time.perf_counter()
+        sent = frames = 0
+        try:
+            self._stats.on_send(len(data), self._send_opcode)
+            if self._ndjson:
+                self._write_sent(self._send_opcode, data)
+            ws = self._ws
+            for opcode, fragment, fin in iter_fragments(data, self._send_opcode, self._fragment_size):
+                if not self._running:
+                    break
+                if self._recorder:
+                    self._recorder.record(
+                        RECORD_OUT, opcode, fragment, self._record_conn or 0, bool(fin)
+                    )
+                if self.deflating:
+                    self._send_compressed(ws, fragment, opcode, fin)  # type: ignore
+                else:
+                    ws.send_frame(websocket.ABNF.create_frame(fragment, opcode, fin))  # type: ignore
+                sent += len(fragment)
+                frames += 1
+        except (websocket.WebSocketException, OSError) as e:
+            logger.warning(f"Websocket closed, {sent} of {len(data)} bytes sent: {e}")
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+        self._report.append(self._send_file_report(sent, frames, time.perf_counter() - started))
+        self._wait_idle(self._drain)
+        self.close(status=STATUS_NORMAL, reason=b"")
+
+    def _send_file_report(self, sent: int, frames: int, elapsed: float) -> str:
+        return "\n".join(
+            [
+                "Send file info:",
+                f"File: {self._send_file}",
+                f"Sent: {sent} bytes in {frames} frames",
+                f"Elapsed: {elapsed:.3f}s",
+                f"Throughput: {sent / elapsed / 1e6 if elapsed > 0 else 0:.2f} MB/s",
+            ]
+        )
+
+    def _replay_loop(self, source: IO[bytes]) -> None:
+        """Send the outbound frames of a session log with the recorded gaps
+        scaled by `HTTPIE_WS_REPLAY_SPEED`, then wait for replies like `_pipe_loop`.
+        """
+        started = time.monotonic()
+        count = 0
+        try:
+            for offset, opcode, payload in replay_schedule(source, self._replay_speed):
+                delay = started + offset - time.monotonic()
+                if delay > 0:
+                    # Returns early when the receiver stops
+                    self._ws_thread.join(delay)
+                if not self._alive or not self._queue_or_send(payload, opcode):
+                    logger.warning(f"Websocket closed, {count} messages replayed")
+                    break
+                count += 1
+        except ValueError as e:
+            logger.warning(f"Replay stopped after {count} messages: {e}")
+        logger.debug(f"Replay finished, {count} messages sent")
+        self._finish_sender()
+        self._wait_idle(self._drain)
+        self.close(status=STATUS_NORMAL, reason=b"")
+
+    def _queue_or_send(self, payload: bytes, opcode: int) -> bool:
+        """Hand a message to the pacing sender, or send it now without one.
+
+        Returns:
+            bool: False if the sender stopped and the message is not sent.
+        """
+        if self._sender_thread is None:
+            self._send_message(payload, opcode)
+            return True
+        return self._sender.put((payload, opcode), lambda: self._alive)  # type: ignore
+
+    def _start_sender(self) -> None:
+        self._sender_thread = threading.Thread(
+            target=self._sender_loop, name="WSSender", daemon=True
+        )
+        self._sender.started = time.monotonic()  # type: ignore
+        self._sender_thread.start()
+
+    def _finish_sender(self) -> None:
+        """Wait until the pacing sender has sent everything queued."""
+        if self._sender_thread is None:
+            return
+        self._sender.put(None, lambda: True)  # type: ignore
+        self._sender_thread.join()
+
+    def _sender_loop(self) -> None:
+        """Send queued messages as the token buckets allow, several in one write
+        with `HTTPIE_WS_COALESCE` when more are waiting and within the budget.
+        """
+        sender: SendScheduler = self._sender  # type: ignore
+        pending: list[Optional[Tuple[bytes, int]]] = []
+        try:
+            while True:
+                item = pending.pop() if pending else sender.get()
+                if item is None or not sender.acquire(len(item[0]), self._closing):
+                    break
+                batch = [item]
+                size = len(item[0])
+                while (
+                    sender.coalesce
+                    and len(batch) < sender.COALESCE_MESSAGES
+                    and size < sender.COALESCE_BYTES
+                ):
+                    try:
+                        item = sender.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None or not sender.try_acquire(len(item[0])):
+                        pending.append(item)
+                        break
+                    batch.append(item)
+                    size += len(item[0])
+                if len(batch) == 1:
+                    self._send_message(*batch[0])
+                else:
+                    self._send_batch(batch)  # type: ignore
+                sender.on_write(batch)  # type: ignore
+        except (websocket.WebSocketException, OSError) as e:
+            logger.warning(f"Websocket closed, {sender.sent} messages sent: {e}")
+        finally:
+            sender.done.set()
+
+    def _send_message(self, payload: bytes, opcode: int) -> None:
+        if opcode == OPCODE_BINARY:
+            self.send_binary(payload)
+        else:
+            self.send_msg(payload)
+
+    def _send_batch(self, batch: list[Tuple[bytes, int]]) -> None:
+        """Send several messages with one socket write, buffered while reconnecting."""
+        for payload, opcode in batch:
+            self._stats.on_send(len(payload), opcode)
+            if self._recorder:
+                self._recorder.record(RECORD_OUT, opcode, payload, self._record_conn or 0)
+            if self._ndjson:
+                self._write_sent(opcode, payload)
+        with self._outbox_lock:
+            if self._reconnecting:
+                self._outbox.extend(batch)
+                return
+            ws = self._ws
+        frames = []
+        for payload, opcode in batch:
+            if self.deflating:
+                frame = websocket.ABNF.create_frame(self._compress.compress(payload), opcode)  # type: ignore
+                frame.rsv1 = 1
+            else:
+                frame = websocket.ABNF.create_frame(payload, opcode)
+            if ws.get_mask_key:  # type: ignore
+                frame.get_mask_key = ws.get_mask_key  # type: ignore
+            frames.append(frame.format())
+        data = b"".join(frames)
+        try:
+            # The lock `WebSocket.send_frame` takes keeps other writers out of the batch
+            with ws.lock:  # type: ignore
+                if ws.sock is None:  # type: ignore
+                    raise websocket.WebSocketConnectionClosedException("socket is already closed.")
+                ws.sock.sendall(data)  # type: ignore
+        except (websocket.WebSocketConnectionClosedException, OSError):
+            if not self._reconnect or not self._running:
+                raise
+            # The batch may be partly written, resend all of it after the reconnect
+            with self._outbox_lock:
+                if self._ws is ws:
+                    self._reconnecting = True
+                    self._outbox.extend(batch)
+                    return
+            for payload, opcode in batch:
+                self._deliver(payload, opcode)
+
+    def _load_messages(self, source: IO[bytes]) -> list[bytes]:
+        """Messages sent in load mode, a replayed log gives its outbound frames."""
+        if self._replay_path:
+            return [payload for _, _, payload in replay_schedule(source, 0)]
+        return list(split_messages(source, self._delimiter))
+
+    def _send_load(self, request: PreparedRequest, **kwargs) -> Response:
+        """Run load mode: `HTTPIE_WS_CONNECTIONS` connections sending the request body
+        or the `HTTPIE_WS_INPUT` corpus at `HTTPIE_WS_RATE` messages per second in total.
+
+        Without messages the connections only receive, which suits soak tests of
+        subscriptions. The per connection report is appended to the response body.
+        """
+        messages: list[bytes] = []
+        try:
+            source = self._pipe_source(request)
+            if source is not None:
+                try:
+                    messages = self._load_messages(source)
+                finally:
+                    self._close_source(source)
+        except (OSError, ValueError) as e:
+            self.close()
+            return self.dummy_response(request, 500, f"Cannot open input: {e}")
+
+        connections = max(self._connections, 1)
+        children = []
+        for index in range(connections):
+            child = self._child()
+            child._echo = False
+            child._recorder, child._record_conn = self._recorder, index
+            children.append(child)
+        self._children = children
+        if self._use_asyncio(kwargs.get("proxies"), interactive=False):
+            return self._send_async_load(request, children, messages, **kwargs)
+        stop = threading.Event()
+        started = time.monotonic()
+        workers = [
+            threading.Thread(
+                target=child._load_session,
+                args=(index, request, kwargs, messages, started, stop),
+                name=f"WSLoad-{index}",
+                daemon=True,
+            )
+            for index, child in enumerate(children)
+        ]
+        logger.debug(
+            f"Load mode: {connections} connections, {len(messages)} messages, "
+            f"rate: {self._rate}, duration: {self._duration}"
+        )
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            self._write_status("\nOops! Stopping load test. Need to force quit? Press again!")
+        finally:
+            stop.set()
+            # Closing the sockets ends the receivers that idle connections wait on
+            for child in children:
+                child.close(status=STATUS_NORMAL, reason=b"")
+            for worker in workers:
+                worker.join(5)
+            self.close()
+        self._report.append(self._load_report(children, time.monotonic() - started))
+        self._merge_children(children)
+        return self.dummy_response(request)
+
+    def _load_session(
+        self,
+        index: int,
+        request: PreparedRequest,
+        kwargs: dict,
+        messages: list[bytes],
+        started: float,
+        stop: threading.Event,
+    ) -> None:
+        """Run one load mode connection, sending at its share of `HTTPIE_WS_RATE`."""
+        self._running = True
+        try:
+            self._connect(request, **kwargs)
+        except AdapterError as e:
+            self._stats.errors += 1
+            self._close_msg = e.msg
+            self._running = False
+            return
+        self._ws_thread.start()
+        connections = max(self._connections, 1)
+        interval = connections / self._rate if self._rate > 0 else 0.0
+        deadline = started + self._duration if self._duration > 0 else None
+        # Stagger the connections so they do not send in lockstep
+        next_send = started + interval * index / connections
+        templated = [b"{conn}" in m or b"{seq}" in m for m in messages]
+        conn = str(index).encode()
+        seq = 0
+        try:
+            while not stop.is_set() and self._alive:
+                if not messages:
+                    # Receive only, until the deadline or the connection drops
+                    self._ws_thread.join(
+                        None if deadline is None else max(deadline - time.monotonic(), 0)
+                    )
+                    break
+                if self._count and seq >= self._count:
+                    self._wait_idle(self._drain)
+                    break
+                if interval:
+                    delay = next_send - time.monotonic()
+                    if delay > 0 and stop.wait(delay):
+                        break
+                    next_send += interval
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                i = seq % len(messages)
+                message = messages[i]
+                if templated[i]:
+                    message = message.replace(b"{conn}", conn).replace(
+                        b"{seq}", str(seq).encode()
+                    )
+                self._send_payload(message)
+                seq += 1
+        except (websocket.WebSocketException, OSError) as e:
+            if not stop.is_set():
+                logger.debug(f"Load connection {index} failed: {e}")
+                self._stats.errors += 1
+        finally:
+            self.close(status=STATUS_NORMAL, reason=b"")
 
-        Args:
-            request (PreparedRequest): The request object.
-            stream (bool): Whether to stream the response.
-            timeout (float): The timeout in seconds.
-            verify (Union[bool, str]): Whether to verify the SSL certificate.
-            cert (Union[HTTPieCertificate, str]): The path to the SSL certificate.
-            proxies (dict): The proxies to use.
+    def _merge_children(self, children: list["WebsocketAdapter"]) -> None:
+        """Add the counters of load mode connections to this adapter's report."""
+        self._children = []
+        for child in children:
+            if "connect" in child._stats.phases:
+                child._stats.on_close(child._close_code)
+            self._stats.merge(child._stats)
+            if child._filter is not None and self._filter is not None:
+                self._filter.merge(child._filter)
+            if child._compress:
+                if self._compress is None:
+                    self._compress = PerMessageDeflate()
+                self._compress.merge(child._compress)
 
-        Returns:
-            Response: Handshake response info.
+    @staticmethod
+    def _load_report(children: list["WebsocketAdapter"], elapsed: float) -> str:
+        elapsed = max(elapsed, 1e-9)
+        sent = sum(c._stats.msgs_out for c in children)
+        received = sum(c._stats.msgs_in for c in children)
+        bytes_out = sum(c._stats.bytes_out for c in children)
+        bytes_in = sum(c._stats.bytes_in for c in children)
+        errors = sum(c._stats.errors for c in children)
+        lines = [
+            "Load test info:",
+            f"Connections: {len(children)}, Elapsed: {elapsed:.2f}s",
+            f"Sent: {sent} ({sent / elapsed:.1f} msg/s), {bytes_out} bytes ({bytes_out / elapsed:.1f} B/s)",
+            f"Received: {received} ({received / elapsed:.1f} msg/s), {bytes_in} bytes ({bytes_in / elapsed:.1f} B/s)",
+            f"Errors: {errors}",
+        ]
+        for index, c in enumerate(children):
+            lines.append(
+                f"#{index} sent: {c._stats.msgs_out} ({c._stats.bytes_out} bytes, "
+                f"{c._stats.bytes_out / elapsed:.1f} B/s), "
+                f"received: {c._stats.msgs_in} ({c._stats.bytes_in} bytes, "
+                f"{c._stats.bytes_in / elapsed:.1f} B/s), "
+                f"errors: {c._stats.errors}, close code: {c.close_code or '-'}"
+                + (f", {c.close_msg}" if c.close_msg else "")
+            )
+        return "\n".join(lines)
+
+    def _send_fanout(self, request: PreparedRequest, **kwargs) -> Response:
+        """Connect to the request URL and every `HTTPIE_WS_FANOUT` URL at once and merge
+        what they receive into one output. Input goes to the first endpoint, or to all
+        of them with `HTTPIE_WS_BROADCAST`. Every endpoint is reported on its own.
         """
-        self._running = True
-        logger.debug(
-            f"ws connecting. stream: {stream}, verify: {verify}, proxy: {proxies}, timeout: {timeout}"
+        if self._engine == "asyncio":
+            logger.warning("The asyncio engine does not fan out, using threads")
+        try:
+            source = self._pipe_source(request)
+        except (OSError, ValueError) as e:
+            self.close()
+            return self.dummy_response(request, 500, f"Cannot open input: {e}")
+        children = []
+        for index, url in enumerate([request.url or "", *self._fanout]):
+            child = self._child()
+            child._parent, child._tag = self, _endpoint_label(url)
+            child._recorder, child._record_conn = self._recorder, index
+            child._running = True
+            endpoint = request.copy()
+            endpoint.url = url
+            children.append((child, endpoint))
+        self._children = [child for child, _ in children]
+
+        started = time.monotonic()
+        connectors = [
+            threading.Thread(target=child._fanout_connect, args=(endpoint, kwargs), daemon=True)
+            for child, endpoint in children
+        ]
+        for connector in connectors:
+            connector.start()
+        for connector in connectors:
+            connector.join()
+        connected = [child for child, _ in children if child.connected]
+        if not connected:
+            self._close_source(source)
+            self.close()
+            errors = "; ".join(f"{c._tag}: {c._close_msg}" for c, _ in children)
+            return self.dummy_response(request, 500, f"Cannot connect to websocket: {errors}")
+
+        self._start_output(interactive=source is None)
+        for child in connected:
+            child._ws_thread.start()
+        targets = connected if self._broadcast else connected[:1]
+        try:
+            if source is not None:
+                for message in split_messages(source, self._delimiter):
+                    self._fanout_send(targets, message)
+                for child in connected:
+                    child._wait_idle(self._drain)
+            else:
+                self._write_status(
+                    f"> Connected to {len(connected)} of {len(children)} endpoints\n"
+                    "> Type a message and press enter to send it.\n"
+                    "> Press Ctrl+C to close the connections."
+                )
+                self._fanout_interactive(connected, targets)
+        except KeyboardInterrupt:
+            self._write_status("\nOops! Disconnecting. Need to force quit? Press again!")
+        finally:
+            self._close_source(source)
+            for child in connected:
+                child.close(status=STATUS_NORMAL, reason=b"")
+            self.close()
+        self._report.append(
+            self._fanout_report([child for child, _ in children], time.monotonic() - started)
         )
-        logger.debug(f"received headers: {request.headers}")
+        self._merge_children([child for child, _ in children])
+        return self.dummy_response(request)
 
+    def _fanout_connect(self, request: PreparedRequest, kwargs: dict) -> None:
         try:
-            self._connect(
-                request, stream=stream, timeout=timeout, verify=verify, cert=cert, proxies=proxies
+            self._connect(request, **kwargs)
+        except AdapterError as e:
+            logger.warning(f"{self._tag}: {e.msg}")
+            self._stats.errors += 1
+            self._close_msg = e.msg
+            self._running = False
+
+    @staticmethod
+    def _fanout_send(targets: list["WebsocketAdapter"], message: Union[str, bytes]) -> None:
+        for child in targets:
+            if not child._alive:
+                continue
+            try:
+                if isinstance(message, str):
+                    child.send_msg(message)
+                else:
+                    child._send_payload(message)
+            except (websocket.WebSocketException, OSError) as e:
+                logger.warning(f"{child._tag}: message not sent: {e}")
+
+    def _fanout_interactive(
+        self, connected: list["WebsocketAdapter"], targets: list["WebsocketAdapter"]
+    ) -> None:
+        """`_interactive_loop` for fan-out, runs until every endpoint is closed."""
+        self._stdin_reader = StdinReader()
+        msg = ""
+        while any(child._alive for child in connected):
+            for chars in self._stdin_reader.read_lines():
+                if not chars:
+                    continue
+                chars, input_end = escape_backslashes(chars)
+                msg += chars
+                if input_end is True:
+                    self._fanout_send(targets, msg)
+                    msg = ""
+
+    @staticmethod
+    def _fanout_report(children: list["WebsocketAdapter"], elapsed: float) -> str:
+        connected = sum(1 for c in children if c._ws_thread.ident is not None)
+        lines = [
+            "Fan-out info:",
+            f"Endpoints: {len(children)}, connected: {connected}, Elapsed: {max(elapsed, 0):.2f}s",
+        ]
+        for index, c in enumerate(children):
+            lines.append(
+                f"#{index} {c._tag} received: {c._stats.msgs_in} ({c._stats.bytes_in} bytes), "
+                f"sent: {c._stats.msgs_out} ({c._stats.bytes_out} bytes), "
+                f"errors: {c._stats.errors}, close code: {c.close_code or '-'}"
+                + (f", {c.close_msg}" if c.close_msg else "")
+            )
+        return "\n".join(lines)
+
+    # Body headers of the request, they do not belong in the handshake of a pooled connection
+    POOL_SKIP_HEADERS = ("content-length", "content-type", "transfer-encoding")
+
+    def _send_pooled(self, request: PreparedRequest, **kwargs) -> Response:
+        """Library mode: send the request body as one message on a pooled connection
+        and return the next message received as the response body.
+
+        Without a body the connection is only opened or checked, which warms the pool.
+        A connection that fails or times out is closed instead of going back.
+        """
+        headers = tuple(
+            sorted(
+                (k.lower(), str(v))
+                for k, v in (request.headers or {}).items()
+                if k.lower() not in self.POOL_SKIP_HEADERS
             )
+        )
+        proxies = kwargs.get("proxies")
+        key = (
+            request.url,
+            headers,
+            kwargs.get("verify", True),
+            repr(kwargs.get("cert")),
+            tuple(sorted(proxies.items())) if proxies else (),
+        )
+        conn = self._pool.acquire(key)  # type: ignore
+        if conn is None:
+            conn = self._child()
+            conn._echo = False
+            if self._metrics:
+                # Pooled connections count into this adapter's metrics
+                conn._stats = self._stats
+            handshake = request.copy()
+            handshake.body = None
+            handshake.headers = CaseInsensitiveDict(
+                {
+                    k: v
+                    for k, v in (request.headers or {}).items()
+                    if k.lower() not in self.POOL_SKIP_HEADERS
+                }
+            )
+            try:
+                conn._connect(handshake, **kwargs)
+            except AdapterError as e:
+                return self.dummy_response(request, e.code, e.msg)
+            conn._running = True
+            logger.debug(f"Pool: new connection to {request.url}")
+        body = self._request_payload(request)
+        if not body:
+            self._pool.release(key, conn)  # type: ignore
+            return conn.dummy_response(request)
+        response = self._exchange_response(request, conn, body, kwargs.get("timeout"))
+        if response.status_code == 200:
+            self._pool.release(key, conn)  # type: ignore
+        else:
+            conn.close(status=STATUS_NORMAL, reason=b"")
+        return response
+
+    def _send_request_mode(self, request: PreparedRequest, **kwargs) -> Response:
+        """`HTTPIE_WS_MODE=request`: send the request body as one message, collect the
+        replies and return them as the response body instead of the session info.
+        """
+        if self._engine == "asyncio":
+            logger.warning("The asyncio engine does not run request mode, using threads")
+        body = self._request_payload(request)
+        if not body:
+            self.close()
+            return self.dummy_response(request, 400, "Request mode needs a request body")
+        self._echo = False
+        try:
+            self._connect(request, **kwargs)
         except AdapterError as e:
             self.close()
             return self.dummy_response(request, e.code, e.msg)
+        try:
+            return self._exchange_response(request, self, body, kwargs.get("timeout"))
+        finally:
+            self.close(status=STATUS_NORMAL, reason=b"")
 
-        self._ws_thread.start()
-        time.sleep(0.3)
-        self._write_stdout(
-            f"> Connected to {request.url}\n"
-            "> Type a message and press enter to send it.\n"
-            "> The backslash at the end of a line is treated as input not ended.\n"
-            "> Press Ctrl+C to close the connection."
-        )
+    @staticmethod
+    def _request_payload(request: PreparedRequest) -> bytes:
+        body = request.body
+        if isinstance(body, str):
+            return body.encode("utf8")
+        if body is None or isinstance(body, bytes):
+            return body or b""
+        return body.read() if hasattr(body, "read") else b"".join(body)
+
+    def _exchange_response(
+        self,
+        request: PreparedRequest,
+        conn: "WebsocketAdapter",
+        payload: bytes,
+        timeout: Optional[float],
+    ) -> Response:
+        """Run `_exchange` on conn and turn the replies into the response.
 
+        The replies are joined with `HTTPIE_WS_DELIMITER`, typed as JSON when they
+        all are, so httpie formats them. Fewer replies than expected return 504,
+        or 502 if the server closed the connection, with the replies received.
+        """
+        timeout = self._reply_timeout or timeout or 10.0
         try:
-            input_end: bool
-            msg: str = ""
-            while self._running and self.connected:
-                chars = _read_stdin()
-                if not chars:
+            replies = conn._exchange(payload, self._replies, timeout, self._correlate)
+        except (websocket.WebSocketException, OSError) as e:
+            return conn.dummy_response(request, 502, f"Connection failed: {e}")
+        body = self._delimiter.join(replies)
+        if len(replies) == self._replies:
+            status, reason = 200, "OK"
+        elif conn.connected:
+            status, reason = 504, f"{len(replies)} of {self._replies} replies within {timeout}s"
+        else:
+            status, reason = 502, f"Connection closed after {len(replies)} of {self._replies} replies"
+        response = conn.dummy_response(request, status)
+        response.reason = reason
+        response.headers["Content-Type"] = _replies_content_type(replies, self._delimiter)
+        response._content = body
+        response.raw = io.BytesIO(body)
+        return response
+
+    def _exchange(
+        self,
+        payload: bytes,
+        count: int = 1,
+        timeout: float = 10.0,
+        correlate: Optional[Tuple[Union[str, int], ...]] = None,
+    ) -> list[bytes]:
+        """Send one message and collect data messages on the calling thread, until
+        `count` arrived, `timeout` passed or the server closed the connection.
+
+        With `correlate`, only JSON replies with the sent message's value at that
+        path are collected.
+
+        Raises:
+            websocket.WebSocketException: Sending or receiving failed.
+            OSError: The socket failed.
+        """
+        expected: Any = _MISSING
+        if correlate is not None:
+            try:
+                expected = get_path(json.loads(payload), correlate)
+            except ValueError:
+                pass
+            if expected is _MISSING:
+                logger.warning("The message has no correlation id, every reply is collected")
+        self._send_payload(payload)
+        deadline = time.monotonic() + timeout
+        replies: list[bytes] = []
+        while len(replies) < count:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._ws.settimeout(remaining)  # type: ignore
+            try:
+                opcode, msg = self._ws.recv_data()  # type: ignore
+            except websocket.WebSocketTimeoutException:
+                break
+            except websocket.WebSocketConnectionClosedException:
+                self._ws.shutdown()  # type: ignore
+                break
+            if opcode == OPCODE_CLOSE:
+                self._on_frame(opcode, msg)
+                self._ws.shutdown()  # type: ignore
+                break
+            if opcode not in (OPCODE_TEXT, OPCODE_BINARY):
+                continue
+            msg = self._inflate(opcode, msg)
+            self._on_frame(opcode, msg)
+            if expected is not _MISSING:
+                try:
+                    if get_path(json.loads(msg), correlate) != expected:  # type: ignore
+                        continue
+                except ValueError:
                     continue
-                if not self._running or not self.connected:
-                    self._write_stdout(f"Websocket closed, message not sent: {chars}")
+            replies.append(msg)
+        return replies
+
+    def _pool_healthy(self) -> bool:
+        """Whether an idle pooled connection can be used, answering pings that arrived meanwhile."""
+        ws = self._ws
+        if ws is None or not ws.connected:
+            return False
+        try:
+            with selectors.DefaultSelector() as selector:
+                selector.register(ws.sock, selectors.EVENT_READ)
+                while getattr(ws.sock, "pending", lambda: 0)() or selector.select(0):
+                    ws.settimeout(0.1)
+                    opcode, _ = ws.recv_data(control_frame=True)
+                    if opcode not in (OPCODE_PING, OPCODE_PONG):
+                        # Closed, or a message nobody asked for
+                        return False
+        except (websocket.WebSocketException, OSError, ValueError):
+            return False
+        return True
+
+    def _wait_idle(self, idle: float) -> None:
+        """Wait until nothing was received for `idle` seconds or the receiver stops.
+
+        A negative value waits until the server closes the connection.
+        While reconnecting the wait starts over once the buffered messages are sent.
+        """
+        self._last_recv = max(self._last_recv, time.monotonic())
+        while self._ws_thread.is_alive():
+            if self._reconnecting:
+                self._ws_thread.join(0.1)
+                self._last_recv = time.monotonic()
+                continue
+            if idle < 0:
+                self._ws_thread.join(1)
+                continue
+            remaining = self._last_recv + idle - time.monotonic()
+            if remaining <= 0:
+                break
+            self._ws_thread.join(remaining)
+
+    def _use_asyncio(self, proxies: Optional[Mapping], interactive: bool) -> bool:
+        """Whether this session runs on the asyncio engine."""
+        if self._engine != "asyncio":
+            return False
+        if self._body is not None:
+            logger.warning("The asyncio engine does not stream the response body, using threads")
+            return False
+        if self._reconnect:
+            logger.warning("The asyncio engine does not reconnect, using threads")
+            return False
+        if self._sender is not None:
+            logger.warning("The asyncio engine does not pace sends, using threads")
+            return False
+        if proxies:
+            logger.warning("The asyncio engine does not support proxies, using threads")
+            return False
+        if interactive and IS_WINDOWS:
+            logger.warning("The asyncio engine cannot wait on a Windows console, using threads")
+            return False
+        return True
+
+    def _send_async(
+        self, request: PreparedRequest, pipe_source: Optional[IO[bytes]], **kwargs
+    ) -> Response:
+        """Run an interactive or pipe mode session on one asyncio event loop."""
+        self._start_output(interactive=pipe_source is None)
+        try:
+            asyncio.run(self._async_session(request, pipe_source, kwargs))
+        except AdapterError as e:
+            return self.dummy_response(request, e.code, e.msg)
+        except KeyboardInterrupt:
+            self._write_status("\nOops! Disconnecting. Need to force quit? Press again!")
+            self._close_code = STATUS_ABNORMAL_CLOSED
+            self._close_msg = self.ACTIVELY_CLOSE_REASON.decode("utf8")
+        finally:
+            self._close_source(pipe_source)
+            self._stop_output()
+            self._stop_recording()
+            self._running = False
+        return self.dummy_response(request)
+
+    async def _async_connect(self, request: PreparedRequest, kwargs: dict) -> AsyncConnection:
+        conn = AsyncConnection()
+        # Shares the attribute with the threaded engine for `connected` and response headers
+        self._ws = conn  # type: ignore
+        try:
+            await conn.connect(
+                request.url or "",
+                header=self.convert2ws_headers(request.headers),
+                timeout=kwargs.get("timeout") or 4,
+                ssl_context=self._ssl_context(request, kwargs.get("verify", True), kwargs.get("cert")),
+            )
+        except (websocket.WebSocketException, OSError, asyncio.TimeoutError, ValueError) as e:
+            raise AdapterError(500, f"Cannot connect to websocket: {str(e)}") from None
+        self._stats.on_connect(conn.phases)
+        try:
+            if self._negotiate_extensions(conn.headers):
+                conn.deflate = self._compress
+            conn.max_size = self._max_size
+        except AdapterError:
+            await conn.close(STATUS_PROTOCOL_ERROR, b"")
+            raise
+        subscribe = self._subscribe_message()
+        if subscribe is not None:
+            try:
+                await self._async_send(conn, subscribe, OPCODE_TEXT)
+            except (websocket.WebSocketException, OSError) as e:
+                raise AdapterError(500, f"Cannot send subscribe message: {e}") from None
+        return conn
+
+    async def _async_session(
+        self, request: PreparedRequest, pipe_source: Optional[IO[bytes]], kwargs: dict
+    ) -> None:
+        started = time.perf_counter()
+        conn = await self._async_connect(request, kwargs)
+        logger.debug(f"startup: connect {(time.perf_counter() - started) * 1000:.1f}ms")
+        receiver = asyncio.ensure_future(self._async_receive(conn))
+        status, reason = STATUS_ABNORMAL_CLOSED, self.ACTIVELY_CLOSE_REASON
+        try:
+            if pipe_source is not None:
+                await self._async_pipe(conn, pipe_source, receiver)
+                status, reason = STATUS_NORMAL, b""
+            else:
+                self._write_status(
+                    f"> Connected to {request.url}\n"
+                    "> Type a message and press enter to send it.\n"
+                    "> The backslash at the end of a line is treated as input not ended.\n"
+                    "> Press Ctrl+C to close the connection."
+                )
+                await self._async_interactive(conn, receiver)
+        finally:
+            if conn.connected and self._close_code is None:
+                self._close_code = status
+            await conn.close(status, reason)
+            receiver.cancel()
+
+    async def _async_receive(self, conn: AsyncConnection) -> None:
+        keepalive = None
+        if self._ping_interval > 0:
+            keepalive = asyncio.ensure_future(self._async_keepalive(conn))
+        try:
+            while self._running and conn.connected:
+                try:
+                    if self._stream:
+                        opcode, fragment, fin = await conn.recv_fragment()
+                        self._last_recv = time.monotonic()
+                        self._on_fragment(opcode, fragment, fin)
+                        continue
+                    opcode, msg = await conn.recv_data()
+                except MessageTooBig as e:
+                    self._on_message_too_big(e)
+                    await conn.fail(STATUS_MESSAGE_TOO_BIG, self._close_msg.encode("utf8"))
+                    break
+                except websocket.WebSocketPayloadException as e:
+                    self._on_invalid_payload(e)
+                    await conn.fail(STATUS_INVALID_PAYLOAD, self._close_msg.encode("utf8"))
+                    break
+                except (websocket.WebSocketException, OSError) as e:
+                    if self._running:
+                        self._stats.errors += 1
+                        if self._echo:
+                            self._write_status(f"Connection closed: {str(e)}")
                     break
+                self._last_recv = time.monotonic()
+                self._on_frame(opcode, msg)
+        finally:
+            if keepalive is not None:
+                keepalive.cancel()
+
+    async def _async_keepalive(self, conn: AsyncConnection) -> None:
+        """Asyncio version of `_keepalive`, runs as long as `_async_receive`."""
+        pong = asyncio.Event()
+
+        def on_pong(payload: bytes) -> None:
+            if self._on_pong(payload):
+                pong.set()
+
+        conn.on_pong = on_pong
+        while conn.connected:
+            await asyncio.sleep(self._ping_interval)
+            pong.clear()
+            self._ping_payload = struct.pack("!Q", time.monotonic_ns())
+            try:
+                await conn.send(self._ping_payload, OPCODE_PING)
+            except (websocket.WebSocketException, OSError):
+                return
+            self._stats.pings += 1
+            try:
+                await asyncio.wait_for(pong.wait(), self._ping_timeout)
+            except asyncio.TimeoutError:
+                self._on_ping_timeout()
+                try:
+                    await asyncio.wait_for(
+                        conn.close(STATUS_UNEXPECTED_CONDITION, self.PING_TIMEOUT_REASON), 1
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                conn.abort()
+                return
+
+    async def _async_send(
+        self, conn: AsyncConnection, message: bytes, opcode: Optional[int] = None
+    ) -> None:
+        opcode = opcode or self._send_opcode
+        self._stats.on_send(len(message), opcode)
+        if self._recorder:
+            self._recorder.record(RECORD_OUT, opcode, message, self._record_conn or 0)
+        if self._ndjson:
+            self._write_sent(opcode, message)
+        await conn.send(message, opcode)
+
+    @staticmethod
+    async def _async_chunks(source: IO[bytes], stop: "asyncio.Future") -> AsyncIterator[bytes]:
+        """Yield chunks of source until EOF or until `stop` is done.
+
+        Pipes and terminals are awaited with the event loop, one read at a time,
+        so a slow connection pushes back on the input. Other streams are read directly.
+        """
+        fd: Optional[int] = None
+        if not IS_WINDOWS:
+            try:
+                fd = source.fileno()
+                mode = os.fstat(fd).st_mode
+                # epoll refuses regular files and devices like /dev/null
+                if not (stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode) or os.isatty(fd)):
+                    fd = None
+            except (AttributeError, OSError, ValueError):
+                fd = None
+        if fd is None:
+            read = getattr(source, "read1", source.read)
+            while not stop.done():
+                chunk = read(StdinReader.READ_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+            return
+        loop = asyncio.get_running_loop()
+        while True:
+            ready: asyncio.Future = loop.create_future()
+            # The callback may run again before the reader is removed
+            loop.add_reader(fd, lambda f=ready: f.done() or f.set_result(None))
+            try:
+                await asyncio.wait({ready, stop}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                loop.remove_reader(fd)
+            if not ready.done():
+                return
+            chunk = os.read(fd, StdinReader.READ_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    async def _async_interactive(self, conn: AsyncConnection, receiver: "asyncio.Future") -> None:
+        splitter = MessageSplitter(b"\n")
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        msg: str = ""
+        async for chunk in self._async_chunks(sys.stdin.buffer, receiver):
+            for line in splitter.feed(chunk):
+                chars = decoder.decode(line).rstrip("\n ")
+                if not chars:
+                    continue
                 chars, input_end = escape_backslashes(chars)
                 msg += chars
                 if input_end is True:
-                    self.send_msg(msg)
+                    await self._async_send(conn, msg.encode("utf8"), OPCODE_TEXT)
                     msg = ""
+        # stdin ended, keep printing messages until the server closes
+        await receiver
+
+    async def _async_pipe(
+        self, conn: AsyncConnection, source: IO[bytes], receiver: "asyncio.Future"
+    ) -> None:
+        if self._replay_path:
+            await self._async_replay(conn, source, receiver)
+            return
+        if self._send_file:
+            await self._async_send_file(conn, source, receiver)
+            return
+        splitter = MessageSplitter(self._delimiter)
+        count = 0
+        async for chunk in self._async_chunks(source, receiver):
+            for message in splitter.feed(chunk):
+                await self._async_send(conn, message)
+                count += 1
+        tail = splitter.flush()
+        if tail and conn.connected:
+            await self._async_send(conn, tail)
+            count += 1
+        logger.debug(f"Pipe input exhausted, {count} messages sent")
+        await self._async_wait_idle(receiver, self._drain)
+
+    async def _async_send_file(
+        self, conn: AsyncConnection, source: IO[bytes], receiver: "asyncio.Future"
+    ) -> None:
+        """Asyncio version of `_send_file_loop`."""
+        data = map_file(source)
+        started = time.perf_counter()
+        sent = frames = 0
+        try:
+            self._stats.on_send(len(data), self._send_opcode)
+            if self._ndjson:
+                self._write_sent(self._send_opcode, data)
+            for opcode, fragment, fin in iter_fragments(data, self._send_opcode, self._fragment_size):
+                if self._recorder:
+                    self._recorder.record(
+                        RECORD_OUT, opcode, fragment, self._record_conn or 0, bool(fin)
+                    )
+                await conn.send(fragment, opcode, fin)
+                sent += len(fragment)
+                frames += 1
+        except (websocket.WebSocketException, OSError) as e:
+            logger.warning(f"Websocket closed, {sent} of {len(data)} bytes sent: {e}")
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+        self._report.append(self._send_file_report(sent, frames, time.perf_counter() - started))
+        await self._async_wait_idle(receiver, self._drain)
+
+    async def _async_replay(
+        self, conn: AsyncConnection, source: IO[bytes], receiver: "asyncio.Future"
+    ) -> None:
+        """Asyncio version of `_replay_loop`."""
+        started = time.monotonic()
+        count = 0
+        try:
+            for offset, opcode, payload in replay_schedule(source, self._replay_speed):
+                delay = started + offset - time.monotonic()
+                if delay > 0:
+                    await asyncio.wait({receiver}, timeout=delay)
+                if not conn.connected:
+                    logger.warning(f"Websocket closed, {count} messages replayed")
+                    break
+                await self._async_send(conn, payload, opcode)
+                count += 1
+        except ValueError as e:
+            logger.warning(f"Replay stopped after {count} messages: {e}")
+        logger.debug(f"Replay finished, {count} messages sent")
+        await self._async_wait_idle(receiver, self._drain)
+
+    async def _async_wait_idle(self, receiver: "asyncio.Future", idle: float) -> None:
+        """Asyncio version of `_wait_idle`."""
+        self._last_recv = max(self._last_recv, time.monotonic())
+        while not receiver.done():
+            if idle < 0:
+                await asyncio.wait({receiver})
+                continue
+            remaining = self._last_recv + idle - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.wait({receiver}, timeout=remaining)
+
+    def _send_async_load(
+        self,
+        request: PreparedRequest,
+        children: list["WebsocketAdapter"],
+        messages: list[bytes],
+        **kwargs,
+    ) -> Response:
+        """Load mode on the asyncio engine, all connections share one event loop."""
+        started = time.monotonic()
+
+        async def run() -> None:
+            await asyncio.gather(
+                *(
+                    child._async_load_session(index, request, kwargs, messages, started)
+                    for index, child in enumerate(children)
+                )
+            )
+
+        try:
+            asyncio.run(run())
         except KeyboardInterrupt:
-            self._write_stdout("\nOops! Disconnecting. Need to force quit? Press again!")
-            self._close_code = STATUS_ABNORMAL_CLOSED
-            self._close_msg = self.ACTIVELY_CLOSE_REASON.decode("utf8")
+            self._write_status("\nOops! Stopping load test. Need to force quit? Press again!")
         finally:
             self.close()
-
+        self._report.append(self._load_report(children, time.monotonic() - started))
+        self._merge_children(children)
         return self.dummy_response(request)
 
+    async def _async_load_session(
+        self,
+        index: int,
+        request: PreparedRequest,
+        kwargs: dict,
+        messages: list[bytes],
+        started: float,
+    ) -> None:
+        """Asyncio version of `_load_session`."""
+        self._running = True
+        try:
+            conn = await self._async_connect(request, kwargs)
+        except AdapterError as e:
+            self._stats.errors += 1
+            self._close_msg = e.msg
+            self._running = False
+            return
+        receiver = asyncio.ensure_future(self._async_receive(conn))
+        connections = max(self._connections, 1)
+        interval = connections / self._rate if self._rate > 0 else 0.0
+        deadline = started + self._duration if self._duration > 0 else None
+        next_send = started + interval * index / connections
+        templated = [b"{conn}" in m or b"{seq}" in m for m in messages]
+        conn_id = str(index).encode()
+        seq = 0
+        try:
+            while conn.connected:
+                if not messages:
+                    await asyncio.wait(
+                        {receiver},
+                        timeout=None if deadline is None else max(deadline - time.monotonic(), 0),
+                    )
+                    break
+                if self._count and seq >= self._count:
+                    await self._async_wait_idle(receiver, self._drain)
+                    break
+                if interval:
+                    delay = next_send - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    next_send += interval
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                i = seq % len(messages)
+                message = messages[i]
+                if templated[i]:
+                    message = message.replace(b"{conn}", conn_id).replace(
+                        b"{seq}", str(seq).encode()
+                    )
+                await self._async_send(conn, message)
+                seq += 1
+        except (websocket.WebSocketException, OSError) as e:
+            logger.debug(f"Load connection {index} failed: {e}")
+            self._stats.errors += 1
+        finally:
+            if conn.connected and self._close_code is None:
+                self._close_code = STATUS_NORMAL
+            await conn.close(STATUS_NORMAL, b"")
+            receiver.cancel()
+            self._running = False
+
+    def _write_sent(self, opcode: int, message: Union[str, bytes]) -> None:
+        """Write an NDJSON event for an outbound message."""
+        if not self._echo:
+            return
+        size = len(message) if isinstance(message, bytes) else len(message.encode("utf8"))
+        self._write_stdout(format_message_event("out", opcode, message, size, endpoint=self._tag))
+
+    def _write_status(self, msg: str) -> None:
+        """Write a status line, a `status` event in NDJSON output.
+
+        Status lines are not messages, with a streamed response body they go to stderr.
+        """
+        if self._body is not None and not self._ndjson:
+            if self._running:
+                sys.stderr.write(msg + "\n")
+                sys.stderr.flush()
+            return
+        if self._ndjson:
+            msg = _ANSI_ESCAPE.sub("", msg).strip()
+            self._write_stdout(format_event("status", self._tag, text=msg))
+            return
+        self._write_stdout(msg)
+
     def _write_stdout(self, msg: str, newline: bool = True) -> None:
-        """Write message to stdout."""
+        """Write message to stdout, buffered unless the flush mode is "line"."""
         if not self._running:
             return
         if isinstance(msg, bytes):
             msg = msg.decode("utf8")
+        if self._parent is not None:
+            self._parent._write_from(self, msg, newline)
+            return
         if newline:
             msg += "\n"
         with self._stdout_lock:
+            self._write_locked(msg)
+
+    def _write_locked(self, msg: str) -> None:
+        """Write or buffer text, the caller holds `_stdout_lock`."""
+        if self._flush_mode in (None, "line"):
+            if self._metrics:
+                started = time.perf_counter()
+                self._stdout.write(msg)
+                self._stdout.flush()
+                self._stats.writer_lag.record(time.perf_counter() - started)
+                return
             self._stdout.write(msg)
             self._stdout.flush()
+            return
+        if self._metrics and not self._out_buf and not self._out_raw:
+            self._out_since = time.perf_counter()
+        self._out_buf.append(msg)
+        self._out_size += len(msg)
+        if self._out_size >= self._flush_size:
+            self._flush_locked()
+
+    def _write_from(self, child: "WebsocketAdapter", msg: str, newline: bool) -> None:
+        """Write the output of a fan-out endpoint tagged with its source and arrival time.
+
+        The time is taken under the lock, so the merged output is in arrival order.
+        """
+        with self._stdout_lock:
+            if self._ndjson:
+                # The events carry the endpoint and their timestamps
+                self._write_locked(msg + "\n")
+                return
+            if not child._mid_line:
+                msg = f"[{datetime.now().isoformat(timespec='milliseconds')} {child._tag}] {msg}"
+            child._mid_line = not newline
+            self._write_locked(msg + "\n" if newline else msg)
+
+    def _write_stdout_bytes(self, data: bytes) -> None:
+        """Write bytes unchanged to the binary buffer under stdout."""
+        if not self._running:
+            return
+        if self._parent is not None:
+            # Raw bytes cannot be tagged, fan-out writes them as base64 lines
+            self._write_stdout(f"base64:{base64.b64encode(data).decode('ascii')}")
+            return
+        buffer = getattr(self._stdout, "buffer", None)
+        if buffer is None:
+            # stdout was replaced by a text only stream
+            self._write_stdout(f"base64:{base64.b64encode(data).decode('ascii')}")
+            return
+        with self._stdout_lock:
+            if self._out_buf:
+                # Keep the order with text written before
+                self._flush_locked()
+            if self._flush_mode in (None, "line"):
+                buffer.write(data)
+                buffer.flush()
+                return
+            # Flushed with the text, by the interval flusher or once the size is reached
+            if self._metrics and not self._out_buf and not self._out_raw:
+                self._out_since = time.perf_counter()
+            buffer.write(data)
+            self._out_raw = True
+            self._out_size += len(data)
+            if self._out_size >= self._flush_size:
+                self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        """Write buffered output in one call, the caller holds `_stdout_lock`."""
+        if self._out_buf:
+            self._stdout.write("".join(self._out_buf))
+            self._stdout.flush()
+            self._out_buf = []
+        elif not self._out_raw:
+            return
+        if self._out_raw:
+            self._stdout.buffer.flush()
+            self._out_raw = False
+        if self._metrics:
+            self._stats.writer_lag.record(time.perf_counter() - self._out_since)
+        self._out_size = 0
+
+    def _start_output(self, interactive: bool) -> None:
+        """Resolve the flush mode and start the interval flusher if needed.
+
+        Without `HTTPIE_WS_FLUSH`, interactive sessions and terminals flush every
+        line, while pipe mode writing to a pipe or file flushes by interval.
+        """
+        if self._flush_mode is None:
+            isatty = getattr(self._stdout, "isatty", lambda: False)()
+            self._flush_mode = "line" if interactive or isatty else "interval"
+        if self._flush_mode == "interval" and self._flush_thread is None:
+            self._flush_thread = threading.Thread(
+                target=self._flush_periodically, name="WSFlush", daemon=True
+            )
+            self._flush_thread.start()
+
+    def _flush_periodically(self) -> None:
+        while not self._flush_stop.wait(self._flush_interval):
+            with self._stdout_lock:
+                self._flush_locked()
+
+    def _stop_output(self) -> None:
+        """Stop the interval flusher and write what is still buffered."""
+        self._flush_stop.set()
+        if self._flush_thread is not None:
+            self._flush_thread.join(1)
+        with self._stdout_lock:
+            self._flush_locked()
 
     def dummy_response(
         self, request: PreparedRequest, status_code: int = 200, msg: str = ""
@@ -410,31 +4669,280 @@ class WebsocketAdapter(BaseAdapter):
         r.raw = io.BytesIO(
             msg.encode("utf8")
             if msg
-            else (
-                f"Websocket connection info:\nClose Code: {self.close_code}\nClose Msg: {self.close_msg}".encode(
-                    "utf8"
-                )
-            )
+            else "\n\n".join(self._info_sections()).encode("utf8")
         )
         r.encoding = "utf-8"
         r.url = request.url or ""
         return r
 
-    def close(self) -> None:
-        """Close the WebSocket connection and clean up resources."""
+    def _info_sections(self) -> list[str]:
+        """Sections of the final response body, load mode has no own connection."""
+        sections = list(self._report)
+        if self._ws or not sections:
+            sections.insert(
+                0,
+                f"Websocket connection info:\nClose Code: {self.close_code}\nClose Msg: {self.close_msg}",
+            )
+        if self._compress:
+            sections.append(self._compress.summary())
+        if self._filter is not None:
+            sections.append(self._filter.summary())
+        if self._sender is not None and self._sender.writes:
+            sections.append(self._sender.summary())
+        if self._recorder and self._record_conn is None:
+            sections.append(f"Recorded {self._recorder.frames} frames to {self._recorder.path}")
+        if self._reconnect:
+            sections.append(
+                f"Reconnect info:\nReconnects: {self._reconnects}\nDowntime: {self._downtime:.2f}s"
+            )
+        if self._ping_interval > 0:
+            sections.append(self._stats.keepalive_summary())
+        if self._show_stats:
+            sections.append(self._stats.summary())
+        return sections
+
+    def _collect_metrics(self) -> list[MetricFamily]:
+        """Metrics of the session so far, load mode and fan-out connections included."""
+        stats = SessionStats()
+        stats.merge(self._stats)
+        adapters = [self, *self._children]
+        for child in adapters[1:]:
+            stats.merge(child._stats)
+        if "connect" in self._stats.phases and not (self.connected or self._reconnecting):
+            stats.on_close(self._close_code)
+        messages: list[Tuple[dict[str, str], Union[int, float, LatencyHistogram]]] = []
+        sizes: list[Tuple[dict[str, str], Union[int, float, LatencyHistogram]]] = []
+        for direction, opcodes in (("in", stats.opcodes_in), ("out", stats.opcodes_out)):
+            for opcode, (count, size) in sorted(opcodes.items()):
+                labels = {"direction": direction, "opcode": OPCODE_NAMES.get(opcode, str(opcode))}
+                messages.append((labels, count))
+                sizes.append((labels, size))
+        # Keepalive pings and the pongs answering them carry an 8 byte timestamp
+        for labels, count in (
+            ({"direction": "out", "opcode": "ping"}, stats.pings),
+            ({"direction": "in", "opcode": "pong"}, stats.ping_rtt.count),
+        ):
+            if count:
+                messages.append((labels, count))
+                sizes.append((labels, count * 8))
+        return [
+            (
+                "httpie_ws_connections",
+                "gauge",
+                "Open WebSocket connections.",
+                [({}, sum(a.connected for a in adapters))],
+            ),
+            ("httpie_ws_messages_total", "counter", "Messages by direction and opcode.", messages),
+            ("httpie_ws_bytes_total", "counter", "Payload bytes by direction and opcode.", sizes),
+            ("httpie_ws_errors_total", "counter", "Connection and protocol errors.", [({}, stats.errors)]),
+            (
+                "httpie_ws_close_codes_total",
+                "counter",
+                "Closed connections by close code, 1006 without a close frame.",
+                [({"code": str(code)}, n) for code, n in sorted(stats.close_codes.items())],
+            ),
+            (
+                "httpie_ws_reconnects_total",
+                "counter",
+                "Reconnects after a dropped connection.",
+                [({}, sum(a._reconnects for a in adapters))],
+            ),
+            (
+                "httpie_ws_downtime_seconds_total",
+                "counter",
+                "Time spent reconnecting.",
+                [({}, sum(a._downtime for a in adapters))],
+            ),
+            (
+                "httpie_ws_send_queue_depth",
+                "gauge",
+                "Messages waiting for the paced sender.",
+                [({}, self._sender.queue.qsize() if self._sender is not None else 0)],
+            ),
+            (
+                "httpie_ws_outbox_messages",
+                "gauge",
+                "Messages buffered while reconnecting.",
+                [({}, sum(len(a._outbox) for a in adapters))],
+            ),
+            (
+                "httpie_ws_connect_seconds",
+                "summary",
+                "Connect time by phase: tcp, tls, upgrade and the whole connect.",
+                [({"phase": phase}, h) for phase, h in sorted(stats.phases.items())],
+            ),
+            ("httpie_ws_round_trip_seconds", "summary", "Send to reply time.", [({}, stats.rtt)]),
+            ("httpie_ws_ping_rtt_seconds", "summary", "Keepalive ping to pong time.", [({}, stats.ping_rtt)]),
+            (
+                "httpie_ws_inter_arrival_seconds",
+                "summary",
+                "Time between received messages.",
+                [({}, stats.inter_arrival)],
+            ),
+            (
+                "httpie_ws_writer_lag_seconds",
+                "summary",
+                "Time output waits in the buffer and for stdout to take it.",
+                [({}, stats.writer_lag)],
+            ),
+        ]
+
+    def _start_metrics(self) -> None:
+        """Serve the metrics on `HTTPIE_WS_METRICS_PORT` while the session runs."""
+        if not self._metrics_port or self._metrics_server is not None:
+            return
+        try:
+            self._metrics_server = serve_metrics(self._metrics_port, self._collect_metrics)
+        except OSError as e:
+            logger.warning(f"Cannot serve metrics on port {self._metrics_port}: {e}")
+            return
+        logger.debug(f"Serving metrics on http://127.0.0.1:{self._metrics_port}/metrics")
+
+    def _finish_metrics(self) -> None:
+        """Write the `HTTPIE_WS_METRICS` file, a pool keeps serving until it is closed."""
+        if self._metrics_path:
+            fmt = self._metrics_format or (
+                "json" if self._metrics_path.endswith(".json") else "prometheus"
+            )
+            families = self._collect_metrics()
+            text = format_metrics_json(families) if fmt == "json" else format_prometheus(families)
+            try:
+                write_metrics_file(self._metrics_path, text)
+            except OSError as e:
+                logger.warning(f"Cannot write metrics to {self._metrics_path}: {e}")
+        if self._pool is None:
+            self._stop_metrics_server()
+
+    def _stop_metrics_server(self) -> None:
+        if self._metrics_server is not None:
+            self._metrics_server.shutdown()
+            self._metrics_server.server_close()
+            self._metrics_server = None
+
+    def close(
+        self, status: int = STATUS_ABNORMAL_CLOSED, reason: Optional[bytes] = None
+    ) -> None:
+        """Close the WebSocket connection and clean up resources.
+
+        Args:
+            status (int, optional): Close code sent to the server.
+            reason (bytes, optional): Close reason, defaults to ACTIVELY_CLOSE_REASON.
+        """
+        if not self._configured:
+            # Never sent, e.g. requests.Session.close() after an http:// request
+            return
+        if self._pool is not None:
+            # requests.Session.close() lands here
+            self._pool.clear()
+            self._stop_metrics_server()
         if self._running is False:
             return
         self._running = False
+        self._closing.set()
         if self._ws and self._ws.connected:
-            self._ws.close(status=STATUS_ABNORMAL_CLOSED, reason=self.ACTIVELY_CLOSE_REASON)
+            if self._close_code is None:
+                self._close_code = status
+            self._ws.close(
+                status=status,
+                reason=self.ACTIVELY_CLOSE_REASON if reason is None else reason,
+            )
+        if self._stdin_reader:
+            self._stdin_reader.wakeup()
         if self._ws_thread.is_alive():
             self._ws_thread.join(5)
+        if self._stdin_reader:
+            self._stdin_reader.close()
+        self._stop_output()
+        self._stop_recording()
 
-    def send_msg(self, message: str) -> int:
+    def _stop_recording(self) -> None:
+        """Close the session log, load mode connections leave it to the parent."""
+        if self._recorder is not None and self._record_conn is None:
+            self._recorder.close()
+
+    def send_binary(self, data: bytes) -> int:
+        """Send a binary frame."""
+        if not self._ws:
+            raise RequestException("WebSocket not initialized")
+        self._stats.on_send(len(data), OPCODE_BINARY)
+        if self._recorder:
+            self._recorder.record(RECORD_OUT, OPCODE_BINARY, data, self._record_conn or 0)
+        if self._ndjson:
+            self._write_sent(OPCODE_BINARY, data)
+        length = self._deliver(data, OPCODE_BINARY)
+        logger.debug("Sent binary message: %s bytes, frame length: %s", len(data), length)
+        return length
+
+    def _raw_send(self, ws: "websocket.WebSocket", payload: Union[str, bytes], opcode: int) -> int:
+        """Send one message on `ws`, deflated if negotiated."""
+        if self.deflating:
+            return self._send_compressed(
+                ws, payload if isinstance(payload, bytes) else payload.encode("utf8"), opcode
+            )
+        if opcode == OPCODE_BINARY:
+            return ws.send_binary(payload)
+        if isinstance(payload, bytes):
+            return ws.send(payload, OPCODE_TEXT)
+        return ws.send_text(payload)
+
+    def _deliver(self, payload: Union[str, bytes], opcode: int) -> int:
+        """Send a message, or keep it for later while reconnecting.
+
+        Returns:
+            int: The frame length, 0 if the message waits for the reconnect.
+        """
+        while True:
+            with self._outbox_lock:
+                if self._reconnecting:
+                    self._outbox.append((payload, opcode))
+                    return 0
+                ws = self._ws
+            try:
+                return self._raw_send(ws, payload, opcode)  # type: ignore
+            except (websocket.WebSocketConnectionClosedException, OSError):
+                if not self._reconnect or not self._running:
+                    raise
+                with self._outbox_lock:
+                    if self._ws is ws and not self._reconnecting:
+                        # The receiver notices the drop and reconnects
+                        self._reconnecting = True
+                        self._outbox.append((payload, opcode))
+                        return 0
+                # else the receiver already reconnected or is at it, try again
+
+    def _send_compressed(
+        self, ws: "websocket.WebSocket", data: bytes, opcode: int, fin: int = 1
+    ) -> int:
+        """Send a message or fragment deflated, RSV1 on its first frame marks it as compressed."""
+        frame = websocket.ABNF.create_frame(
+            self._compress.compress(data, bool(fin)), opcode, fin  # type: ignore
+        )
+        frame.rsv1 = int(opcode != OPCODE_CONT)
+        return ws.send_frame(frame)
+
+    def _send_payload(self, message: bytes) -> int:
+        """Send a pipe or load mode message as `HTTPIE_WS_OPCODE` frame."""
+        if self._send_opcode == OPCODE_BINARY:
+            return self.send_binary(message)
+        return self.send_msg(message)
+
+    def send_msg(self, message: Union[str, bytes]) -> int:
+        """Send a text message, bytes are sent as UTF-8 text without decoding."""
         if not self._ws:
             raise RequestException("WebSocket not initialized")
-        length: int = self._ws.send_text(message)
-        logger.debug(f"Sent message: {message}, frame length: {length}")
+        # Count bytes on the wire, non-ASCII text is longer once encoded.
+        # Recorded before sending so a fast reply always finds its send timestamp.
+        self._stats.on_send(
+            len(message) if isinstance(message, bytes) or message.isascii()
+            else len(message.encode("utf8"))
+        )
+        if self._recorder:
+            self._recorder.record(RECORD_OUT, OPCODE_TEXT, message, self._record_conn or 0)
+        if self._ndjson:
+            self._write_sent(OPCODE_TEXT, message)
+        length = self._deliver(message, OPCODE_TEXT)
+        # Lazy formatting, this runs once per message in pipe mode
+        logger.debug("Sent message: %s, frame length: %s", message, length)
         return length
 
 
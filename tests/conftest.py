@@ -1,7 +1,193 @@
 # conftest.py
+import asyncio
+import base64
+import hashlib
+import struct
+import threading
+from unittest import mock
+
 import pytest
+from websocket import ABNF, WebSocketConnectionClosedException
+
+from httpie_websockets import AsyncConnection, WebsocketAdapter
 
 
 @pytest.fixture(scope="session", autouse=True)
 def docker_compose():
     yield
+
+
+def accept_key(key: str) -> str:
+    """Sec-WebSocket-Accept value for the client's Sec-WebSocket-Key."""
+    return base64.b64encode(hashlib.sha1((key + AsyncConnection.GUID).encode()).digest()).decode()
+
+
+async def handshake(reader, writer, *headers: str) -> str:
+    """Accept the opening handshake, adding `headers` to the response.
+
+    Returns:
+        str: The request head.
+    """
+    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+    key = next(
+        line.split(":", 1)[1].strip()
+        for line in head.split("\r\n")
+        if line.lower().startswith("sec-websocket-key")
+    )
+    lines = [
+        "HTTP/1.1 101 Switching Protocols",
+        "Upgrade: websocket",
+        "Connection: Upgrade",
+        f"Sec-WebSocket-Accept: {accept_key(key)}",
+        *headers,
+    ]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+    return head
+
+
+async def read_frame(reader) -> ABNF:
+    """Read one frame sent by the client, with its payload unmasked."""
+    b1, b2 = await reader.readexactly(2)
+    length = b2 & 0x7F
+    if length == 126:
+        (length,) = struct.unpack("!H", await reader.readexactly(2))
+    elif length == 127:
+        (length,) = struct.unpack("!Q", await reader.readexactly(8))
+    mask = await reader.readexactly(4) if b2 & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask:
+        payload = ABNF.mask(mask, payload)
+    return ABNF(b1 >> 7, b1 >> 6 & 1, b1 >> 5 & 1, b1 >> 4 & 1, b1 & 0x0F, 0, payload)
+
+
+def server_frame(opcode: int, payload: bytes = b"", fin: int = 1, rsv1: int = 0) -> bytes:
+    """An unmasked frame as the server sends it."""
+    return ABNF(fin, rsv1, 0, 0, opcode, 0, payload).format()
+
+
+def close_code(payload: bytes) -> int:
+    return struct.unpack("!H", payload[:2])[0]
+
+
+async def _stop_servers(servers) -> None:
+    for server in servers:
+        server.close()
+    # Handlers waiting for a client that is gone would keep their sockets open
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@pytest.fixture
+def ws_server():
+    """Start servers on an event loop thread, `ws_server(handler, ssl=None)` returns the port.
+
+    `handler(reader, writer)` runs for every connection, the writer is closed once it
+    returns or the client goes away. The servers and the loop are closed after the test.
+    """
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, name="TestServer", daemon=True)
+    thread.start()
+    servers = []
+
+    def start(handler, ssl=None) -> int:
+        async def handle(reader, writer):
+            try:
+                await handler(reader, writer)
+            except (asyncio.IncompleteReadError, OSError):
+                pass
+            finally:
+                writer.close()
+
+        server = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(handle, "127.0.0.1", 0, ssl=ssl), loop
+        ).result(2)
+        servers.append(server)
+        return server.sockets[0].getsockname()[1]
+
+    yield start
+    asyncio.run_coroutine_threadsafe(_stop_servers(servers), loop).result(2)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(1)
+    loop.close()
+
+
+class FakeSocket:
+    def __init__(self, ws: "FakeWebSocket") -> None:
+        self._ws = ws
+
+    def sendall(self, data: bytes) -> None:
+        if not self._ws.connected:
+            raise BrokenPipeError("socket is closed")
+        self._ws.writes.append(data)
+
+
+class FakeWebSocket:
+    """Stands in for websocket-client's `WebSocket`, receives nothing until closed.
+
+    Sent payloads are kept in `sent`, every write as frames in `writes`. After `accept`
+    messages the next send drops the connection. A `close_code` is received once as the
+    server's close frame, then the server drops the connection.
+    """
+
+    def __init__(self, accept=None, close_code=None):
+        self.connected = True
+        self.sent = []
+        self.writes = []
+        self.lock = threading.Lock()
+        self.sock = FakeSocket(self)
+        self.get_mask_key = None
+        self._accept = accept
+        self._close_code = close_code
+        self._closed = threading.Event()
+
+    def send(self, payload, opcode):
+        if self._accept is not None and len(self.sent) >= self._accept:
+            self.shutdown()
+            raise WebSocketConnectionClosedException("Connection to remote host was lost.")
+        self.sent.append(payload)
+        self.writes.append(ABNF.create_frame(payload, opcode).format())
+        return len(self.writes[-1])
+
+    def send_frame(self, frame):
+        self.sent.append(frame.data)
+        self.writes.append(frame.format())
+        return len(self.writes[-1])
+
+    def send_binary(self, payload):
+        return self.send(payload, ABNF.OPCODE_BINARY)
+
+    def send_text(self, payload):
+        return self.send(payload.encode(), ABNF.OPCODE_TEXT)
+
+    def recv_data(self):
+        if self._close_code is not None:
+            code, self._close_code = self._close_code, None
+            self._closed.set()
+            return ABNF.OPCODE_CLOSE, struct.pack("!H", code)
+        self._closed.wait()
+        raise WebSocketConnectionClosedException("Connection to remote host was lost.")
+
+    def shutdown(self):
+        self.connected = False
+        self._closed.set()
+
+    def close(self, status, reason):
+        self.shutdown()
+
+    def getheaders(self):
+        return {}
+
+
+@pytest.fixture
+def fake_connect():
+    """Connect sessions to new `FakeWebSocket`s, listed in the order they connected."""
+    sockets = []
+
+    def connect(self, request, **kwargs):
+        self._ws = FakeWebSocket()
+        sockets.append(self._ws)
+
+    with mock.patch.object(WebsocketAdapter, "_connect", connect):
+        yield sockets
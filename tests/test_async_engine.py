@@ -0,0 +1,123 @@
+import asyncio
+import io
+import os
+import struct
+
+import pytest
+from requests.models import Request
+from websocket import ABNF
+
+from httpie_websockets import AsyncConnection, WebsocketAdapter
+from tests.conftest import close_code, handshake, read_frame, server_frame
+
+
+async def _echo_handler(reader, writer):
+    await handshake(reader, writer)
+    # Answer with a ping first, the client must pong it
+    writer.write(server_frame(ABNF.OPCODE_PING, b"hb"))
+    while True:
+        frame = await read_frame(reader)
+        if frame.opcode == ABNF.OPCODE_CLOSE:
+            writer.close()
+            return
+        if frame.opcode == ABNF.OPCODE_PONG:
+            continue
+        # Echo back split into two fragments
+        writer.write(server_frame(frame.opcode, frame.data[:2], fin=0))
+        writer.write(server_frame(ABNF.OPCODE_CONT, frame.data[2:]))
+        writer.write(server_frame(ABNF.OPCODE_CLOSE, struct.pack("!H", 1001)))
+
+
+def test_async_connection_round_trip():
+    async def run():
+        server = await asyncio.start_server(_echo_handler, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        conn = AsyncConnection()
+        await conn.connect(f"ws://127.0.0.1:{port}/path", header=["X-Test: 1"], timeout=2)
+        await conn.send(b"hello world")
+        message = await conn.recv_data()
+        close = await conn.recv_data()
+        server.close()
+        return conn, message, close
+
+    conn, message, close = asyncio.run(run())
+
+    assert message == (ABNF.OPCODE_TEXT, b"hello world")
+    assert close[0] == ABNF.OPCODE_CLOSE
+    assert struct.unpack("!H", close[1][:2])[0] == 1001
+    assert conn.connected is False
+    assert conn.status == 101
+
+
+def test_use_asyncio(monkeypatch):
+    monkeypatch.setenv("HTTPIE_WS_ENGINE", "asyncio")
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    assert adapter._use_asyncio(None, interactive=False) is True
+    assert adapter._use_asyncio({"http": "http://proxy"}, interactive=False) is False
+
+
+def test_thread_engine_by_default():
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    assert adapter._use_asyncio(None, interactive=False) is False
+
+
+@pytest.mark.parametrize("engine", ["thread", "asyncio"])
+def test_send_connect_error(monkeypatch, engine):
+    monkeypatch.setenv("HTTPIE_WS_ENGINE", engine)
+    monkeypatch.setenv("HTTPIE_WS_MODE", "pipe")
+    monkeypatch.setenv("HTTPIE_WS_INPUT", "/dev/null")
+    adapter = WebsocketAdapter()
+    request = Request(url="ws://127.0.0.1:1/").prepare()
+
+    response = adapter.send(request, timeout=1)
+
+    assert response.status_code == 500
+    assert response.reason.startswith("Cannot connect to websocket")
+
+
+def test_async_chunks_character_device():
+    async def run():
+        stop = asyncio.get_running_loop().create_future()
+        with open(os.devnull, "rb") as source:
+            return [chunk async for chunk in WebsocketAdapter._async_chunks(source, stop)]
+
+    assert asyncio.run(run()) == []
+
+
+def _invalid_text_handler(closes):
+    """Send a text message that is not UTF-8, then answer the client's close."""
+
+    async def handle(reader, writer):
+        await handshake(reader, writer)
+        writer.write(server_frame(ABNF.OPCODE_TEXT, b"\xff\xfe bad"))
+        await writer.drain()
+        frame = await read_frame(reader)
+        closes.append(close_code(frame.data))
+        writer.write(server_frame(ABNF.OPCODE_CLOSE, frame.data))
+        await writer.drain()
+
+    return handle
+
+
+@pytest.mark.parametrize("stream", ["0", "1"])
+@pytest.mark.parametrize("engine", ["thread", "asyncio"])
+def test_invalid_text_fails_connection(monkeypatch, ws_server, engine, stream):
+    closes = []
+    port = ws_server(_invalid_text_handler(closes))
+    monkeypatch.setenv("HTTPIE_WS_ENGINE", engine)
+    monkeypatch.setenv("HTTPIE_WS_STREAM", stream)
+    monkeypatch.setenv("HTTPIE_WS_DRAIN", "-1")
+    monkeypatch.setenv("HTTPIE_WS_INPUT", "/dev/null")
+    adapter = WebsocketAdapter()
+    adapter._stdout = io.StringIO()
+
+    response = adapter.send(Request(url=f"ws://127.0.0.1:{port}/").prepare(), timeout=2)
+
+    body = response.raw.read().decode()
+    assert closes == [1007]
+    assert "Close Code: 1007" in body
+    assert "Close Msg: invalid payload" in body
+    assert adapter._stats.errors == 1
+    assert adapter._stdout.getvalue() == ""
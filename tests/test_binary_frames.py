@@ -0,0 +1,110 @@
+import io
+import os
+import select
+from unittest.mock import MagicMock
+
+import pytest
+from websocket import ABNF
+
+from httpie_websockets import WebsocketAdapter, split_messages
+
+PAYLOAD = b"\x08\x96\x01\xff"
+
+
+def _adapter(monkeypatch, mode):
+    monkeypatch.setenv("HTTPIE_WS_BINARY", mode)
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    adapter._running = True
+    adapter._write_stdout = MagicMock()
+    return adapter
+
+
+@pytest.mark.parametrize(
+    "mode, expected",
+    [
+        ("text", "base64:CJYB/w=="),
+        ("hex", "089601ff"),
+        ("base64", "CJYB/w=="),
+    ],
+)
+def test_binary_frame_rendering(monkeypatch, mode, expected):
+    adapter = _adapter(monkeypatch, mode)
+    adapter._on_frame(ABNF.OPCODE_BINARY, PAYLOAD)
+    adapter._write_stdout.assert_called_once_with(expected)
+
+
+def test_binary_frame_text_mode_decodes_utf8(monkeypatch):
+    adapter = _adapter(monkeypatch, "text")
+    adapter._on_frame(ABNF.OPCODE_BINARY, "héllo".encode("utf8"))
+    adapter._write_stdout.assert_called_once_with("héllo")
+
+
+def test_binary_frame_raw_mode(monkeypatch):
+    monkeypatch.setenv("HTTPIE_WS_BINARY", "raw")
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    adapter._running = True
+    buffer = io.BytesIO()
+    adapter._stdout = io.TextIOWrapper(buffer, encoding="utf8")
+
+    adapter._write_stdout("before")
+    adapter._on_frame(ABNF.OPCODE_BINARY, PAYLOAD)
+    adapter._write_stdout("after")
+    adapter._stdout.flush()
+
+    assert buffer.getvalue() == b"before\n" + PAYLOAD + b"after\n"
+
+
+@pytest.fixture
+def pipe_stdout():
+    """Text stream on the write end of a pipe, buffered like stdout redirected to a pipe."""
+    read_fd, write_fd = os.pipe()
+    stdout = io.TextIOWrapper(io.BufferedWriter(io.FileIO(write_fd, "w")), encoding="utf8")
+    yield stdout, read_fd
+    stdout.close()
+    os.close(read_fd)
+
+
+def _read_pipe(fd, timeout):
+    ready, _, _ = select.select([fd], [], [], timeout)
+    return os.read(fd, 1024) if ready else b""
+
+
+@pytest.mark.parametrize("flush", ["interval", "size"])
+def test_binary_frame_raw_mode_flushed(monkeypatch, pipe_stdout, flush):
+    stdout, read_fd = pipe_stdout
+    monkeypatch.setenv("HTTPIE_WS_BINARY", "raw")
+    monkeypatch.setenv("HTTPIE_WS_FLUSH_INTERVAL", "0.05")
+    monkeypatch.setenv("HTTPIE_WS_FLUSH_SIZE", "4")
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    adapter._running = True
+    adapter._stdout = stdout
+    if flush == "size":
+        adapter._flush_mode = "size"
+    adapter._start_output(interactive=False)
+    assert adapter._flush_mode == flush
+
+    adapter._on_frame(ABNF.OPCODE_BINARY, PAYLOAD)
+    assert _read_pipe(read_fd, 1) == PAYLOAD
+    adapter._on_frame(ABNF.OPCODE_BINARY, b"\x00")
+    adapter._stop_output()
+    assert _read_pipe(read_fd, 1) == b"\x00"
+
+
+def test_send_binary_opcode(monkeypatch):
+    monkeypatch.setenv("HTTPIE_WS_OPCODE", "binary")
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    adapter._ws = MagicMock()
+    adapter._ws.send_binary.return_value = 10
+
+    assert adapter._send_payload(PAYLOAD) == 10
+    adapter._ws.send_binary.assert_called_once_with(PAYLOAD)
+    assert adapter._stats.bytes_out == len(PAYLOAD)
+
+
+def test_split_messages_whole_input():
+    stream = io.BytesIO(b"a\nb\0c")
+    assert list(split_messages(stream, b"", chunk_size=2)) == [b"a\nb\0c"]
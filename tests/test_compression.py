@@ -0,0 +1,154 @@
+import io
+import zlib
+
+import pytest
+from requests.models import Request
+from websocket import ABNF
+
+from httpie_websockets import PerMessageDeflate, WebsocketAdapter
+from tests.conftest import handshake, read_frame, server_frame
+
+
+def test_round_trip_with_context_takeover():
+    client, server = PerMessageDeflate(), PerMessageDeflate()
+    assert client.accept("permessage-deflate") and server.accept("permessage-deflate")
+    payload = b'{"name": "value", "list": [1, 2, 3]}' * 20
+
+    first = client.compress(payload)
+    second = client.compress(payload)
+
+    assert not first.endswith(PerMessageDeflate.TAIL)
+    # The second message refers back to the first one
+    assert len(second) < len(first) < len(payload)
+    assert server.decompress(first) == payload
+    assert server.decompress(second) == payload
+    assert (client.bytes_out, client.wire_out) == (2 * len(payload), len(first) + len(second))
+    assert (server.bytes_in, server.wire_in) == (client.bytes_out, client.wire_out)
+
+
+def test_client_no_context_takeover():
+    client = PerMessageDeflate()
+    client.accept("permessage-deflate; client_no_context_takeover")
+    payload = b"abcdefgh" * 50
+    assert client.compress(payload) == client.compress(payload)
+
+
+def test_offer():
+    assert PerMessageDeflate().offer() == "permessage-deflate; client_max_window_bits"
+    assert PerMessageDeflate(window_bits=10, no_context_takeover=True).offer() == (
+        "permessage-deflate; client_no_context_takeover; server_no_context_takeover; "
+        "client_max_window_bits=10; server_max_window_bits=10"
+    )
+
+
+def test_accept_parameters():
+    deflate = PerMessageDeflate(window_bits=12)
+    assert deflate.accept(
+        "permessage-deflate; server_no_context_takeover; client_max_window_bits=10"
+    )
+    assert deflate.server_no_context_takeover is True
+    assert deflate.client_window_bits == 10
+
+
+@pytest.mark.parametrize(
+    "header",
+    [
+        "x-webkit-deflate-frame",
+        "permessage-deflate; unknown",
+        "permessage-deflate; client_max_window_bits=20",
+        "permessage-deflate, permessage-deflate",
+    ],
+)
+def test_accept_invalid(header):
+    with pytest.raises(ValueError):
+        PerMessageDeflate().accept(header)
+
+
+def test_accept_declined():
+    deflate = PerMessageDeflate()
+    assert deflate.accept(None) is False
+    assert "not accepted" in deflate.summary()
+
+
+def test_headers_offer_from_env(monkeypatch):
+    monkeypatch.setenv("HTTPIE_WS_COMPRESS", "1")
+    monkeypatch.setenv("HTTPIE_WS_COMPRESS_WINDOW_BITS", "11")
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    headers = adapter.convert2ws_headers({})
+    assert headers == [
+        "Sec-WebSocket-Extensions: permessage-deflate; "
+        "client_max_window_bits=11; server_max_window_bits=11"
+    ]
+
+
+def test_headers_user_offer_replaces_passthrough():
+    request = {"Sec-WebSocket-Extensions": "permessage-deflate; client_no_context_takeover"}
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    adapter._take_offer(request)
+    deflate = adapter._compress
+    deflate.bytes_out = 10
+
+    headers = adapter.convert2ws_headers(request)
+
+    assert headers[-1] == (
+        "Sec-WebSocket-Extensions: permessage-deflate; "
+        "client_no_context_takeover; server_no_context_takeover; client_max_window_bits"
+    )
+    # Converting the headers again for a reconnect keeps the counters
+    assert adapter.convert2ws_headers(request) == headers
+    assert adapter._compress is deflate
+    assert deflate.bytes_out == 10
+
+
+def test_headers_unsupported_extension_dropped(caplog):
+    request = {"Sec-WebSocket-Extensions": "x-custom"}
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    adapter._take_offer(request)
+    headers = adapter.convert2ws_headers(request)
+    assert not any(h.startswith("Sec-WebSocket-Extensions") for h in headers)
+    assert adapter._compress is None
+    assert "Unsupported websocket extensions" in caplog.text
+
+
+async def _deflate_echo_handler(reader, writer):
+    """Accept permessage-deflate and echo every message compressed, then close."""
+    await handshake(
+        reader, writer, "Sec-WebSocket-Extensions: permessage-deflate; server_no_context_takeover"
+    )
+    frame = await read_frame(reader)
+    assert frame.rsv1, "client message is not compressed"
+    message = zlib.decompressobj(-15).decompress(frame.data + PerMessageDeflate.TAIL)
+    compressor = zlib.compressobj(wbits=-15)
+    reply = (compressor.compress(message) + compressor.flush(zlib.Z_SYNC_FLUSH))[:-4]
+    writer.write(server_frame(ABNF.OPCODE_TEXT, reply, rsv1=1))
+    writer.write(server_frame(ABNF.OPCODE_CLOSE, b"\x03\xe8"))
+    await writer.drain()
+    await reader.read()
+
+
+@pytest.fixture
+def deflate_server(ws_server):
+    return ws_server(_deflate_echo_handler)
+
+
+@pytest.mark.parametrize("engine", ["thread", "asyncio"])
+def test_send_compressed_round_trip(monkeypatch, deflate_server, engine):
+    monkeypatch.setenv("HTTPIE_WS_ENGINE", engine)
+    monkeypatch.setenv("HTTPIE_WS_COMPRESS", "1")
+    monkeypatch.setenv("HTTPIE_WS_DRAIN", "-1")
+    message = '{"greeting": "hello hello hello hello hello"}'
+    adapter = WebsocketAdapter()
+    adapter._stdout = io.StringIO()
+    request = Request(url=f"ws://127.0.0.1:{deflate_server}/", data=message).prepare()
+
+    response = adapter.send(request, timeout=2)
+
+    body = response.raw.read().decode()
+    assert adapter._stdout.getvalue() == message + "\n"
+    assert "Extension: permessage-deflate; server_no_context_takeover" in body
+    assert f"Sent: {len(message)} bytes" in body
+    assert f"Received: {len(message)} bytes" in body
+    assert adapter._compress.wire_out < len(message)
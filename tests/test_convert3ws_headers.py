@@ -6,7 +6,9 @@ from httpie_websockets import WebsocketAdapter
 
 @pytest.fixture
 def adapter():
-    return WebsocketAdapter()
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    return adapter
 
 
 def test_empty_headers(adapter):
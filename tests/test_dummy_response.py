@@ -8,6 +8,7 @@ from httpie_websockets import WebsocketAdapter  # 替换为实际模块名称
 
 def test_dummy_response_default():
     adapter = WebsocketAdapter()
+    adapter._configure()
 
     request = PreparedRequest()
     request.url = "ws://localhost:8080"
@@ -44,6 +45,7 @@ def test_dummy_response_with_status_and_msg():
 
 def test_dummy_response_with_ws_headers():
     adapter = WebsocketAdapter()
+    adapter._configure()
 
     request = PreparedRequest()
     request.url = "ws://localhost:8080"
@@ -63,6 +65,7 @@ def test_dummy_response_with_ws_headers():
 
 def test_dummy_response_with_close_info():
     adapter = WebsocketAdapter()
+    adapter._configure()
 
     request = PreparedRequest()
     request.url = "ws://localhost:8080"
@@ -0,0 +1,120 @@
+import io
+import re
+import socket
+
+import pytest
+from requests.models import Request
+from websocket import ABNF
+
+from httpie_websockets import WebsocketAdapter
+from tests.conftest import handshake, read_frame, server_frame
+
+
+def _handler(name, received):
+    """Greet with `name`, echo text messages prefixed with it and the close frame."""
+
+    async def handle(reader, writer):
+        await handshake(reader, writer)
+        writer.write(server_frame(ABNF.OPCODE_TEXT, f"hello from {name}".encode()))
+        while True:
+            frame = await read_frame(reader)
+            if frame.opcode == ABNF.OPCODE_TEXT:
+                received.append(frame.data)
+                writer.write(server_frame(ABNF.OPCODE_TEXT, name.encode() + b": " + frame.data))
+            elif frame.opcode == ABNF.OPCODE_CLOSE:
+                writer.write(server_frame(ABNF.OPCODE_CLOSE, frame.data))
+                break
+            await writer.drain()
+
+    return handle
+
+
+@pytest.fixture
+def servers(ws_server):
+    def start(name):
+        received = []
+        return f"ws://127.0.0.1:{ws_server(_handler(name, received))}/{name}", received
+
+    return start
+
+
+def _send(monkeypatch, url, fanout, data="ping", **options):
+    monkeypatch.setenv("HTTPIE_WS_FANOUT", fanout)
+    monkeypatch.setenv("HTTPIE_WS_DRAIN", "0.2")
+    monkeypatch.setenv("HTTPIE_WS_FLUSH", "line")
+    for name, value in options.items():
+        monkeypatch.setenv(f"HTTPIE_WS_{name.upper()}", value)
+    adapter = WebsocketAdapter()
+    adapter._stdout = io.StringIO()
+    response = adapter.send(Request(url=url, data=data).prepare(), timeout=2)
+    return adapter, response
+
+
+LINE = re.compile(r"^\[\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d\.\d{3} (127\.0\.0\.1:\d+/\w+)\] (.*)$")
+
+
+def test_merges_tagged_output(monkeypatch, servers):
+    url_a, received_a = servers("a")
+    url_b, received_b = servers("b")
+
+    adapter, response = _send(monkeypatch, url_a, url_b)
+
+    lines = [LINE.match(line).groups() for line in adapter._stdout.getvalue().splitlines()]
+    assert sorted(text for _, text in lines) == ["a: ping", "hello from a", "hello from b"]
+    assert {tag.rsplit("/", 1)[1] for tag, _ in lines} == {"a", "b"}
+    # Input goes to the request URL only
+    assert received_a == [b"ping"]
+    assert received_b == []
+    body = response.raw.read().decode()
+    assert "Endpoints: 2, connected: 2" in body
+    assert re.search(r"#1 127\.0\.0\.1:\d+/b received: 1 ", body)
+
+
+def test_broadcast(monkeypatch, servers):
+    url_a, received_a = servers("a")
+    url_b, received_b = servers("b")
+
+    adapter, _ = _send(monkeypatch, url_a, url_b, data="one\ntwo", broadcast="1")
+
+    assert received_a == received_b == [b"one", b"two"]
+    assert adapter._stats.msgs_in == 6
+    assert adapter._stats.msgs_out == 4
+
+
+def test_failed_endpoint_reported(monkeypatch, servers):
+    url_a, _ = servers("a")
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        closed = f"ws://127.0.0.1:{sock.getsockname()[1]}/gone"
+
+    adapter, response = _send(monkeypatch, url_a, closed)
+
+    assert response.status_code == 200
+    body = response.raw.read().decode()
+    assert "Endpoints: 2, connected: 1" in body
+    assert re.search(r"#1 127\.0\.0\.1:\d+/gone received: 0 .* errors: 1", body)
+
+
+def test_all_endpoints_fail(monkeypatch):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        closed = f"ws://127.0.0.1:{sock.getsockname()[1]}/"
+
+    _, response = _send(monkeypatch, closed, closed)
+
+    assert response.status_code == 500
+    assert "Cannot connect to websocket" in response.reason
+
+
+def test_partial_line_tagged_once():
+    parent, child = WebsocketAdapter(), WebsocketAdapter()
+    parent._configure()
+    child._configure()
+    parent._stdout = io.StringIO()
+    parent._flush_mode = "line"
+    child._parent, child._tag, child._running = parent, "host/path", True
+
+    child._write_stdout("first ", newline=False)
+    child._write_stdout("second")
+
+    assert re.fullmatch(r"\[[^ ]+ host/path\] first second\n", parent._stdout.getvalue())
@@ -0,0 +1,106 @@
+import io
+import json
+
+import pytest
+from websocket import ABNF
+
+from httpie_websockets import MessageFilter, WebsocketAdapter, parse_path
+
+TRADE = b'{"type": "trade", "data": {"price": 101.5, "tags": ["a", "b"]}}'
+QUOTE = b'{"type": "quote", "data": {"price": 99}}'
+
+
+def test_parse_path():
+    assert parse_path(".data.tags[1]") == ("data", "tags", 1)
+    assert parse_path("data.tags.1") == ("data", "tags", 1)
+    with pytest.raises(ValueError):
+        parse_path(".")
+    with pytest.raises(ValueError):
+        parse_path("data[1")
+
+
+def _adapter(monkeypatch, **options):
+    for name, value in options.items():
+        monkeypatch.setenv(f"HTTPIE_WS_{name.upper()}", value)
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    adapter._stdout = io.StringIO()
+    adapter._flush_mode = "line"
+    adapter._running = True
+    return adapter
+
+
+def _receive(adapter, *messages):
+    for message in messages:
+        adapter._on_frame(ABNF.OPCODE_TEXT, message)
+    return adapter._stdout.getvalue().splitlines()
+
+
+@pytest.mark.parametrize("match", ['"trade"', 're:"price": 1\\d\\d'])
+def test_match(monkeypatch, match):
+    adapter = _adapter(monkeypatch, match=match)
+
+    assert _receive(adapter, TRADE, QUOTE) == [TRADE.decode()]
+    assert (adapter._filter.emitted, adapter._filter.matched_out) == (1, 1)
+    # Filtered messages are still received
+    assert adapter._stats.msgs_in == 2
+
+
+@pytest.mark.parametrize(
+    "where, expected",
+    [
+        ('type == "trade"', [TRADE]),
+        ("type == trade", [TRADE]),
+        ("data.price > 100", [TRADE]),
+        ("data.price <= 99", [QUOTE]),
+        ("data.tags", [TRADE]),
+        ("data.tags[5]", []),
+        ("type > 1", []),
+    ],
+)
+def test_where(monkeypatch, where, expected):
+    adapter = _adapter(monkeypatch, where=where)
+
+    assert _receive(adapter, TRADE, QUOTE, b"not json") == [m.decode() for m in expected]
+    assert adapter._filter.rejected == 3 - len(expected)
+
+
+def test_select(monkeypatch):
+    adapter = _adapter(monkeypatch, match="price", select=".data.price")
+
+    assert _receive(adapter, TRADE, QUOTE, b'{"price": 1}') == ["101.5", "99"]
+
+
+def test_select_ndjson(monkeypatch):
+    adapter = _adapter(monkeypatch, output="ndjson", where='type == "trade"', select="data.tags")
+
+    lines = _receive(adapter, TRADE, QUOTE)
+
+    assert [json.loads(line)["text"] for line in lines] == ['["a","b"]']
+
+
+def test_summary(monkeypatch):
+    adapter = _adapter(monkeypatch, match="trade", where="data.price > 200")
+    _receive(adapter, TRADE, QUOTE)
+
+    assert "Filter info:\nEmitted: 0, Filtered: 2 (match 1, predicate 1)" in adapter._info_sections()
+
+
+def test_invalid_options(monkeypatch, caplog):
+    adapter = _adapter(monkeypatch, match="re:(", where="a ==", select="")
+
+    assert adapter._filter is None
+    assert "Invalid value for HTTPIE_WS_MATCH" in caplog.text
+    assert "Invalid value for HTTPIE_WS_WHERE" in caplog.text
+
+
+def test_disables_stream(monkeypatch):
+    adapter = _adapter(monkeypatch, stream="1", match="trade")
+    assert adapter._stream is False
+
+
+def test_no_filter_by_default():
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    assert adapter._filter is None
+    assert isinstance(MessageFilter().apply(b"x"), bytes)
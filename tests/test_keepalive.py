@@ -0,0 +1,97 @@
+import io
+import struct
+
+import pytest
+from requests.models import Request
+from websocket import ABNF
+
+from httpie_websockets import WebsocketAdapter
+from tests.conftest import close_code, handshake, read_frame, server_frame
+
+
+def _handler(answer_pings, closes):
+    """Echo text messages and the close frame, answer pings only if `answer_pings`."""
+
+    async def handle(reader, writer):
+        await handshake(reader, writer)
+        while True:
+            frame = await read_frame(reader)
+            if frame.opcode == ABNF.OPCODE_PING and answer_pings:
+                writer.write(server_frame(ABNF.OPCODE_PONG, frame.data))
+            elif frame.opcode == ABNF.OPCODE_TEXT:
+                writer.write(server_frame(ABNF.OPCODE_TEXT, frame.data))
+            elif frame.opcode == ABNF.OPCODE_CLOSE:
+                closes.append(close_code(frame.data))
+                writer.write(server_frame(ABNF.OPCODE_CLOSE, frame.data))
+                break
+            await writer.drain()
+
+    return handle
+
+
+@pytest.fixture
+def ping_server(request, ws_server):
+    closes = []
+    return ws_server(_handler(request.param, closes)), closes
+
+
+def _send(port, engine, monkeypatch, data="hello"):
+    monkeypatch.setenv("HTTPIE_WS_ENGINE", engine)
+    monkeypatch.setenv("HTTPIE_WS_PING_INTERVAL", "0.05")
+    monkeypatch.setenv("HTTPIE_WS_PING_TIMEOUT", "0.2")
+    adapter = WebsocketAdapter()
+    adapter._stdout = io.StringIO()
+    request = Request(url=f"ws://127.0.0.1:{port}/", data=data).prepare()
+    response = adapter.send(request, timeout=2)
+    return adapter, response.raw.read().decode()
+
+
+@pytest.mark.parametrize("ping_server", [True], indirect=True)
+@pytest.mark.parametrize("engine", ["thread", "asyncio"])
+def test_pongs_measure_rtt(monkeypatch, ping_server, engine):
+    port, closes = ping_server
+    monkeypatch.setenv("HTTPIE_WS_DRAIN", "0.3")
+
+    adapter, body = _send(port, engine, monkeypatch)
+
+    assert adapter._stdout.getvalue() == "hello\n"
+    assert adapter._stats.pings >= 2
+    assert adapter._stats.ping_rtt.count >= adapter._stats.pings - 1
+    assert "Keepalive info:" in body
+    assert "Ping RTT (ms): p50" in body
+    assert "Close Code: 1000" in body
+    assert closes == [1000]
+
+
+@pytest.mark.parametrize("ping_server", [False], indirect=True)
+@pytest.mark.parametrize("engine", ["thread", "asyncio"])
+def test_overdue_pong_closes(monkeypatch, ping_server, engine):
+    port, closes = ping_server
+    # Only a closed connection ends the session
+    monkeypatch.setenv("HTTPIE_WS_DRAIN", "-1")
+
+    adapter, body = _send(port, engine, monkeypatch)
+
+    assert "Close Code: 1011" in body
+    assert "Close Msg: keepalive ping timeout" in body
+    assert "Pings: sent 1, answered 0" in body
+    assert closes == [1011]
+
+
+def test_unsolicited_pong_ignored():
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    adapter._ping_payload = struct.pack("!Q", 1)
+
+    assert adapter._on_pong(b"") is False
+    assert adapter._on_pong(struct.pack("!Q", 2)) is False
+    assert adapter._stats.ping_rtt.count == 0
+    assert adapter._on_pong(struct.pack("!Q", 1)) is True
+    assert adapter._stats.ping_rtt.count == 1
+
+
+def test_no_pings_by_default():
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    assert adapter._ping_interval == 0
+    assert not any("Keepalive" in s for s in adapter._info_sections())
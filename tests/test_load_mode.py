@@ -0,0 +1,71 @@
+import io
+import threading
+import time
+from unittest import mock
+
+from requests.models import Request
+
+from httpie_websockets import AdapterError, WebsocketAdapter
+
+
+def _send(data=None):
+    adapter = WebsocketAdapter()
+    request = Request(url="ws://localhost:8080", data=data).prepare()
+    started = time.monotonic()
+    response = adapter.send(request)
+    return response, time.monotonic() - started
+
+
+def test_load_count_and_rate(monkeypatch, fake_connect):
+    monkeypatch.setenv("HTTPIE_WS_CONNECTIONS", "2")
+    monkeypatch.setenv("HTTPIE_WS_COUNT", "3")
+    monkeypatch.setenv("HTTPIE_WS_RATE", "20")
+    monkeypatch.setenv("HTTPIE_WS_DRAIN", "0")
+
+    response, elapsed = _send("msg {conn}-{seq}")
+
+    # 20 msg/s over 2 connections is one message per 0.1s on each of them
+    assert elapsed >= 0.2
+    assert sorted(ws.sent[0] for ws in fake_connect) == [b"msg 0-0", b"msg 1-0"]
+    assert all(len(ws.sent) == 3 for ws in fake_connect)
+    body = response.raw.read().decode()
+    assert body.startswith("Load test info:\nConnections: 2")
+    assert "Sent: 6 (" in body
+    assert "Websocket connection info" not in body
+
+
+def test_load_stops_at_deadline(monkeypatch, fake_connect):
+    monkeypatch.setenv("HTTPIE_WS_MODE", "load")
+    monkeypatch.setenv("HTTPIE_WS_RATE", "10")
+    monkeypatch.setenv("HTTPIE_WS_DURATION", "0.35")
+
+    response, elapsed = _send("ping")
+
+    assert elapsed < 1
+    assert len(fake_connect[0].sent) <= 4
+    assert "#0 sent: " in response.raw.read().decode()
+
+
+def test_load_receive_only_ends_when_connection_drops(monkeypatch, fake_connect):
+    monkeypatch.setenv("HTTPIE_WS_CONNECTIONS", "2")
+    monkeypatch.setenv("HTTPIE_WS_DURATION", "30")
+    monkeypatch.setenv("HTTPIE_WS_MODE", "load")
+    monkeypatch.setattr("sys.stdin", io.StringIO())
+    threading.Timer(0.1, lambda: [ws.close(1000, b"") for ws in fake_connect]).start()
+
+    response, elapsed = _send()
+
+    assert elapsed < 5
+    assert "Errors: 2" in response.raw.read().decode()
+
+
+def test_load_connect_error(monkeypatch):
+    monkeypatch.setenv("HTTPIE_WS_CONNECTIONS", "2")
+    with mock.patch.object(
+        WebsocketAdapter, "_connect", side_effect=AdapterError(500, "refused")
+    ):
+        response, _ = _send("msg")
+
+    body = response.raw.read().decode()
+    assert "Errors: 2" in body
+    assert "close code: -, refused" in body
@@ -0,0 +1,146 @@
+import asyncio
+import threading
+
+import pytest
+from requests.models import Request
+from websocket import ABNF
+
+from httpie_websockets import MessageBody, WebsocketAdapter
+from tests.conftest import close_code, handshake, read_frame, server_frame
+
+
+def test_body_reads_across_chunks():
+    body = MessageBody()
+    body.write(b"abc")
+    body.write(b"defg")
+    body.finish()
+
+    assert body.read(2) == b"ab"
+    assert body.read(3) == b"cde"
+    assert body.read(10) == b"fg"
+    assert body.read(10) == b""
+
+
+def test_body_full_buffer_waits_for_reader():
+    body = MessageBody(limit=4)
+    body.write(b"abcd")
+    writer = threading.Thread(target=body.write, args=(b"ef",))
+    writer.start()
+    writer.join(0.1)
+    assert writer.is_alive()
+
+    assert body.read(3) == b"abc"
+    writer.join(1)
+    assert not writer.is_alive()
+    body.finish()
+    assert body.read() == b"def"
+
+
+def test_body_close_drops_writes():
+    body = MessageBody(limit=1)
+    closed = []
+    body.on_close = lambda: closed.append(True)
+    body.write(b"a")
+    writer = threading.Thread(target=body.write, args=(b"b",))
+    writer.start()
+
+    body.close()
+    writer.join(1)
+
+    assert not writer.is_alive()
+    assert closed == [True]
+    body.write(b"c")
+    body.flush()
+
+
+def _handler(closes, gate):
+    """Send "first", wait for `gate`, then echo text messages until the client closes."""
+
+    async def handle(reader, writer):
+        await handshake(reader, writer)
+        writer.write(server_frame(ABNF.OPCODE_TEXT, b"first"))
+        await writer.drain()
+        await asyncio.get_running_loop().run_in_executor(None, gate.wait, 2)
+        while True:
+            frame = await read_frame(reader)
+            if frame.opcode == ABNF.OPCODE_CLOSE:
+                closes.append(close_code(frame.data))
+                writer.write(server_frame(ABNF.OPCODE_CLOSE, frame.data))
+                break
+            writer.write(server_frame(ABNF.OPCODE_TEXT, frame.data))
+            await writer.drain()
+
+    return handle
+
+
+@pytest.fixture
+def gated_server(ws_server):
+    closes, gate = [], threading.Event()
+    yield ws_server(_handler(closes, gate)), closes, gate
+    gate.set()
+
+
+@pytest.fixture
+def body_mode(monkeypatch):
+    monkeypatch.setenv("HTTPIE_WS_BODY", "messages")
+    monkeypatch.setenv("HTTPIE_WS_FLUSH", "line")
+    monkeypatch.setenv("HTTPIE_WS_DRAIN", "0.2")
+
+
+@pytest.mark.parametrize("engine", ["thread", "asyncio"])
+def test_messages_streamed_as_body(monkeypatch, body_mode, gated_server, capsys, engine):
+    port, closes, gate = gated_server
+    monkeypatch.setenv("HTTPIE_WS_ENGINE", engine)
+    request = Request(url=f"ws://127.0.0.1:{port}/", data="one\ntwo").prepare()
+
+    response = WebsocketAdapter().send(request, timeout=2)
+    # The session is still waiting for the gate
+    first = response.raw.read(6)
+    gate.set()
+    body = first + b"".join(response.iter_content(1024))
+
+    assert first == b"first\n"
+    assert body == b"first\none\ntwo\n"
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == "text/plain; charset=utf-8"
+    assert response.headers["Upgrade"] == "websocket"
+    assert closes == [1000]
+    assert "Close Code: 1000" in capsys.readouterr().err
+
+
+def test_ndjson_body(monkeypatch, body_mode, gated_server):
+    port, _, gate = gated_server
+    gate.set()
+    monkeypatch.setenv("HTTPIE_WS_OUTPUT", "ndjson")
+    request = Request(url=f"ws://127.0.0.1:{port}/", data="one").prepare()
+
+    response = WebsocketAdapter().send(request, timeout=2)
+    lines = list(response.iter_lines())
+
+    assert response.headers["Content-Type"] == "application/x-ndjson"
+    messages = [line for line in lines if b'"type":"message"' in line]
+    # "first" and the sent message race each other
+    assert len(messages) == 3
+    assert sum(b'"dir":"out"' in line for line in messages) == 1
+
+
+def test_close_response_ends_session(body_mode, gated_server):
+    port, closes, _ = gated_server
+    request = Request(url=f"ws://127.0.0.1:{port}/", data="one").prepare()
+    adapter = WebsocketAdapter()
+
+    response = adapter.send(request, timeout=2)
+    assert response.raw.read(6) == b"first\n"
+    response.close()
+
+    assert not adapter._running
+    assert adapter.close_code == 1006
+
+
+def test_connect_error_is_returned(body_mode):
+    request = Request(url="ws://127.0.0.1:1/", data="one").prepare()
+
+    response = WebsocketAdapter().send(request, timeout=2)
+
+    assert response.status_code == 500
+    assert "Cannot connect to websocket" in response.raw.read().decode()
@@ -0,0 +1,211 @@
+import io
+import json
+import socket
+import urllib.error
+import urllib.request
+
+import pytest
+from requests.models import Request
+from websocket import ABNF
+
+from httpie_websockets import (
+    LatencyHistogram,
+    SessionStats,
+    WebsocketAdapter,
+    format_metrics_json,
+    format_prometheus,
+)
+from tests.conftest import handshake, read_frame, server_frame
+
+
+def test_stats_by_opcode():
+    stats = SessionStats()
+    stats.on_send(3)
+    stats.on_send(10, ABNF.OPCODE_BINARY)
+    stats.on_receive(3)
+    stats.on_close(None)
+    other = SessionStats()
+    other.on_send(4)
+    other.on_close(1000)
+
+    stats.merge(other)
+
+    assert stats.opcodes_out == {ABNF.OPCODE_TEXT: [2, 7], ABNF.OPCODE_BINARY: [1, 10]}
+    assert stats.opcodes_in == {ABNF.OPCODE_TEXT: [1, 3]}
+    assert stats.close_codes == {1006: 1, 1000: 1}
+    # Merging copies the counters
+    other.on_send(1)
+    assert stats.opcodes_out[ABNF.OPCODE_TEXT] == [2, 7]
+
+
+def _families():
+    latency = LatencyHistogram()
+    latency.record(0.5)
+    latency.record(1.5)
+    return [
+        ("ws_messages_total", "counter", "Messages.", [({"direction": "in"}, 3)]),
+        ("ws_rtt_seconds", "summary", "Round trips.", [({}, latency)]),
+        ("ws_empty_seconds", "summary", "Nothing.", [({"phase": "tls"}, LatencyHistogram())]),
+    ]
+
+
+def test_format_prometheus():
+    lines = format_prometheus(_families()).splitlines()
+
+    assert lines[:3] == [
+        "# HELP ws_messages_total Messages.",
+        "# TYPE ws_messages_total counter",
+        'ws_messages_total{direction="in"} 3',
+    ]
+    assert lines[5].startswith('ws_rtt_seconds{quantile="0.5"} 0.')
+    assert "ws_rtt_seconds_sum 2.0" in lines
+    assert "ws_rtt_seconds_count 2" in lines
+    assert 'ws_empty_seconds{phase="tls",quantile="0.99"} NaN' in lines
+    assert 'ws_empty_seconds_count{phase="tls"} 0' in lines
+
+
+def test_format_prometheus_escapes_labels():
+    families = [("ws_total", "counter", "Messages.", [({"url": 'a\\b"c\nd'}, 1)])]
+
+    assert format_prometheus(families).splitlines()[2] == 'ws_total{url="a\\\\b\\"c\\nd"} 1'
+
+
+def test_format_metrics_json():
+    doc = json.loads(format_metrics_json(_families()))
+
+    assert doc["ws_messages_total"] == {
+        "type": "counter",
+        "help": "Messages.",
+        "values": [{"labels": {"direction": "in"}, "value": 3}],
+    }
+    rtt = doc["ws_rtt_seconds"]["values"][0]
+    assert rtt["count"] == 2
+    assert rtt["sum"] == 2.0
+    assert 1.4 < rtt["max"] < 1.6
+    assert doc["ws_empty_seconds"]["values"][0]["quantiles"]["0.5"] is None
+
+
+async def _echo(reader, writer):
+    """Echo text and binary messages and the close frame."""
+    await handshake(reader, writer)
+    while True:
+        frame = await read_frame(reader)
+        writer.write(server_frame(frame.opcode, frame.data))
+        await writer.drain()
+        if frame.opcode == ABNF.OPCODE_CLOSE:
+            break
+
+
+@pytest.fixture
+def echo_server(ws_server):
+    return ws_server(_echo)
+
+
+def _adapter(monkeypatch, **options):
+    monkeypatch.setenv("HTTPIE_WS_DRAIN", "0.2")
+    for name, value in options.items():
+        monkeypatch.setenv(f"HTTPIE_WS_{name.upper()}", value)
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    adapter._stdout = io.StringIO()
+    return adapter
+
+
+def _send(adapter, port, data="one\ntwo"):
+    request = Request(url=f"ws://127.0.0.1:{port}/", data=data).prepare()
+    return adapter.send(request, timeout=2).raw.read().decode()
+
+
+@pytest.mark.parametrize("engine", ["thread", "asyncio"])
+def test_metrics_file(monkeypatch, tmp_path, echo_server, engine):
+    path = tmp_path / "ws.prom"
+    adapter = _adapter(monkeypatch, engine=engine, metrics=str(path))
+
+    _send(adapter, echo_server)
+
+    text = path.read_text()
+    assert 'httpie_ws_messages_total{direction="out",opcode="text"} 2' in text
+    assert 'httpie_ws_messages_total{direction="in",opcode="text"} 2' in text
+    assert 'httpie_ws_bytes_total{direction="out",opcode="text"} 6' in text
+    assert 'httpie_ws_close_codes_total{code="1000"} 1' in text
+    assert 'httpie_ws_connect_seconds_count{phase="connect"} 1' in text
+    assert "httpie_ws_round_trip_seconds_count 2" in text
+    assert "httpie_ws_connections 0" in text
+    assert not (tmp_path / "ws.prom.tmp").exists()
+    if engine == "asyncio":
+        assert 'httpie_ws_connect_seconds_count{phase="tcp"} 1' in text
+        assert 'httpie_ws_connect_seconds_count{phase="upgrade"} 1' in text
+
+
+def test_metrics_json_file(monkeypatch, tmp_path, echo_server):
+    path = tmp_path / "ws.json"
+    adapter = _adapter(monkeypatch, metrics=str(path), opcode="binary")
+
+    _send(adapter, echo_server, data="abc")
+
+    doc = json.loads(path.read_text())
+    assert doc["httpie_ws_bytes_total"]["values"] == [
+        {"labels": {"direction": "in", "opcode": "binary"}, "value": 3},
+        {"labels": {"direction": "out", "opcode": "binary"}, "value": 3},
+    ]
+    assert doc["httpie_ws_close_codes_total"]["values"] == [{"labels": {"code": "1000"}, "value": 1}]
+
+
+def test_metrics_load_mode(monkeypatch, tmp_path, echo_server):
+    path = tmp_path / "ws.prom"
+    adapter = _adapter(monkeypatch, metrics=str(path), connections="3", count="1")
+
+    _send(adapter, echo_server, data="one")
+
+    text = path.read_text()
+    assert 'httpie_ws_close_codes_total{code="1000"} 3' in text
+    assert 'httpie_ws_connect_seconds_count{phase="connect"} 3' in text
+    assert 'httpie_ws_messages_total{direction="out",opcode="text"} 3' in text
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_metrics_endpoint(monkeypatch):
+    port = _free_port()
+    adapter = _adapter(monkeypatch, metrics_port=str(port))
+    adapter._stats.on_send(5)
+
+    adapter._start_metrics()
+    base = f"http://127.0.0.1:{port}"
+    with urllib.request.urlopen(f"{base}/metrics", timeout=2) as response:
+        assert response.headers["Content-Type"] == "text/plain; version=0.0.4"
+        assert 'httpie_ws_messages_total{direction="out",opcode="text"} 1' in response.read().decode()
+    with urllib.request.urlopen(f"{base}/metrics.json", timeout=2) as response:
+        assert json.load(response)["httpie_ws_bytes_total"]["values"][0]["value"] == 5
+    with pytest.raises(urllib.error.HTTPError) as e:
+        urllib.request.urlopen(f"{base}/other", timeout=2)
+    assert e.value.code == 404
+    adapter._finish_metrics()
+
+    assert adapter._metrics_server is None
+    with pytest.raises(OSError):
+        urllib.request.urlopen(f"{base}/metrics", timeout=2)
+
+
+def test_metrics_port_in_use(monkeypatch, caplog):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        s.listen()
+        adapter = _adapter(monkeypatch, metrics_port=str(s.getsockname()[1]))
+        adapter._start_metrics()
+
+    assert adapter._metrics_server is None
+    assert "Cannot serve metrics" in caplog.text
+
+
+def test_no_metrics_by_default():
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    assert adapter._metrics_path is None
+    assert adapter._metrics_port == 0
+    adapter._start_metrics()
+    assert adapter._metrics_server is None
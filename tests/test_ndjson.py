@@ -0,0 +1,103 @@
+import base64
+import io
+import json
+import struct
+
+import pytest
+from requests.models import Request
+from websocket import ABNF
+
+from httpie_websockets import WebsocketAdapter, format_event, format_message_event
+from tests.conftest import handshake, read_frame, server_frame
+
+
+def test_format_text_message():
+    event = json.loads(format_message_event("in", ABNF.OPCODE_TEXT, 'say "héllo"\n', 13))
+    assert event["type"] == "message"
+    assert event["dir"] == "in"
+    assert event["opcode"] == "text"
+    assert event["size"] == 13
+    assert event["fin"] is True
+    assert event["text"] == 'say "héllo"\n'
+    assert isinstance(event["mono"], float)
+    assert isinstance(event["wall"], float)
+    assert "endpoint" not in event
+
+
+def test_format_binary_message():
+    line = format_message_event("out", ABNF.OPCODE_BINARY, b"\x00\xff", 2, endpoint="host/path")
+    event = json.loads(line)
+    assert event["opcode"] == "binary"
+    assert base64.b64decode(event["base64"]) == b"\x00\xff"
+    assert event["endpoint"] == "host/path"
+    assert "text" not in event
+
+
+def test_format_event():
+    event = json.loads(format_event("close", dir="in", code=1000, reason=""))
+    assert event["type"] == "close"
+    assert event["code"] == 1000
+
+
+async def _echo(reader, writer):
+    """Echo the first data message, then close."""
+    await handshake(reader, writer)
+    frame = await read_frame(reader)
+    writer.write(server_frame(frame.opcode, frame.data))
+    writer.write(server_frame(ABNF.OPCODE_CLOSE, struct.pack("!H", 1000) + b"bye"))
+    await writer.drain()
+    await read_frame(reader)
+
+
+@pytest.fixture
+def echo_server(ws_server):
+    return ws_server(_echo)
+
+
+@pytest.mark.parametrize(
+    "opcode, data, payload",
+    [("text", "héllo".encode(), ("text", "héllo")), ("binary", b"\x00\x01", ("base64", "AAE="))],
+)
+@pytest.mark.parametrize("stream", ["0", "1"])
+@pytest.mark.parametrize("engine", ["thread", "asyncio"])
+def test_ndjson_session(monkeypatch, echo_server, engine, stream, opcode, data, payload):
+    monkeypatch.setenv("HTTPIE_WS_OUTPUT", "ndjson")
+    monkeypatch.setenv("HTTPIE_WS_ENGINE", engine)
+    monkeypatch.setenv("HTTPIE_WS_STREAM", stream)
+    monkeypatch.setenv("HTTPIE_WS_OPCODE", opcode)
+    monkeypatch.setenv("HTTPIE_WS_DRAIN", "-1")
+    monkeypatch.setenv("HTTPIE_WS_FLUSH", "line")
+    adapter = WebsocketAdapter()
+    adapter._stdout = io.StringIO()
+    request = Request(url=f"ws://127.0.0.1:{echo_server}/", data=data).prepare()
+
+    adapter.send(request, timeout=2)
+
+    events = [json.loads(line) for line in adapter._stdout.getvalue().splitlines()]
+    sent, received, closed = events
+    key, value = payload
+    assert (sent["type"], sent["dir"], sent["opcode"], sent[key]) == ("message", "out", opcode, value)
+    assert (received["type"], received["dir"], received["opcode"], received[key]) == (
+        "message",
+        "in",
+        opcode,
+        value,
+    )
+    assert sent["size"] == received["size"] == len(data)
+    assert received["fin"] is True
+    assert received["mono"] >= sent["mono"]
+    assert (closed["type"], closed["code"], closed["reason"]) == ("close", 1000, "bye")
+
+
+def test_status_event(monkeypatch):
+    monkeypatch.setenv("HTTPIE_WS_OUTPUT", "ndjson")
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    adapter._stdout = io.StringIO()
+    adapter._flush_mode = "line"
+    adapter._running = True
+
+    adapter._write_status("\033[93mWarning: --cert is ignored\033[0m")
+
+    event = json.loads(adapter._stdout.getvalue())
+    assert (event["type"], event["text"]) == ("status", "Warning: --cert is ignored")
@@ -0,0 +1,92 @@
+import io
+from unittest import mock
+
+from requests.models import Request
+from websocket import STATUS_NORMAL
+
+from httpie_websockets import WebsocketAdapter, split_messages
+
+
+def test_split_messages_newline():
+    stream = io.BytesIO(b"first\nsecond\n\nthird")
+    assert list(split_messages(stream, b"\n")) == [b"first", b"second", b"third"]
+
+
+def test_split_messages_across_chunks():
+    stream = io.BytesIO(b"abc\0defgh\0ij")
+    assert list(split_messages(stream, b"\0", chunk_size=2)) == [b"abc", b"defgh", b"ij"]
+
+
+def test_pipe_source_interactive_mode():
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    adapter._mode = "interactive"
+    request = Request(url="ws://localhost:8080", data="hello").prepare()
+    assert adapter._pipe_source(request) is None
+
+
+def test_pipe_source_request_body():
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    request = Request(url="ws://localhost:8080", data="hello\nworld").prepare()
+    source = adapter._pipe_source(request)
+    assert source.read() == b"hello\nworld"
+
+
+def test_pipe_source_input_file(tmp_path, monkeypatch):
+    path = tmp_path / "messages.txt"
+    path.write_bytes(b"one\ntwo\n")
+    monkeypatch.setenv("HTTPIE_WS_INPUT", str(path))
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    request = Request(url="ws://localhost:8080").prepare()
+    with adapter._pipe_source(request) as source:
+        assert source.read() == b"one\ntwo\n"
+
+
+def test_pipe_loop_sends_all_messages(monkeypatch):
+    monkeypatch.setenv("HTTPIE_WS_DRAIN", "0")
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    adapter._running = True
+    adapter._ws = mock.Mock(connected=True)
+    adapter._pipe_loop(io.BytesIO(b"a\nb\nc\n"))
+
+    assert adapter._ws.send.call_count == 3
+    adapter._ws.close.assert_called_once_with(status=STATUS_NORMAL, reason=b"")
+
+
+def test_split_messages_large_message_across_chunks():
+    payload = b"x" * 100_000
+    stream = io.BytesIO(payload + b"\n" + payload)
+    assert list(split_messages(stream, b"\n", chunk_size=4096)) == [payload, payload]
+
+
+def test_unknown_delimiter_falls_back_with_warning(monkeypatch, caplog):
+    monkeypatch.setenv("HTTPIE_WS_DELIMITER", "crlf")
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    assert adapter._delimiter == b"\n"
+    assert "HTTPIE_WS_DELIMITER" in caplog.text
+
+
+def test_options_read_on_first_send(monkeypatch, caplog):
+    monkeypatch.setenv("HTTPIE_WS_DELIMITER", "crlf")
+    adapter = WebsocketAdapter()
+    # requests.Session.close() also closes adapters that never sent
+    adapter.close()
+    assert "HTTPIE_WS_DELIMITER" not in caplog.text
+    adapter._configure()
+    assert "HTTPIE_WS_DELIMITER" in caplog.text
+
+
+def test_send_missing_input_file(monkeypatch):
+    monkeypatch.setenv("HTTPIE_WS_INPUT", "/nonexistent/messages.txt")
+    adapter = WebsocketAdapter()
+    request = Request(url="ws://localhost:8080").prepare()
+    with mock.patch.object(adapter, "_connect") as mock_connect:
+        response = adapter.send(request)
+
+    mock_connect.assert_not_called()
+    assert response.status_code == 500
+    assert response.reason.startswith("Cannot open input:")
@@ -0,0 +1,139 @@
+import time
+
+import pytest
+import requests
+from websocket import ABNF
+
+from httpie_websockets import WebsocketAdapter
+from tests.conftest import close_code, handshake, read_frame, server_frame
+
+
+class Server:
+    """Reply to `close` with a close frame, to `silent` with nothing, to `ping first`
+    with a ping and the echo, to `bye` with the echo and a close, and echo the rest."""
+
+    def __init__(self):
+        self.handshakes = 0
+        self.closes = []
+
+    async def handle(self, reader, writer):
+        await handshake(reader, writer)
+        self.handshakes += 1
+        while True:
+            frame = await read_frame(reader)
+            if frame.opcode == ABNF.OPCODE_CLOSE:
+                self.closes.append(close_code(frame.data))
+                writer.write(server_frame(ABNF.OPCODE_CLOSE, frame.data))
+                break
+            if frame.opcode != ABNF.OPCODE_TEXT or frame.data == b"silent":
+                continue
+            writer.write(server_frame(ABNF.OPCODE_TEXT, frame.data))
+            if frame.data == b"bye":
+                await writer.drain()
+                break
+            if frame.data == b"ping after":
+                writer.write(server_frame(ABNF.OPCODE_PING, b"hi"))
+            await writer.drain()
+
+
+@pytest.fixture
+def server(ws_server):
+    handler = Server()
+    handler.url = f"ws://127.0.0.1:{ws_server(handler.handle)}/"
+    return handler
+
+
+@pytest.fixture
+def session():
+    session = requests.Session()
+    adapter = WebsocketAdapter(pool_size=2, pool_idle=60)
+    session.mount("ws://", adapter)
+    yield session, adapter
+    session.close()
+
+
+def test_reuses_connection(server, session):
+    session, adapter = session
+
+    replies = [session.request("WEBSOCKET", server.url, data=f"m{i}", timeout=2) for i in range(3)]
+
+    assert [r.status_code for r in replies] == [200, 200, 200]
+    assert [r.text for r in replies] == ["m0", "m1", "m2"]
+    assert server.handshakes == 1
+    assert (adapter._pool.hits, adapter._pool.misses) == (2, 1)
+
+
+def test_pings_while_idle(server, session):
+    session, _ = session
+
+    assert session.request("WEBSOCKET", server.url, data="ping after", timeout=2).text == "ping after"
+    time.sleep(0.1)
+    assert session.request("WEBSOCKET", server.url, data="again", timeout=2).text == "again"
+    assert server.handshakes == 1
+
+
+def test_closed_connection_replaced(server, session):
+    session, adapter = session
+
+    assert session.request("WEBSOCKET", server.url, data="bye", timeout=2).text == "bye"
+    time.sleep(0.1)
+    assert session.request("WEBSOCKET", server.url, data="next", timeout=2).text == "next"
+    assert server.handshakes == 2
+    assert adapter._pool.evicted == 1
+
+
+def test_idle_eviction(server):
+    session = requests.Session()
+    adapter = WebsocketAdapter(pool_size=2, pool_idle=0.05)
+    session.mount("ws://", adapter)
+
+    session.request("WEBSOCKET", server.url, data="one", timeout=2)
+    time.sleep(0.1)
+    session.request("WEBSOCKET", server.url, data="two", timeout=2)
+
+    assert server.handshakes == 2
+    assert adapter._pool.evicted == 1
+    session.close()
+
+
+def test_timeout_discards(server, session):
+    session, adapter = session
+
+    response = session.request("WEBSOCKET", server.url, data="silent", timeout=0.2)
+
+    assert response.status_code == 504
+    assert len(adapter._pool) == 0
+
+
+def test_keyed_by_headers(server, session):
+    session, _ = session
+
+    session.request("WEBSOCKET", server.url, data="a", headers={"X-Token": "1"}, timeout=2)
+    session.request("WEBSOCKET", server.url, data="b", headers={"X-Token": "2"}, timeout=2)
+    session.request("WEBSOCKET", server.url, data="c", headers={"X-Token": "1"}, timeout=2)
+
+    assert server.handshakes == 2
+
+
+def test_session_close_closes_pool(server):
+    session = requests.Session()
+    adapter = WebsocketAdapter(pool_size=2)
+    session.mount("ws://", adapter)
+    session.request("WEBSOCKET", server.url, data="x", timeout=2)
+
+    session.close()
+    time.sleep(0.1)
+
+    assert server.closes == [1000]
+    assert len(adapter._pool) == 0
+
+
+def test_connect_failure(session):
+    session, _ = session
+    assert session.request("WEBSOCKET", "ws://127.0.0.1:1/", data="x", timeout=1).status_code == 500
+
+
+def test_disabled_by_default():
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    assert adapter._pool is None
@@ -14,6 +14,7 @@ def test_receive_message():
     with patch.object(WebsocketAdapter, 'connected', new_callable=PropertyMock) as mock_connected:
         mock_connected.side_effect = [True, False]
         adapter = WebsocketAdapter()
+        adapter._configure()
         adapter._running = True
         adapter._ws = MagicMock()
         adapter._ws.recv_data.side_effect = [(ABNF.OPCODE_TEXT, "Test message")]
@@ -30,6 +31,7 @@ def test_receive_close_message():
     with patch.object(WebsocketAdapter, 'connected', new_callable=PropertyMock) as mock_connected:
         mock_connected.side_effect = [True, False]
         adapter = WebsocketAdapter()
+        adapter._configure()
         adapter._running = True
         adapter._ws = MagicMock()
         adapter._ws.recv_data.side_effect = [(ABNF.OPCODE_CLOSE, msg)]
@@ -44,6 +46,7 @@ def test_receive_timeout():
     with patch.object(WebsocketAdapter, 'connected', new_callable=PropertyMock) as mock_connected:
         mock_connected.side_effect = [True, False]
         adapter = WebsocketAdapter()
+        adapter._configure()
         adapter._running = True
         adapter._ws = MagicMock()
         adapter._ws.recv_data.side_effect = WebSocketTimeoutException()
@@ -55,6 +58,7 @@ def test_receive_connection_closed():
     with patch.object(WebsocketAdapter, 'connected', new_callable=PropertyMock) as mock_connected:
         mock_connected.side_effect = [True, False]
         adapter = WebsocketAdapter()
+        adapter._configure()
         adapter._running = True
         adapter._ws = MagicMock()
         adapter._ws.recv_data.side_effect = WebSocketConnectionClosedException("Connection closed")
@@ -62,3 +66,11 @@ def test_receive_connection_closed():
         adapter._receive()
 
     adapter._write_stdout.assert_called_with("Connection closed: Connection closed")
+
+
+def test_receive_sets_ready_event():
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    assert not adapter._receiver_ready.is_set()
+    adapter._receive()
+    assert adapter._receiver_ready.is_set()
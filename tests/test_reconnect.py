@@ -0,0 +1,139 @@
+import threading
+from unittest import mock
+
+import pytest
+from requests.models import Request
+from websocket import WebSocketConnectionClosedException
+
+from httpie_websockets import AdapterError, WebsocketAdapter
+from tests.conftest import FakeWebSocket
+
+
+@pytest.fixture
+def fake_connect(monkeypatch):
+    """Connect to the prepared sockets in order, fail once they run out."""
+    monkeypatch.setenv("HTTPIE_WS_DRAIN", "0")
+    monkeypatch.setenv("HTTPIE_WS_RECONNECT_DELAY", "0")
+    sockets = []
+    connected = []
+    original = WebsocketAdapter._connect
+
+    def connect(self, request, **kwargs):
+        with mock.patch("httpie_websockets.websocket.WebSocket") as ws_class:
+            if not sockets:
+                ws_class.return_value.connected = False
+                ws_class.return_value.connect.side_effect = OSError("Connection refused")
+            else:
+                ws_class.return_value = sockets.pop(0)
+                ws_class.return_value.connect = mock.Mock()
+                connected.append(ws_class.return_value)
+            original(self, request, **kwargs)
+
+    with mock.patch.object(WebsocketAdapter, "_connect", connect):
+        yield sockets, connected
+
+
+def test_reconnect_sends_buffered_messages(monkeypatch, fake_connect):
+    sockets, connected = fake_connect
+    sockets += [FakeWebSocket(accept=1), FakeWebSocket()]
+    monkeypatch.setenv("HTTPIE_WS_RECONNECT", "3")
+    request = Request(url="ws://localhost:8080", data="one\ntwo\nthree").prepare()
+
+    response = WebsocketAdapter().send(request)
+
+    assert response.status_code == 200
+    assert connected[0].sent == [b"one"]
+    assert connected[1].sent == [b"two", b"three"]
+    body = response.raw.read().decode()
+    assert "Reconnects: 1" in body
+    assert "Downtime: " in body
+
+
+def test_subscribe_after_every_connect(tmp_path, monkeypatch, fake_connect):
+    sockets, connected = fake_connect
+    sockets += [FakeWebSocket(accept=2), FakeWebSocket()]
+    subscribe = tmp_path / "subscribe.json"
+    subscribe.write_text('{"subscribe": "ticker"}\n')
+    monkeypatch.setenv("HTTPIE_WS_RECONNECT", "3")
+    monkeypatch.setenv("HTTPIE_WS_SUBSCRIBE", f"@{subscribe}")
+    request = Request(url="ws://localhost:8080", data="one\ntwo").prepare()
+
+    WebsocketAdapter().send(request)
+
+    assert connected[0].sent == [b'{"subscribe": "ticker"}', b"one"]
+    assert connected[1].sent == [b'{"subscribe": "ticker"}', b"two"]
+
+
+def test_gives_up_after_attempts(monkeypatch, fake_connect, caplog):
+    sockets, connected = fake_connect
+    sockets.append(FakeWebSocket(accept=0))
+    monkeypatch.setenv("HTTPIE_WS_RECONNECT", "2")
+    request = Request(url="ws://localhost:8080", data="one").prepare()
+
+    response = WebsocketAdapter().send(request)
+
+    assert response.status_code == 200
+    assert "Giving up after 2 reconnect attempts" in caplog.text
+    assert "1 messages not sent" in caplog.text
+    assert "Reconnects: 0" in response.raw.read().decode()
+
+
+def test_no_reconnect_after_normal_close(monkeypatch, fake_connect):
+    sockets, connected = fake_connect
+    sockets += [FakeWebSocket(close_code=1000), FakeWebSocket()]
+    monkeypatch.setenv("HTTPIE_WS_RECONNECT", "3")
+    monkeypatch.setenv("HTTPIE_WS_DRAIN", "-1")
+    request = Request(url="ws://localhost:8080", data="one").prepare()
+
+    WebsocketAdapter().send(request)
+
+    assert len(connected) == 1
+
+
+def test_reconnect_after_going_away(monkeypatch, fake_connect):
+    sockets, connected = fake_connect
+    sockets += [FakeWebSocket(close_code=1001), FakeWebSocket()]
+    monkeypatch.setenv("HTTPIE_WS_RECONNECT", "3")
+    monkeypatch.setenv("HTTPIE_WS_SUBSCRIBE", "hello")
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    adapter._ws_thread = threading.Thread(target=adapter._receive)
+    adapter._connect(Request(url="ws://localhost:8080").prepare())
+    adapter._running = True
+
+    adapter._ws_thread.start()
+    adapter._ws_thread.join(0.5)
+
+    assert len(connected) == 2
+    assert connected[1].sent == [b"hello"]
+    assert adapter._close_code is None
+    adapter.close()
+    adapter._ws_thread.join(1)
+    assert not adapter._ws_thread.is_alive()
+
+
+def test_disabled_by_default(fake_connect):
+    sockets, connected = fake_connect
+    sockets += [FakeWebSocket(accept=1), FakeWebSocket()]
+    request = Request(url="ws://localhost:8080", data="one\ntwo").prepare()
+
+    with pytest.raises(WebSocketConnectionClosedException):
+        WebsocketAdapter().send(request)
+
+    assert len(connected) == 1
+
+
+def test_backoff_is_capped(monkeypatch):
+    monkeypatch.setenv("HTTPIE_WS_RECONNECT", "5")
+    monkeypatch.setenv("HTTPIE_WS_RECONNECT_DELAY", "1")
+    monkeypatch.setenv("HTTPIE_WS_RECONNECT_MAX_DELAY", "3")
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    adapter._request = Request(url="ws://localhost:8080").prepare()
+    adapter._running = True
+    waits = []
+    with mock.patch.object(adapter._closing, "wait", side_effect=waits.append), mock.patch(
+        "httpie_websockets.random.uniform", side_effect=lambda low, high: high
+    ), mock.patch.object(adapter, "_connect", side_effect=AdapterError(500, "refused")):
+        assert adapter._reconnect_with_backoff() is False
+    assert waits == [1, 2, 3, 3, 3]
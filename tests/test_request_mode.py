@@ -0,0 +1,110 @@
+import json
+
+import pytest
+import requests
+from requests.models import Request
+from websocket import ABNF
+
+from httpie_websockets import WebsocketAdapter
+from tests.conftest import handshake, read_frame, server_frame
+
+
+def _text(payload):
+    return server_frame(ABNF.OPCODE_TEXT, payload)
+
+
+async def _handler(reader, writer):
+    """For {"id": X, "n": N} send an unrelated event, then N replies with id X.
+    Echo anything else, and close after echoing `bye`."""
+    await handshake(reader, writer)
+    while True:
+        frame = await read_frame(reader)
+        if frame.opcode == ABNF.OPCODE_CLOSE:
+            writer.write(server_frame(ABNF.OPCODE_CLOSE, frame.data))
+            break
+        try:
+            message = json.loads(frame.data)
+        except ValueError:
+            writer.write(_text(frame.data))
+            if frame.data == b"bye":
+                writer.write(server_frame(ABNF.OPCODE_CLOSE, b"\x03\xe8"))
+            await writer.drain()
+            continue
+        writer.write(_text(json.dumps({"event": "tick"}).encode()))
+        for i in range(message["n"]):
+            writer.write(_text(json.dumps({"id": message["id"], "part": i}).encode()))
+        await writer.drain()
+
+
+@pytest.fixture
+def url(ws_server):
+    return f"ws://127.0.0.1:{ws_server(_handler)}/"
+
+
+def _send(monkeypatch, url, data, **options):
+    monkeypatch.setenv("HTTPIE_WS_MODE", "request")
+    for name, value in options.items():
+        monkeypatch.setenv(f"HTTPIE_WS_{name.upper()}", value)
+    return WebsocketAdapter().send(Request(url=url, data=data).prepare(), timeout=2)
+
+
+def test_single_reply(monkeypatch, url):
+    response = _send(monkeypatch, url, "hello")
+
+    assert response.status_code == 200
+    assert response.content == b"hello"
+    assert response.raw.read() == b"hello"
+    assert response.headers["Content-Type"] == "text/plain; charset=utf-8"
+
+
+def test_correlated_replies(monkeypatch, url):
+    response = _send(monkeypatch, url, '{"id": 7, "n": 2}', replies="2", correlate="id")
+
+    assert response.status_code == 200
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        {"id": 7, "part": 0},
+        {"id": 7, "part": 1},
+    ]
+    assert response.headers["Content-Type"] == "application/x-ndjson"
+
+
+def test_uncorrelated_takes_first(monkeypatch, url):
+    response = _send(monkeypatch, url, '{"id": 7, "n": 1}')
+
+    assert json.loads(response.content) == {"event": "tick"}
+    assert response.headers["Content-Type"] == "application/json"
+
+
+def test_timeout_returns_partial(monkeypatch, url):
+    response = _send(
+        monkeypatch, url, '{"id": 1, "n": 1}', replies="3", correlate="id", reply_timeout="0.2"
+    )
+
+    assert response.status_code == 504
+    assert response.reason == "1 of 3 replies within 0.2s"
+    assert json.loads(response.content) == {"id": 1, "part": 0}
+
+
+def test_closed_before_count(monkeypatch, url):
+    response = _send(monkeypatch, url, "bye", replies="2")
+
+    assert response.status_code == 502
+    assert response.content == b"bye"
+
+
+def test_needs_body(monkeypatch, url):
+    assert _send(monkeypatch, url, None).status_code == 400
+
+
+def test_pool_uses_reply_options(monkeypatch, url):
+    monkeypatch.setenv("HTTPIE_WS_REPLIES", "2")
+    monkeypatch.setenv("HTTPIE_WS_CORRELATE", ".id")
+    session = requests.Session()
+    session.mount("ws://", WebsocketAdapter(pool_size=1))
+
+    for request_id in (1, 2):
+        response = session.request(
+            "WEBSOCKET", url, data=json.dumps({"id": request_id, "n": 2}), timeout=2
+        )
+        assert [json.loads(line)["id"] for line in response.text.splitlines()] == [request_id] * 2
+    session.close()
@@ -0,0 +1,145 @@
+import io
+import os
+import zlib
+
+import pytest
+from requests.models import Request
+from websocket import ABNF
+
+from httpie_websockets import PerMessageDeflate, WebsocketAdapter, iter_fragments
+from tests.conftest import handshake, read_frame, server_frame
+
+
+def test_iter_fragments():
+    assert list(iter_fragments(b"abcd", ABNF.OPCODE_BINARY, 2)) == [
+        (ABNF.OPCODE_BINARY, b"ab", 0),
+        (ABNF.OPCODE_CONT, b"cd", 1),
+    ]
+
+
+def test_iter_fragments_single_and_empty():
+    assert list(iter_fragments(b"abc", ABNF.OPCODE_TEXT, 10)) == [(ABNF.OPCODE_TEXT, b"abc", 1)]
+    assert list(iter_fragments(b"", ABNF.OPCODE_TEXT, 10)) == [(ABNF.OPCODE_TEXT, b"", 1)]
+
+
+@pytest.mark.parametrize("no_context_takeover", [False, True])
+def test_compress_fragments(no_context_takeover):
+    client, server = PerMessageDeflate(), PerMessageDeflate()
+    offer = "permessage-deflate"
+    if no_context_takeover:
+        offer += "; client_no_context_takeover"
+    client.accept(offer)
+    server.accept("permessage-deflate")
+    payload = b"0123456789abcdef" * 1000
+
+    for _ in range(2):
+        wire = b"".join(
+            client.compress(fragment, bool(fin))
+            for _, fragment, fin in iter_fragments(payload, ABNF.OPCODE_BINARY, 4096)
+        )
+        assert server.decompress(wire) == payload
+
+
+def _handler(frames, messages, deflate):
+    """Keep the frames and reassembled messages, reply with the message size."""
+
+    async def handle(reader, writer):
+        extensions = ["Sec-WebSocket-Extensions: permessage-deflate"] if deflate else []
+        await handshake(reader, writer, *extensions)
+        inflater = zlib.decompressobj(-15)
+        parts = []
+        while True:
+            frame = await read_frame(reader)
+            if frame.opcode == ABNF.OPCODE_CLOSE:
+                writer.write(server_frame(ABNF.OPCODE_CLOSE, frame.data))
+                break
+            frames.append((frame.opcode, frame.fin, frame.rsv1, len(frame.data)))
+            parts.append(frame.data)
+            if frame.fin:
+                message = b"".join(parts)
+                if deflate:
+                    message = inflater.decompress(message + PerMessageDeflate.TAIL)
+                messages.append(message)
+                parts = []
+                writer.write(server_frame(ABNF.OPCODE_TEXT, str(len(message)).encode()))
+            await writer.drain()
+
+    return handle
+
+
+@pytest.fixture
+def frame_server(request, ws_server):
+    frames, messages = [], []
+    return ws_server(_handler(frames, messages, request.param)), frames, messages
+
+
+def _send_file(monkeypatch, port, path, engine):
+    monkeypatch.setenv("HTTPIE_WS_ENGINE", engine)
+    monkeypatch.setenv("HTTPIE_WS_SEND_FILE", str(path))
+    monkeypatch.setenv("HTTPIE_WS_FRAGMENT_SIZE", "65536")
+    monkeypatch.setenv("HTTPIE_WS_OPCODE", "binary")
+    monkeypatch.setenv("HTTPIE_WS_DRAIN", "0.2")
+    adapter = WebsocketAdapter()
+    adapter._stdout = io.StringIO()
+    request = Request(url=f"ws://127.0.0.1:{port}/").prepare()
+    response = adapter.send(request, timeout=2)
+    return adapter, response.raw.read().decode()
+
+
+@pytest.mark.parametrize("frame_server", [False], indirect=True)
+@pytest.mark.parametrize("engine", ["thread", "asyncio"])
+def test_send_file_fragmented(tmp_path, monkeypatch, frame_server, engine):
+    port, frames, messages = frame_server
+    path = tmp_path / "payload.bin"
+    payload = os.urandom(300_000)
+    path.write_bytes(payload)
+
+    adapter, body = _send_file(monkeypatch, port, path, engine)
+
+    assert messages == [payload]
+    assert frames == [
+        (ABNF.OPCODE_BINARY, 0, 0, 65536),
+        (ABNF.OPCODE_CONT, 0, 0, 65536),
+        (ABNF.OPCODE_CONT, 0, 0, 65536),
+        (ABNF.OPCODE_CONT, 0, 0, 65536),
+        (ABNF.OPCODE_CONT, 1, 0, 300_000 - 4 * 65536),
+    ]
+    assert adapter._stdout.getvalue() == "300000\n"
+    assert "Sent: 300000 bytes in 5 frames" in body
+    assert "Throughput: " in body
+
+
+@pytest.mark.parametrize("frame_server", [True], indirect=True)
+@pytest.mark.parametrize("engine", ["thread", "asyncio"])
+def test_send_file_compressed(tmp_path, monkeypatch, frame_server, engine):
+    port, frames, messages = frame_server
+    path = tmp_path / "payload.json"
+    payload = b'{"key": "value", "list": [1, 2, 3]}\n' * 10_000
+    path.write_bytes(payload)
+    monkeypatch.setenv("HTTPIE_WS_COMPRESS", "1")
+
+    adapter, body = _send_file(monkeypatch, port, path, engine)
+
+    assert messages == [payload]
+    # Only the first frame is marked as compressed
+    assert [rsv1 for _, _, rsv1, _ in frames] == [1] + [0] * (len(frames) - 1)
+    assert sum(size for *_, size in frames) < len(payload) / 10
+
+
+@pytest.mark.parametrize("frame_server", [False], indirect=True)
+def test_send_empty_file(tmp_path, monkeypatch, frame_server):
+    port, frames, messages = frame_server
+    path = tmp_path / "empty"
+    path.write_bytes(b"")
+
+    _, body = _send_file(monkeypatch, port, path, "thread")
+
+    assert messages == [b""]
+    assert "Sent: 0 bytes in 1 frames" in body
+
+
+def test_send_file_missing(tmp_path, monkeypatch):
+    monkeypatch.setenv("HTTPIE_WS_SEND_FILE", str(tmp_path / "missing"))
+    response = WebsocketAdapter().send(Request(url="ws://localhost:8080").prepare())
+    assert response.status_code == 500
+    assert "Cannot open input" in response.reason
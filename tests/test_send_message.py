@@ -9,6 +9,7 @@ from httpie_websockets import WebsocketAdapter
 def test_send_msg_success():
     # Create an instance of WebsocketAdapter
     adapter = WebsocketAdapter()
+    adapter._configure()
 
     # Mock the websocket object
     adapter._ws = mock.Mock()
@@ -42,6 +43,7 @@ def test_send_msg_no_websocket():
 def test_send_msg_websocket_exception():
     # Create an instance of WebsocketAdapter
     adapter = WebsocketAdapter()
+    adapter._configure()
 
     # Mock the websocket object
     adapter._ws = mock.Mock()
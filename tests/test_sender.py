@@ -0,0 +1,147 @@
+import io
+import threading
+import time
+
+import pytest
+from requests.models import Request
+from websocket import ABNF
+
+from httpie_websockets import SendScheduler, TokenBucket, WebsocketAdapter
+from tests.conftest import FakeWebSocket
+
+
+def test_token_bucket():
+    bucket = TokenBucket(10, 2, now=0.0)
+    assert bucket.delay(1, 0.0) == 0
+    bucket.take(1)
+    bucket.take(1)
+    assert bucket.delay(1, 0.0) == pytest.approx(0.1)
+    assert bucket.delay(1, 0.05) == pytest.approx(0.05)
+    # Never holds more than its capacity
+    assert bucket.delay(1, 10.0) == 0
+    assert bucket.tokens == 2
+
+
+def test_token_bucket_larger_than_capacity():
+    bucket = TokenBucket(100, 10, now=0.0)
+    # Waits for a full bucket, then goes into debt
+    assert bucket.delay(50, 0.0) == 0
+    bucket.take(50)
+    assert bucket.delay(1, 0.0) == pytest.approx(0.41)
+
+
+def test_acquire_paces():
+    sender = SendScheduler(rate=100, byte_rate=0, burst=1, coalesce=False, queue_size=8)
+    stop = threading.Event()
+    started = time.monotonic()
+    for _ in range(11):
+        assert sender.acquire(10, stop)
+    assert time.monotonic() - started == pytest.approx(0.1, abs=0.05)
+
+
+def test_acquire_stops():
+    sender = SendScheduler(rate=1, byte_rate=0, burst=1, coalesce=False, queue_size=8)
+    stop = threading.Event()
+    assert sender.acquire(1, stop)
+    stop.set()
+    assert sender.acquire(1, stop) is False
+
+
+def test_byte_rate():
+    sender = SendScheduler(rate=0, byte_rate=1000, burst=1, coalesce=False, queue_size=8)
+    assert sender.try_acquire(100)
+    assert not sender.try_acquire(100)
+
+
+def _frames(data):
+    """Unmasked payloads of client frames written back to back."""
+    payloads = []
+    while data:
+        length = data[1] & 0x7F
+        mask, data = data[2:6], data[6:]
+        payloads.append(ABNF.mask(mask, data[:length]))
+        data = data[length:]
+    return payloads
+
+
+def _pipe(monkeypatch, messages, **options):
+    monkeypatch.setenv("HTTPIE_WS_DRAIN", "0")
+    for name, value in options.items():
+        monkeypatch.setenv(f"HTTPIE_WS_{name.upper()}", value)
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    adapter._ws = FakeWebSocket()
+    adapter._running = True
+    adapter._ws_thread.start = lambda: None
+    adapter._pipe_loop(io.BytesIO(b"\n".join(messages)))
+    return adapter
+
+
+def test_coalesce_writes(monkeypatch):
+    messages = [f"message {i}".encode() for i in range(100)]
+    adapter = _pipe(monkeypatch, messages, coalesce="1", send_queue="200")
+
+    writes = adapter._ws.writes
+    assert [p for w in writes for p in _frames(w)] == messages
+    assert len(writes) < len(messages)
+    assert adapter._stats.msgs_out == 100
+    assert "Writes: " in adapter._sender.summary()
+
+
+def test_batch_uses_mask_key():
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    adapter._ws = FakeWebSocket()
+    adapter._ws.get_mask_key = bytes
+    adapter._running = True
+
+    adapter._send_batch([(b"one", ABNF.OPCODE_TEXT), (b"two", ABNF.OPCODE_BINARY)])
+
+    # One write, masked with the connection's key
+    assert adapter._ws.writes == [b"\x81\x83\0\0\0\0one\x82\x83\0\0\0\0two"]
+
+
+def test_pipe_rate(monkeypatch):
+    messages = [b"x"] * 6
+    started = time.monotonic()
+    adapter = _pipe(monkeypatch, messages, send_rate="50")
+
+    assert time.monotonic() - started >= 0.09
+    assert len(adapter._ws.writes) == 6
+    summary = adapter._sender.summary()
+    assert "Target: 50 msg/s, burst 1" in summary
+    assert "Writes: 6 for 6 messages" in summary
+
+
+def test_no_sender_by_default():
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    assert adapter._sender is None
+
+
+def test_asyncio_falls_back(monkeypatch):
+    monkeypatch.setenv("HTTPIE_WS_ENGINE", "asyncio")
+    monkeypatch.setenv("HTTPIE_WS_SEND_RATE", "10")
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    assert adapter._use_asyncio(None, interactive=False) is False
+
+
+def test_rate_limited_session(monkeypatch):
+    # The whole pipeline, through send() to a socket that accepts everything
+    sent = []
+
+    def connect(self, request, **kwargs):
+        self._ws = FakeWebSocket()
+        sent.append(self._ws)
+
+    monkeypatch.setattr(WebsocketAdapter, "_connect", connect)
+    monkeypatch.setattr(WebsocketAdapter, "_receive", lambda self: self._closing.wait())
+    monkeypatch.setenv("HTTPIE_WS_SEND_RATE", "1000")
+    monkeypatch.setenv("HTTPIE_WS_DRAIN", "0")
+    adapter = WebsocketAdapter()
+    adapter._stdout = io.StringIO()
+    response = adapter.send(Request(url="ws://localhost:8080", data="a\nb\nc").prepare())
+
+    assert len(sent[0].writes) == 3
+    assert "Sender info:" in response.raw.read().decode()
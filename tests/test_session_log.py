@@ -0,0 +1,154 @@
+import io
+import time
+
+import pytest
+from requests.models import Request
+from websocket import ABNF
+
+from httpie_websockets import (
+    RECORD_IN,
+    RECORD_MORE,
+    RECORD_OUT,
+    SessionRecorder,
+    WebsocketAdapter,
+    read_session_log,
+    replay_schedule,
+)
+
+
+def _write_log(path, frames):
+    recorder = SessionRecorder(str(path))
+    for direction, opcode, payload in frames:
+        recorder.record(direction, opcode, payload)
+    recorder.close()
+
+
+def test_record_and_read(tmp_path):
+    path = tmp_path / "session.log"
+    _write_log(
+        path,
+        [
+            (RECORD_OUT, ABNF.OPCODE_TEXT, "hello"),
+            (RECORD_IN, ABNF.OPCODE_BINARY, b"\x00\xff"),
+        ],
+    )
+
+    with open(path, "rb") as f:
+        records = list(read_session_log(f))
+
+    assert [(d, o, c, p) for d, o, c, _, p in records] == [
+        (RECORD_OUT, ABNF.OPCODE_TEXT, 0, b"hello"),
+        (RECORD_IN, ABNF.OPCODE_BINARY, 0, b"\x00\xff"),
+    ]
+    assert records[0][3] <= records[1][3]
+
+
+def test_appended_sessions(tmp_path):
+    path = tmp_path / "session.log"
+    _write_log(path, [(RECORD_OUT, ABNF.OPCODE_TEXT, "first")])
+    _write_log(path, [])
+    _write_log(path, [(RECORD_OUT, ABNF.OPCODE_TEXT, "second")])
+
+    with open(path, "rb") as f:
+        assert [r[4] for r in read_session_log(f)] == [b"first", b"second"]
+
+
+def test_truncated_log(tmp_path):
+    path = tmp_path / "session.log"
+    _write_log(path, [(RECORD_OUT, ABNF.OPCODE_TEXT, "hello")])
+    path.write_bytes(path.read_bytes()[:-2])
+
+    with open(path, "rb") as f, pytest.raises(ValueError):
+        list(read_session_log(f))
+
+
+def test_not_a_log():
+    with pytest.raises(ValueError):
+        list(read_session_log(io.BytesIO(b"hello\n")))
+
+
+def test_replay_schedule_scales_gaps(tmp_path):
+    path = tmp_path / "session.log"
+    recorder = SessionRecorder(str(path))
+    recorder.record(RECORD_OUT, ABNF.OPCODE_TEXT, "a")
+    recorder.record(RECORD_IN, ABNF.OPCODE_TEXT, "reply")
+    time.sleep(0.1)
+    recorder.record(RECORD_OUT, ABNF.OPCODE_BINARY, b"b")
+    recorder.close()
+
+    with open(path, "rb") as f:
+        schedule = list(replay_schedule(f, speed=2))
+
+    assert [(o, p) for _, o, p in schedule] == [
+        (ABNF.OPCODE_TEXT, b"a"),
+        (ABNF.OPCODE_BINARY, b"b"),
+    ]
+    assert schedule[0][0] == 0
+    assert 0.05 <= schedule[1][0] < 0.1
+
+
+def test_record_then_replay(tmp_path, monkeypatch, fake_connect):
+    path = tmp_path / "session.log"
+    monkeypatch.setenv("HTTPIE_WS_DRAIN", "0")
+    monkeypatch.setenv("HTTPIE_WS_RECORD", str(path))
+    request = Request(url="ws://localhost:8080", data="one\ntwo").prepare()
+    response = WebsocketAdapter().send(request)
+    assert f"Recorded 2 frames to {path}" in response.raw.read().decode()
+
+    monkeypatch.delenv("HTTPIE_WS_RECORD")
+    monkeypatch.setenv("HTTPIE_WS_REPLAY", str(path))
+    monkeypatch.setenv("HTTPIE_WS_REPLAY_SPEED", "0")
+    response = WebsocketAdapter().send(Request(url="ws://localhost:8080").prepare())
+
+    assert response.status_code == 200
+    assert fake_connect[1].sent == [b"one", b"two"]
+
+
+def test_replay_invalid_log(tmp_path, monkeypatch):
+    path = tmp_path / "session.log"
+    path.write_bytes(b"not a log")
+    monkeypatch.setenv("HTTPIE_WS_REPLAY", str(path))
+
+    response = WebsocketAdapter().send(Request(url="ws://localhost:8080").prepare())
+
+    assert response.status_code == 500
+    assert "is not a session log" in response.reason
+
+
+def test_replay_joins_fragments(tmp_path):
+    path = tmp_path / "session.log"
+    recorder = SessionRecorder(str(path))
+    recorder.record(RECORD_OUT, ABNF.OPCODE_BINARY, b"ab", fin=False)
+    recorder.record(RECORD_IN, ABNF.OPCODE_TEXT, "reply")
+    recorder.record(RECORD_OUT, ABNF.OPCODE_CONT, b"cd", fin=False)
+    recorder.record(RECORD_OUT, ABNF.OPCODE_CONT, b"e")
+    recorder.record(RECORD_OUT, ABNF.OPCODE_TEXT, "f")
+    recorder.close()
+
+    with open(path, "rb") as f:
+        assert [(o, p) for _, o, p in replay_schedule(f, speed=0)] == [
+            (ABNF.OPCODE_BINARY, b"abcde"),
+            (ABNF.OPCODE_TEXT, b"f"),
+        ]
+
+
+def test_record_send_file(tmp_path, monkeypatch, fake_connect):
+    source = tmp_path / "payload.bin"
+    source.write_bytes(b"0123456789")
+    path = tmp_path / "session.log"
+    monkeypatch.setenv("HTTPIE_WS_DRAIN", "0")
+    monkeypatch.setenv("HTTPIE_WS_RECORD", str(path))
+    monkeypatch.setenv("HTTPIE_WS_SEND_FILE", str(source))
+    monkeypatch.setenv("HTTPIE_WS_OPCODE", "binary")
+    monkeypatch.setenv("HTTPIE_WS_FRAGMENT_SIZE", "4")
+    WebsocketAdapter().send(Request(url="ws://localhost:8080").prepare()).raw.read()
+
+    with open(path, "rb") as f:
+        records = [(o, p) for d, o, _, _, p in read_session_log(f) if d == RECORD_OUT]
+    assert records == [
+        (ABNF.OPCODE_BINARY | RECORD_MORE, b"0123"),
+        (ABNF.OPCODE_CONT | RECORD_MORE, b"4567"),
+        (ABNF.OPCODE_CONT, b"89"),
+    ]
+    with open(path, "rb") as f:
+        assert [p for _, _, p in replay_schedule(f, speed=0)] == [b"0123456789"]
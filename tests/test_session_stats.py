@@ -0,0 +1,60 @@
+from unittest import mock
+
+from requests import PreparedRequest
+
+from httpie_websockets import LatencyHistogram, SessionStats, WebsocketAdapter
+
+
+def test_histogram_percentiles_within_error():
+    histogram = LatencyHistogram()
+    for ms in range(1, 1001):
+        histogram.record(ms / 1000)
+
+    assert abs(histogram.percentile(50) - 0.5) / 0.5 < 0.04
+    assert abs(histogram.percentile(99) - 0.99) / 0.99 < 0.04
+    assert histogram.max == 1_000_000
+    assert histogram.count == 1000
+
+
+def test_histogram_empty_and_clamped():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) == 0.0
+    histogram.record(10**9)
+    assert histogram.counts[-1] == 1
+
+
+def test_histogram_merge():
+    a, b = LatencyHistogram(), LatencyHistogram()
+    a.record(0.001)
+    b.record(0.002)
+    a.merge(b)
+    assert a.count == 2
+    assert a.max == 2000
+
+
+def test_session_stats_pairs_round_trips():
+    stats = SessionStats()
+    with mock.patch("time.perf_counter", side_effect=[1.0, 1.5, 2.0, 2.25]):
+        stats.on_send(3)
+        stats.on_send(4)
+        stats.on_receive(5)
+        stats.on_receive(6)
+
+    assert (stats.msgs_out, stats.bytes_out, stats.msgs_in, stats.bytes_in) == (2, 7, 2, 11)
+    assert stats.rtt.count == 2
+    assert abs(stats.rtt.percentile(100) - 1.0) < 0.04
+    assert stats.inter_arrival.count == 1
+
+
+def test_stats_in_response_body(monkeypatch):
+    monkeypatch.setenv("HTTPIE_WS_STATS", "1")
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    adapter._stats.on_send(3)
+    request = PreparedRequest()
+    request.url = "ws://localhost:8080"
+
+    body = adapter.dummy_response(request).raw.read().decode()
+
+    assert "Session stats:\nMessages: sent 1, received 0\nBytes: sent 3, received 0" in body
+    assert "Round trip (ms): p50 0.000, p90 0.000, p99 0.000, max 0.000 (n=0)" in body
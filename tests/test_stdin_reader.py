@@ -0,0 +1,67 @@
+import io
+import os
+import platform
+
+import pytest
+
+from httpie_websockets import StdinReader
+
+IS_WINDOWS = platform.system().lower() == "windows"
+
+pytestmark = pytest.mark.skipif(IS_WINDOWS, reason="Requires non-Windows platform: StdinReader")
+
+
+@pytest.fixture
+def pipe_reader():
+    r, w = os.pipe()
+    stream = os.fdopen(r, "r")
+    reader = StdinReader(stream)
+    yield reader, w
+    reader.close()
+    stream.close()
+    try:
+        os.close(w)
+    except OSError:
+        pass
+
+
+def test_read_lines_drains_all_buffered_lines(pipe_reader):
+    reader, w = pipe_reader
+    os.write(w, b"first\nsecond \nthird\n")
+    assert reader.read_lines(timeout=1) == ["first", "second", "third"]
+
+
+def test_read_lines_keeps_partial_line(pipe_reader):
+    reader, w = pipe_reader
+    os.write(w, b"hello\nwor")
+    assert reader.read_lines(timeout=1) == ["hello"]
+    os.write(w, b"ld\n")
+    assert reader.read_lines(timeout=1) == ["world"]
+
+
+def test_read_lines_eof_flushes_last_line(pipe_reader):
+    reader, w = pipe_reader
+    os.write(w, b"tail")
+    os.close(w)
+    assert reader.read_lines(timeout=1) == []
+    assert reader.read_lines(timeout=1) == ["tail"]
+    assert reader.eof is True
+
+
+def test_wakeup_interrupts_read(pipe_reader):
+    reader, _ = pipe_reader
+    reader.wakeup()
+    assert reader.read_lines() == []
+
+
+def test_read_lines_timeout(pipe_reader):
+    reader, _ = pipe_reader
+    assert reader.read_lines(timeout=0.01) == []
+
+
+def test_read_lines_stream_without_fileno():
+    reader = StdinReader(io.StringIO("first\nsecond \n"))
+    assert reader.read_lines() == ["first"]
+    assert reader.read_lines() == ["second"]
+    assert reader.read_lines() == []
+    assert reader.eof is True
@@ -0,0 +1,186 @@
+import asyncio
+import base64
+import io
+import struct
+import threading
+import time
+import zlib
+
+import pytest
+from requests.models import Request
+from websocket import ABNF
+
+from httpie_websockets import FragmentDecoder, WebsocketAdapter
+from tests.conftest import close_code, handshake, read_frame, server_frame
+
+
+def test_decoder_text_split_character():
+    decoder = FragmentDecoder(ABNF.OPCODE_TEXT, "text")
+    data = "héllo".encode()
+    assert decoder.feed(data[:2], False) == "h"
+    assert decoder.feed(data[2:], True) == "éllo"
+
+
+def test_decoder_invalid_text():
+    decoder = FragmentDecoder(ABNF.OPCODE_TEXT, "text")
+    with pytest.raises(UnicodeDecodeError):
+        decoder.feed(b"\xff", True)
+
+
+def test_decoder_binary_base64_joins():
+    decoder = FragmentDecoder(ABNF.OPCODE_BINARY, "base64")
+    data = bytes(range(10))
+    out = decoder.feed(data[:4], False) + decoder.feed(data[4:8], False) + decoder.feed(data[8:], True)
+    assert out == base64.b64encode(data).decode()
+
+
+def test_decoder_binary_modes():
+    assert FragmentDecoder(ABNF.OPCODE_BINARY, "hex").feed(b"\x00\xff", True) == "00ff"
+    assert FragmentDecoder(ABNF.OPCODE_BINARY, "raw").feed(b"\x00\xff", True) == b"\x00\xff"
+    assert FragmentDecoder(ABNF.OPCODE_BINARY, "text").feed(b"a\xff", True) == "a�"
+
+
+def _handler(script, closes, gate, deflate):
+    """Send the scripted frames, None waits for `gate`, then wait for the client's close."""
+
+    async def handle(reader, writer):
+        extensions = ["Sec-WebSocket-Extensions: permessage-deflate"] if deflate else []
+        await handshake(reader, writer, *extensions)
+        for frame in script:
+            if frame is None:
+                await asyncio.get_running_loop().run_in_executor(None, gate.wait, 2)
+                continue
+            writer.write(frame)
+            await writer.drain()
+        while True:
+            frame = await read_frame(reader)
+            if frame.opcode == ABNF.OPCODE_CLOSE:
+                closes.append(close_code(frame.data))
+                writer.write(server_frame(ABNF.OPCODE_CLOSE, frame.data))
+                await writer.drain()
+                break
+
+    return handle
+
+
+@pytest.fixture
+def script_server(ws_server):
+    def start(script, deflate=False):
+        closes, gate = [], threading.Event()
+        return ws_server(_handler(script, closes, gate, deflate)), closes, gate
+
+    return start
+
+
+def _adapter(monkeypatch, engine, **options):
+    monkeypatch.setenv("HTTPIE_WS_ENGINE", engine)
+    monkeypatch.setenv("HTTPIE_WS_DRAIN", "-1")
+    monkeypatch.setenv("HTTPIE_WS_FLUSH", "line")
+    monkeypatch.setenv("HTTPIE_WS_INPUT", "/dev/null")
+    for name, value in options.items():
+        monkeypatch.setenv(f"HTTPIE_WS_{name.upper()}", value)
+    adapter = WebsocketAdapter()
+    adapter._stdout = io.StringIO()
+    return adapter
+
+
+def _send(adapter, port):
+    request = Request(url=f"ws://127.0.0.1:{port}/").prepare()
+    return adapter.send(request, timeout=2).raw.read().decode()
+
+
+CLOSE = server_frame(ABNF.OPCODE_CLOSE, struct.pack("!H", 1000))
+
+
+@pytest.mark.parametrize("engine", ["thread", "asyncio"])
+def test_stream_fragments(monkeypatch, script_server, engine):
+    text = "héllo world".encode()
+    port, closes, _ = script_server(
+        [
+            server_frame(ABNF.OPCODE_TEXT, text[:2], fin=0),
+            server_frame(ABNF.OPCODE_PING, b"ping"),
+            server_frame(ABNF.OPCODE_CONT, text[2:7], fin=0),
+            server_frame(ABNF.OPCODE_CONT, text[7:]),
+            server_frame(ABNF.OPCODE_BINARY, b"\x00\x01", fin=0),
+            server_frame(ABNF.OPCODE_CONT, b"\x02"),
+            CLOSE,
+        ]
+    )
+    adapter = _adapter(monkeypatch, engine, stream="1", binary="hex")
+
+    body = _send(adapter, port)
+
+    assert adapter._stdout.getvalue() == "héllo world\n000102\n"
+    assert adapter._stats.msgs_in == 2
+    assert "Close Code: 1000" in body
+
+
+@pytest.mark.parametrize("engine", ["thread", "asyncio"])
+def test_stream_writes_before_message_ends(monkeypatch, script_server, engine):
+    port, _, gate = script_server(
+        [
+            server_frame(ABNF.OPCODE_TEXT, b"first ", fin=0),
+            None,
+            server_frame(ABNF.OPCODE_CONT, b"second"),
+            CLOSE,
+        ]
+    )
+    adapter = _adapter(monkeypatch, engine, stream="1")
+    seen = []
+
+    def wait_for_first():
+        deadline = time.monotonic() + 2
+        while time.monotonic() < deadline and not adapter._stdout.getvalue():
+            time.sleep(0.01)
+        seen.append(adapter._stdout.getvalue())
+        gate.set()
+
+    watcher = threading.Thread(target=wait_for_first)
+    watcher.start()
+    _send(adapter, port)
+    watcher.join()
+
+    assert seen == ["first "]
+    assert adapter._stdout.getvalue() == "first second\n"
+
+
+@pytest.mark.parametrize("stream", ["0", "1"])
+@pytest.mark.parametrize("engine", ["thread", "asyncio"])
+def test_max_size_closes(monkeypatch, script_server, engine, stream):
+    port, closes, _ = script_server(
+        [
+            server_frame(ABNF.OPCODE_TEXT, b"small"),
+            server_frame(ABNF.OPCODE_TEXT, b"a" * 60, fin=0),
+            server_frame(ABNF.OPCODE_CONT, b"b" * 60),
+        ]
+    )
+    adapter = _adapter(monkeypatch, engine, stream=stream, max_size="100")
+
+    body = _send(adapter, port)
+
+    assert closes == [1009]
+    assert "Close Code: 1009" in body
+    assert "Close Msg: message too big" in body
+    assert adapter._stdout.getvalue().startswith("small\n")
+    assert "b" not in adapter._stdout.getvalue()
+
+
+@pytest.mark.parametrize("engine", ["thread", "asyncio"])
+def test_stream_compressed(monkeypatch, script_server, engine):
+    message = b'{"snapshot": [' + b'{"id": 1, "value": "abc"}, ' * 200 + b"{}]}"
+    compressor = zlib.compressobj(wbits=-15)
+    wire = (compressor.compress(message) + compressor.flush(zlib.Z_SYNC_FLUSH))[:-4]
+    half = len(wire) // 2
+    port, _, _ = script_server(
+        [
+            server_frame(ABNF.OPCODE_TEXT, wire[:half], fin=0, rsv1=1),
+            server_frame(ABNF.OPCODE_CONT, wire[half:]),
+            CLOSE,
+        ],
+        deflate=True,
+    )
+    adapter = _adapter(monkeypatch, engine, stream="1", compress="1")
+
+    _send(adapter, port)
+
+    assert adapter._stdout.getvalue() == message.decode() + "\n"
@@ -0,0 +1,86 @@
+import logging
+import shutil
+import ssl
+import subprocess
+
+import pytest
+from httpie.ssl_ import HTTPieCertificate
+from requests.models import Request
+from websocket import ABNF
+
+from httpie_websockets import WebsocketAdapter, shared_ssl_context
+from tests.conftest import handshake, read_frame, server_frame
+
+
+@pytest.fixture(scope="module")
+def certificate(tmp_path_factory):
+    if shutil.which("openssl") is None:
+        pytest.skip("openssl is not installed")
+    path = tmp_path_factory.mktemp("tls")
+    subprocess.run(  # noqa: S603
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+            "-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost",
+            "-keyout", str(path / "key.pem"), "-out", str(path / "cert.pem"),
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return path / "cert.pem", path / "key.pem"
+
+
+async def _close_handler(reader, writer):
+    """Accept the handshake and answer the client's close frame."""
+    await handshake(reader, writer)
+    frame = await read_frame(reader)
+    writer.write(server_frame(ABNF.OPCODE_CLOSE, frame.data))
+    await writer.drain()
+
+
+@pytest.fixture
+def tls_server(certificate, ws_server):
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(*map(str, certificate))
+    return ws_server(_close_handler, ssl=context)
+
+
+@pytest.mark.parametrize("engine", ["thread", "asyncio"])
+def test_session_resumed(monkeypatch, caplog, certificate, tls_server, engine):
+    monkeypatch.setenv("HTTPIE_WS_ENGINE", engine)
+    monkeypatch.setenv("HTTPIE_WS_DRAIN", "0")
+    caplog.set_level(logging.DEBUG, logger="httpie_websockets")
+    shared_ssl_context.cache_clear()
+    request = Request(url=f"wss://localhost:{tls_server}/", data="x").prepare()
+
+    for _ in range(2):
+        response = WebsocketAdapter().send(request, timeout=2, verify=str(certificate[0]))
+        assert response.status_code == 200
+
+    handshakes = [r.getMessage() for r in caplog.records if "TLS handshake" in r.getMessage()]
+    assert len(handshakes) == 2
+    assert handshakes[0].endswith("resumed: False")
+    assert handshakes[1].endswith("resumed: True")
+
+
+def test_context_shared_per_options(certificate):
+    cafile = str(certificate[0])
+    assert shared_ssl_context(cafile, None) is shared_ssl_context(cafile, None)
+    assert shared_ssl_context(False, None) is not shared_ssl_context(cafile, None)
+    assert shared_ssl_context(False, None).verify_mode == ssl.CERT_NONE
+
+
+def test_no_context_for_ws():
+    request = Request(url="ws://localhost:8080/").prepare()
+    assert WebsocketAdapter._ssl_context(request, True, None) is None
+
+
+@pytest.mark.parametrize("engine", ["thread", "asyncio"])
+def test_missing_client_certificate(monkeypatch, tmp_path, engine):
+    monkeypatch.setenv("HTTPIE_WS_ENGINE", engine)
+    cert = HTTPieCertificate(str(tmp_path / "missing.pem"))
+    request = Request(url="wss://localhost:1/", data="x").prepare()
+
+    response = WebsocketAdapter().send(request, cert=cert)
+
+    assert response.status_code == 500
+    assert "Cannot load certificates" in response.reason
@@ -7,11 +7,14 @@ from httpie_websockets import WebsocketAdapter
 
 @pytest.fixture
 def websocket_adapter():
-    return WebsocketAdapter()
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    return adapter
 
 
 def test_write_stdout_success():
     adapter = WebsocketAdapter()
+    adapter._configure()
     adapter._running = True
     mock_stdout = MagicMock()
     adapter._stdout = mock_stdout
@@ -25,6 +28,7 @@ def test_write_stdout_success():
 
 def test_write_stdout_bytes_message():
     adapter = WebsocketAdapter()
+    adapter._configure()
     adapter._running = True
     mock_stdout = MagicMock()
     adapter._stdout = mock_stdout
@@ -38,6 +42,7 @@ def test_write_stdout_bytes_message():
 
 def test_write_stdout_no_newline():
     adapter = WebsocketAdapter()
+    adapter._configure()
     adapter._running = True
     mock_stdout = MagicMock()
     adapter._stdout = mock_stdout
@@ -77,3 +82,53 @@ def test_write_stdout_not_running(websocket_adapter, mocker):
     # Check if the message was not written to stdout
     mock_stdout.write.assert_not_called()
     mock_stdout.flush.assert_not_called()
+
+
+def test_write_stdout_size_mode_coalesces(monkeypatch):
+    monkeypatch.setenv("HTTPIE_WS_FLUSH", "size")
+    monkeypatch.setenv("HTTPIE_WS_FLUSH_SIZE", "10")
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    adapter._running = True
+    mock_stdout = MagicMock()
+    adapter._stdout = mock_stdout
+
+    adapter._write_stdout("abc")
+    mock_stdout.write.assert_not_called()
+    adapter._write_stdout("defgh")
+    mock_stdout.write.assert_called_once_with("abc\ndefgh\n")
+
+    adapter._write_stdout("tail")
+    adapter._stop_output()
+    mock_stdout.write.assert_called_with("tail\n")
+
+
+def test_write_stdout_interval_mode_flushes_in_background(monkeypatch):
+    monkeypatch.setenv("HTTPIE_WS_FLUSH", "interval")
+    monkeypatch.setenv("HTTPIE_WS_FLUSH_INTERVAL", "0.01")
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    adapter._running = True
+    mock_stdout = MagicMock()
+    adapter._stdout = mock_stdout
+    adapter._start_output(interactive=True)
+
+    adapter._write_stdout("one")
+    adapter._write_stdout("two")
+    adapter._flush_stop.wait(0.2)
+    adapter._stop_output()
+
+    mock_stdout.write.assert_called_once_with("one\ntwo\n")
+
+
+def test_start_output_defaults(websocket_adapter):
+    websocket_adapter._stdout = MagicMock(isatty=MagicMock(return_value=False))
+    websocket_adapter._start_output(interactive=True)
+    assert websocket_adapter._flush_mode == "line"
+
+    adapter = WebsocketAdapter()
+    adapter._configure()
+    adapter._stdout = MagicMock(isatty=MagicMock(return_value=False))
+    adapter._start_output(interactive=False)
+    assert adapter._flush_mode == "interval"
+    adapter._stop_output()